@@ -1,9 +1,17 @@
+import logging
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
 from .config import settings
+from .database import get_db
+from .models.user import User, Membership
+
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 # 可选的 Bearer Token（用于普通用户接口）
@@ -18,6 +26,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(hours=settings.jwt_expire_hours)
     to_encode.update({"exp": expire})
+    to_encode.setdefault("iat", datetime.utcnow())
     encoded_jwt = jwt.encode(to_encode, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
     return encoded_jwt
 
@@ -71,3 +80,86 @@ async def get_current_user_optional(
         return payload
     except HTTPException:
         return None
+
+
+@dataclass(frozen=True)
+class RequestIdentity:
+    """请求身份（来自已验证的 JWT 声明，声明缺失时从数据库补齐）"""
+    user_id: int
+    feishu_user_id: str
+    tenant_key: Optional[str] = None
+    # 会员计划；声明已过期（见 claims_plan_is_fresh）时为 None，需要时调用 get_identity_plan 读库
+    plan_type: Optional[str] = None
+    from_claims: bool = True
+
+
+def claims_plan_is_fresh(payload: dict) -> bool:
+    """token 中的 plan_type 是否仍可信：签发不超过 jwt_identity_plan_max_age 秒，且会员未到期"""
+    if not payload.get("plan_type"):
+        return False
+    now = time.time()
+    issued_at = payload.get("iat")
+    if not isinstance(issued_at, (int, float)) or now - issued_at > settings.jwt_identity_plan_max_age:
+        return False
+    plan_expires_at = payload.get("plan_expires_at")
+    if plan_expires_at is not None and (not isinstance(plan_expires_at, (int, float)) or plan_expires_at <= now):
+        return False
+    return True
+
+
+def _identity_from_db(db: Session, feishu_user_id: str) -> Optional[RequestIdentity]:
+    row = db.query(User.id, User.tenant_key, Membership.plan_type).outerjoin(
+        Membership, Membership.user_id == User.id
+    ).filter(User.feishu_user_id == feishu_user_id).first()
+    if not row:
+        logger.warning(f"[auth] 未找到用户: {feishu_user_id}")
+        return None
+    return RequestIdentity(
+        user_id=row.id,
+        feishu_user_id=feishu_user_id,
+        tenant_key=row.tenant_key,
+        plan_type=row.plan_type,
+        from_claims=False,
+    )
+
+
+async def get_request_identity(
+    payload: Optional[dict] = Depends(get_current_user_optional),
+    db: Session = Depends(get_db)
+) -> Optional[RequestIdentity]:
+    """获取请求身份（可选，token 不存在/无效或用户不存在时返回 None）
+
+    user_id / tenant_key 不会变化，直接取自 token 声明，不再按 feishu_user_id 查询 users 表；
+    只有旧 token（没有 user_id 声明）才回退到数据库。同一请求内多次依赖只解析一次。
+    """
+    if not payload or payload.get("role") != "user" or not payload.get("sub"):
+        return None
+
+    user_id = payload.get("user_id")
+    if not isinstance(user_id, int):
+        return _identity_from_db(db, payload["sub"])
+
+    return RequestIdentity(
+        user_id=user_id,
+        feishu_user_id=payload["sub"],
+        tenant_key=payload.get("tenant_key"),
+        plan_type=payload["plan_type"] if claims_plan_is_fresh(payload) else None,
+    )
+
+
+def get_identity_plan(db: Session, identity: RequestIdentity) -> str:
+    """返回会员计划：声明仍新鲜时直接使用，否则读取 memberships 表"""
+    if identity.plan_type:
+        return identity.plan_type
+    plan_type = db.query(Membership.plan_type).filter(Membership.user_id == identity.user_id).scalar()
+    return plan_type or "free"
+
+
+def get_user_id(db: Session, feishu_user_id: str, identity: Optional[RequestIdentity] = None) -> int:
+    """获取用户 id：请求 token 属于同一飞书用户时直接取自声明，否则查库（用户不存在时 404）"""
+    if identity and identity.feishu_user_id == feishu_user_id:
+        return identity.user_id
+    user_id = db.query(User.id).filter(User.feishu_user_id == feishu_user_id).scalar()
+    if user_id is None:
+        raise HTTPException(status_code=404, detail="用户不存在")
+    return user_id
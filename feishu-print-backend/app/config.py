@@ -10,9 +10,30 @@ class Settings(BaseSettings):
     jwt_secret_key: str = "your-super-secret-key-change-in-production"
     jwt_algorithm: str = "HS256"
     jwt_expire_hours: int = 24
+    jwt_identity_plan_max_age: int = 3600  # token 中 plan_type 声明的可信时长（秒），超过后读库
     environment: str = "development"  # development, production
     ai_model: str = "qwen-plus"  # AI模型：qwen-turbo(最快), qwen-plus(平衡), qwen-max(最慢但质量最高)
     ai_timeout: int = 300  # AI API超时时间（秒），流式生成需要更长时间，考虑重试机制
+    ai_generation_cache_enabled: bool = True  # 相同需求（描述 + 模式 + 字段 + 模型）直接回放已缓存的生成结果，不调用模型、不扣次数
+    ai_generation_cache_ttl_hours: int = 168  # AI 生成结果缓存的保留时间（小时）
+    ai_max_concurrent_streams: int = 8  # 每个进程同时打开的上游 AI 流数量上限（多 worker 时按服务商上限 / worker 数设置）
+    ai_max_queue_length: int = 200  # 每个进程排队等待的生成请求上限，超出时直接返回 503
+    ai_queue_timeout_seconds: int = 120  # 排队超过该秒数仍未轮到时放弃
+    ai_stream_validation_enabled: bool = True  # 流式检查模型输出，出现禁用的 flex/grid/动画/竖排时立即中断并带纠正提示重新生成
+    ai_stream_flush_ms: int = 80  # AI 流式输出合并下发的时间间隔（毫秒），每次生成的第一个增量立即下发；0 表示逐个增量下发
+    ai_stream_flush_bytes: int = 2048  # 攒够该字节数时立即下发，不等时间间隔；0 表示逐个增量下发
+    template_content_compression: str = "gzip"  # 模板正文压缩存储：gzip / none（none 时新写入以明文存放）
+    template_content_compress_min_bytes: int = 1024  # 小于该字节数的正文不压缩
+    template_preview_dir: str = "data/template_previews"  # 模板预览图（SVG）磁盘缓存目录，按 content_hash 命名
+    template_fork_max_delta_ratio: float = 0.5  # 派生模板的差异超过完整正文压缩后大小的该比例时，改存完整副本
+    template_fork_cache_size: int = 512  # 进程内缓存的派生模板正文（还原结果）数量
+    template_normalize_html: bool = True  # 保存模板时规范化 HTML（提升重复的 inline style、折叠空白）
+    template_stats_flush_seconds: int = 30  # 模板使用统计在进程内聚合，每隔该秒数写库一次
+    template_stats_flush_events: int = 1000  # 或攒够该数量的事件后立即写库
+    template_purge_retention_hours: int = 72  # 软删除的模板保留该小时数（期间可恢复），之后由后台任务物理删除
+    template_purge_interval_seconds: int = 300  # 后台清理任务的扫描间隔
+    template_purge_batch_size: int = 50  # 每批物理删除的模板数（每批单独提交）
+    template_purge_batch_pause_seconds: float = 1.0  # 批与批之间暂停的秒数，摊平清理负载
     
     # YunGouOs支付配置
     # 兼容两种环境变量命名：
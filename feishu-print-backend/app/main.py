@@ -5,6 +5,7 @@ import sys
 from .database import engine, Base
 from .routers import templates, ai, signature, user, team, admin, feedback, payment, promo
 from .config import settings
+from .services.template_purge import template_purger
 
 # 配置日志（Windows 兼容性优化）
 # 避免 uvicorn reload 模式下的日志配置冲突
@@ -35,6 +36,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Content-Bytes-Before", "X-Content-Bytes-After", "X-AI-Cache"],
 )
 
 # 注册路由
@@ -48,6 +50,11 @@ app.include_router(feedback.router)
 app.include_router(payment.router)
 app.include_router(promo.router)
 
+@app.on_event("startup")
+def start_template_purger():
+    """启动已删除模板的后台清理任务"""
+    template_purger.start()
+
 @app.get("/")
 def root():
     return {"message": "Feishu Print API is running"}
@@ -1,7 +1,14 @@
 from .template import Template
+from .template_blob import TemplateBlob
 from .signature import Signature, SignatureStatus
 from .user import User, Membership, PlanType, Order, OrderStatus, PromoCode
 from .plan import MembershipPlan
 from .team import Team, TeamMember, TeamInvite, TeamTemplate, TeamRole, InviteStatus
 from .admin import Admin, hash_password, verify_password
-from .feedback import Feedback
\ No newline at end of file
+from .feedback import Feedback
+from .cache_version import CacheVersion
+from .template_version import TemplateVersion
+from .template_field import TemplateField
+from .template_change import TemplateChange
+from .template_stats import TemplateStats
+from .ai_generation import AiGenerationCache
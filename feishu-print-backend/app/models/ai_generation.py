@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, LargeBinary, Index
+from sqlalchemy.sql import func
+from app.database import Base
+from app.services.template_content import decode_content
+
+
+class AiGenerationCache(Base):
+    """
+    AI 生成结果缓存（精确匹配）
+
+    cache_key 为 SHA-256(规范化后的需求描述 + mode + 排序后的字段名 + 模型名)，
+    只保存通过校验的 HTML（extract_html_content 的结果），存储格式与模板正文相同（明文或 gzip）。
+    hit_count * size 即缓存节省的下发字节数。
+    """
+
+    __tablename__ = "ai_generation_cache"
+
+    cache_key = Column(String(64), primary_key=True)
+    mode = Column(String(20), nullable=False)
+    model = Column(String(50), nullable=False)
+    content_text = Column("content", Text, nullable=False, default="")
+    content_gz = Column(LargeBinary(length=2 ** 24 - 1), nullable=True)  # MEDIUMBLOB
+    content_encoding = Column(String(16), nullable=True)  # NULL: 明文；'gzip': 压缩
+    size = Column(Integer, nullable=False, default=0)  # HTML 字节数（未压缩）
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, server_default=func.now())
+    last_hit_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_ai_generation_cache_created_at", "created_at"),
+    )
+
+    @property
+    def content(self) -> str:
+        return decode_content(self.content_text, self.content_gz, self.content_encoding)
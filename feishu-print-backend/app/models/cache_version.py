@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, BigInteger, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class CacheVersion(Base):
+    """
+    进程内缓存的版本号（跨 uvicorn worker 的失效通知）
+
+    数据变更时把对应 name 的 version + 1，各 worker 定期比对版本号决定是否重建缓存。
+    """
+
+    __tablename__ = "cache_versions"
+
+    name = Column(String(64), primary_key=True)  # 例如 'system_templates'
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
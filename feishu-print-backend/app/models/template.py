@@ -1,7 +1,17 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Index, LargeBinary, UniqueConstraint, event
+)
+from sqlalchemy.orm import relationship, deferred, defer, object_session
 from sqlalchemy.sql import func
 from ..database import Base
+from ..services.template_content import (
+    encode_content, decode_content, CONTENT_ENCODING_FORK, CONTENT_ENCODING_BLOB
+)
+from .template_blob import TemplateBlob
+
+# 同一所有者下未删除模板的名称唯一（见 name_scope）
+NAME_UNIQUE_CONSTRAINT = "uq_templates_owner_name"
+
 
 class Template(Base):
     __tablename__ = "templates"
@@ -9,11 +19,99 @@ class Template(Base):
     id = Column(Integer, primary_key=True, index=True)
     owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)  # 用户ID，NULL表示系统模板
     name = Column(String(255), nullable=False)
-    content = Column(Text, nullable=False)
+    # 正文存储：明文存放在 content 列（旧数据 / 短正文），或 gzip 压缩后存放在 content_gz 列；
+    # 新写入的正文存放在 template_blobs（blob_hash），派生模板只保存相对 parent_id 的差异
+    # 读写请使用 content 属性，解压只在真正访问正文时进行
+    content_text = Column("content", Text, nullable=False, default="")
+    content_gz = Column(LargeBinary(length=2 ** 24 - 1), nullable=True)  # MEDIUMBLOB
+    content_encoding = Column(String(16), nullable=True)  # NULL: 明文；'gzip': 压缩；'fork': 派生差异；'blob': 见 blob_hash
+    # 正文所在的 template_blobs 行（按内容寻址，相同正文共用一行）
+    blob_hash = Column(String(64), ForeignKey("template_blobs.hash"), nullable=True, index=True)
+    # 派生自的系统模板（另存为），正文只保存差异；不设 ON DELETE，父模板被引用时不能直接删除
+    parent_id = Column(Integer, ForeignKey("templates.id"), nullable=True, index=True)
     template_type = Column(String(20), default='normal', nullable=False)  # 'normal' 或 'ai'
     is_system = Column(Boolean, default=False, nullable=False)  # 是否为系统模版
+    content_hash = Column(String(64), nullable=True)  # SHA-256(name + content + template_type)，用作 ETag
+    search_text = deferred(Column(Text, nullable=True))  # 占位符字段名 + 去标签后的可见文本，写入时生成，用于全文搜索
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+    # 软删除时间：删除接口只写这一列，template_purge 后台任务过了保留期再分批物理删除
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    # 名称唯一性的作用域：未删除时为 owner_id（系统模板和未登录创建的模板为 0），已删除时为 NULL，
+    # 与 name 组成唯一索引，已删除的模板不占用名称。
+    # 普通列，由 _sync_name_scope 在写入 owner_id / deleted_at 时维护（owner_id 的外键带 ON DELETE，MySQL 不允许在其上建 STORED 生成列）；
+    # 绕过 ORM 的 Core 写入需自行填写（见 services/template_names.py::name_scope_key）
+    name_scope = Column(Integer, nullable=True)
     
     # 关联用户
     user = relationship("User", backref="templates")
+
+    @property
+    def content(self) -> str:
+        decoded = self.__dict__.get("_decoded_content")
+        if decoded is None:
+            if self.content_encoding == CONTENT_ENCODING_FORK:
+                from ..services.template_forks import materialize_fork
+                decoded = materialize_fork(self)
+            elif self.content_encoding == CONTENT_ENCODING_BLOB:
+                decoded = self._load_blob().content
+            else:
+                decoded = decode_content(self.content_text, self.content_gz, self.content_encoding)
+            self.__dict__["_decoded_content"] = decoded
+        return decoded
+
+    @content.setter
+    def content(self, value: str) -> None:
+        self.store_content(encode_content(value), value)
+
+    def _load_blob(self) -> TemplateBlob:
+        # 按主键从 identity map 取，批量读取前可用 services/template_blobs.py::preload_blobs 一次加载
+        blob = object_session(self).get(TemplateBlob, self.blob_hash)
+        if blob is None:
+            raise ValueError(f"模板 {self.id} 的正文 {self.blob_hash} 不存在")
+        return blob
+
+    def store_content(self, columns: tuple, value: str) -> None:
+        """写入已编码的正文列 (content, content_gz, content_encoding)，value 为对应的正文"""
+        self.content_text, self.content_gz, self.content_encoding = columns
+        self.__dict__["_decoded_content"] = value or ""
+
+    __table_args__ = (
+        # MySQL 使用 ngram 分词的 FULLTEXT 索引，支持中文关键词搜索
+        Index("ft_templates_search", "name", "search_text", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+        # MySQL 不支持部分索引：列表查询的 owner_id = ? AND deleted_at IS NULL 走联合索引，
+        # 清理任务按 deleted_at 范围扫描已删除的行
+        Index("ix_templates_owner_deleted", "owner_id", "deleted_at"),
+        Index("ix_templates_deleted_at", "deleted_at"),
+        UniqueConstraint("name_scope", "name", name=NAME_UNIQUE_CONSTRAINT),
+    )
+
+
+@event.listens_for(Template, "expire")
+@event.listens_for(Template, "refresh")
+def _drop_decoded_content(target, *args):
+    """正文列重新加载时丢弃已解压的缓存"""
+    target.__dict__.pop("_decoded_content", None)
+
+
+@event.listens_for(Template, "before_insert")
+@event.listens_for(Template, "before_update")
+def _sync_name_scope(mapper, connection, target):
+    """按 owner_id / deleted_at 计算 name_scope"""
+    if target.deleted_at is not None:
+        target.name_scope = None
+    else:
+        target.name_scope = target.owner_id if target.owner_id is not None else 0
+
+
+def defer_content(raiseload: bool = False) -> list:
+    """查询选项：不加载正文相关的列（raiseload=True 时访问正文会直接报错）"""
+    return [
+        defer(Template.content_text, raiseload=raiseload),
+        defer(Template.content_gz, raiseload=raiseload),
+    ]
+
+
+def not_deleted():
+    """查询条件：未软删除的模板"""
+    return Template.deleted_at == None
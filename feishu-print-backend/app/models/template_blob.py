@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, LargeBinary
+from sqlalchemy.sql import func
+from app.database import Base
+from app.services.template_content import decode_content
+
+
+class TemplateBlob(Base):
+    """
+    模板正文（按内容寻址）
+
+    hash 为正文 UTF-8 字节的 SHA-256，templates.blob_hash 指向本表；正文相同的模板（AI 重试重复保存、
+    重复导入等）共用一行，ref_count 记录引用的模板数，归零时删除。正文存储格式与 templates 相同
+    （明文或 gzip），行写入后不再修改。
+    """
+
+    __tablename__ = "template_blobs"
+
+    hash = Column(String(64), primary_key=True)
+    content_text = Column("content", Text, nullable=False, default="")
+    content_gz = Column(LargeBinary(length=2 ** 24 - 1), nullable=True)  # MEDIUMBLOB
+    content_encoding = Column(String(16), nullable=True)  # NULL: 明文；'gzip': 压缩
+    size = Column(Integer, nullable=False, default=0)  # 正文字节数（未压缩）
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, server_default=func.now())
+
+    @property
+    def content(self) -> str:
+        return decode_content(self.content_text, self.content_gz, self.content_encoding)
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class TemplateChange(Base):
+    """
+    模板变更日志（增量同步用）
+
+    每次创建/修改/删除模板追加一行，自增 id 即同步游标。删除的模板在本表留下 action='delete' 的墓碑，
+    因此不与 templates 建外键；owner_id / is_system 冗余保存，用于按可见范围过滤。
+    """
+
+    __tablename__ = "template_changes"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    template_id = Column(Integer, nullable=False)
+    owner_id = Column(Integer, nullable=True)
+    is_system = Column(Boolean, nullable=False, default=False)
+    action = Column(String(16), nullable=False)  # 'upsert' / 'delete'
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_template_changes_owner_id", "owner_id", "id"),
+        Index("ix_template_changes_is_system", "is_system", "id"),
+    )
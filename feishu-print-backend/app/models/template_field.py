@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, UniqueConstraint
+from app.database import Base
+
+
+class TemplateField(Base):
+    """
+    模板占位符字段索引
+
+    模板写入时解析 <span class="template-field" data-fieldname="X"> 占位符，每个字段一行；
+    按字段匹配模板时只查本表（field_name 索引），不再解析 HTML。
+    """
+
+    __tablename__ = "template_fields"
+
+    id = Column(Integer, primary_key=True, index=True)
+    template_id = Column(Integer, ForeignKey("templates.id", ondelete="CASCADE"), nullable=False)
+    field_name = Column(String(255), nullable=False)
+    position = Column(Integer, nullable=False, default=0)  # 字段在模板中首次出现的顺序
+
+    __table_args__ = (
+        UniqueConstraint("template_id", "field_name", name="uq_template_fields_template_field"),
+        Index("ix_template_fields_field_name", "field_name", "template_id"),
+    )
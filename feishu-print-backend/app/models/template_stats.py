@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index
+from app.database import Base
+
+
+class TemplateStats(Base):
+    """
+    模板使用统计（每个模板一行）
+
+    打开 / 导出 / 回填事件先在进程内聚合（见 app/services/template_stats.py），每隔一段时间或攒够一定数量后
+    一次写入累加值，不在每个事件上更新 templates 的热点行。use_count 为三类事件之和，用于"最常用"排序。
+    """
+
+    __tablename__ = "template_stats"
+
+    template_id = Column(Integer, ForeignKey("templates.id", ondelete="CASCADE"), primary_key=True)
+    open_count = Column(Integer, nullable=False, default=0)
+    export_count = Column(Integer, nullable=False, default=0)
+    backfill_count = Column(Integer, nullable=False, default=0)
+    use_count = Column(Integer, nullable=False, default=0)
+    last_used_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_template_stats_use_count", "use_count"),
+        Index("ix_template_stats_last_used_at", "last_used_at"),
+    )
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, LargeBinary, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class TemplateVersion(Base):
+    """
+    模板历史版本
+
+    每隔 VERSION_SNAPSHOT_INTERVAL 个版本保存一次完整快照，其余版本只保存相对上一版本的差异；
+    payload 为 gzip 压缩后的 JSON，格式见 app/services/template_versions.py。
+    """
+
+    __tablename__ = "template_versions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    template_id = Column(Integer, ForeignKey("templates.id", ondelete="CASCADE"), nullable=False)
+    version = Column(Integer, nullable=False)  # 从 1 开始递增
+    is_snapshot = Column(Boolean, nullable=False, default=False)  # True: 完整快照；False: 差异
+    payload = Column(LargeBinary(length=2 ** 24 - 1), nullable=False)
+    content_hash = Column(String(64), nullable=True)  # 该版本的 content_hash
+    content_length = Column(Integer, nullable=True)  # 该版本正文长度（字符数）
+    created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("template_id", "version", name="uq_template_versions_template_version"),
+    )
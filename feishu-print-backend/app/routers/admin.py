@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 from pydantic import BaseModel
@@ -14,6 +14,14 @@ from app.models.feedback import Feedback
 from app.models.plan import MembershipPlan
 from app.auth import create_access_token, get_current_admin
 from app.routers import payment
+from app.services.system_template_cache import bump_system_templates_version, system_template_cache
+from app.services.template_batch import (
+    batch_upsert_templates, batch_response, validate_batch_request, preview_jobs
+)
+from app.services.template_preview import generate_previews
+from app.services.ai_generation_cache import generation_cache_summary
+from app.services.ai_output_validator import output_validation_stats
+from app.schemas.template import TemplateBatchRequest, TemplateBatchResponse
 
 logger = logging.getLogger(__name__)
 
@@ -167,6 +175,69 @@ async def update_membership_plan(
     return {"success": True, "message": "会员计划已更新", "data": data}
 
 
+# ==================== 系统模板缓存 ====================
+
+@router.post("/templates/system-cache/refresh")
+async def refresh_system_template_cache(
+    db: Session = Depends(get_db),
+    _: Admin = Depends(get_current_admin),
+):
+    """
+    刷新系统模板缓存
+
+    直接在数据库中导入/修改系统模板后调用，递增版本号后所有 worker 会在几秒内重建缓存。
+    """
+    bump_system_templates_version(db)
+    db.commit()
+    system_template_cache.invalidate()
+    return {"success": True, "message": "系统模板缓存已刷新"}
+
+
+@router.post("/templates/batch", response_model=TemplateBatchResponse)
+async def batch_import_system_templates(
+    request: TemplateBatchRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    _: Admin = Depends(get_current_admin),
+):
+    """
+    批量导入系统模板（is_system=True），整批一个事务
+
+    on_conflict='update' 时覆盖同名系统模板，可用于新环境初始化或重复执行的种子数据。
+    """
+    validate_batch_request(request)
+    try:
+        results = batch_upsert_templates(
+            db, request.templates, owner_id=None, is_system=True, on_conflict=request.on_conflict
+        )
+        bump_system_templates_version(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"批量导入系统模板失败: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"批量导入系统模板失败: {str(e)}")
+    system_template_cache.invalidate()
+    background_tasks.add_task(generate_previews, preview_jobs(request, results))
+    return batch_response(results)
+
+
+# ==================== AI 生成缓存 ====================
+
+@router.get("/ai-cache/stats")
+async def get_ai_generation_cache_stats(
+    db: Session = Depends(get_db),
+    _: Admin = Depends(get_current_admin),
+):
+    """AI 生成缓存统计：条目数、累计命中次数和节省字节数（全局），以及当前进程的命中率"""
+    return {"success": True, "data": generation_cache_summary(db)}
+
+
+@router.get("/ai-validation/stats")
+async def get_ai_output_validation_stats(_: Admin = Depends(get_current_admin)):
+    """AI 输出校验统计（当前进程）：每条规则的检查次数、违规次数和中断重试次数"""
+    return {"success": True, "data": output_validation_stats.snapshot()}
+
+
 # ==================== 统计接口 ====================
 
 @router.get("/stats")
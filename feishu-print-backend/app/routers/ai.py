@@ -2,7 +2,7 @@
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from openai import AsyncOpenAI
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from ..config import settings
 import traceback
 import logging
@@ -11,11 +11,19 @@ import re
 import asyncio
 import httpx
 import httpcore
-from app.database import get_db
-from app.models.user import User
+from app.database import get_db, SessionLocal
+from app.models.user import Membership
+from app.auth import RequestIdentity, get_request_identity, get_user_id
 from app.routers.user import PLAN_LIMITS, reset_usage_if_needed
 from fastapi import Depends
 from sqlalchemy.orm import Session
+from app.services.ai_generation_cache import generation_cache_key, lookup_generation, store_generation
+from app.services.ai_admission import AiAdmissionController, AdmissionTicket
+from app.services.ai_html_extractor import IncrementalHtmlExtractor
+from app.services.ai_stream_coalescer import DeltaCoalescer, read_with_flush_deadline
+from app.services.ai_output_validator import (
+    StreamingOutputValidator, corrective_hint, output_validation_stats, validate_generated_html
+)
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +33,8 @@ AI_MAX_TOKENS = 4000
 STREAM_BUFFER_THRESHOLD = 20
 MIN_CONTENT_LENGTH = 800
 MAX_RETRY_ATTEMPTS = 2
+CACHE_REPLAY_CHUNK_SIZE = 512  # 回放缓存结果时每个 SSE 事件的字符数
+QUEUE_STATUS_INTERVAL = 5  # 排队期间下发排队位置的间隔（秒），同时充当心跳
 
 DEFAULT_MODE = "design"
 
@@ -35,6 +45,13 @@ router = APIRouter(
 
 _ai_client: AsyncOpenAI | None = None
 
+# 上游流并发上限 + 按会员计划加权公平排队
+ai_admission = AiAdmissionController(
+    settings.ai_max_concurrent_streams,
+    settings.ai_max_queue_length,
+    {plan: limits["ai_queue_weight"] for plan, limits in PLAN_LIMITS.items()},
+)
+
 def get_ai_client() -> AsyncOpenAI:
     global _ai_client
     if _ai_client is None:
@@ -84,6 +101,49 @@ class GenerateTemplateRequest(BaseModel):
     mode: str = DEFAULT_MODE
     availableFields: List[FieldInfo] = []
     feishu_user_id: str
+    useCache: bool = True  # False 时跳过生成缓存（"重新生成"，希望得到不同的设计）
+
+def _sse_data(payload) -> str:
+    """SSE 事件帧（模型输出与缓存回放共用）"""
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+async def replay_cached_generation(html: str):
+    """按与模型流式输出相同的 SSE 格式回放缓存的 HTML"""
+    for start in range(0, len(html), CACHE_REPLAY_CHUNK_SIZE):
+        yield _sse_data({'content': html[start:start + CACHE_REPLAY_CHUNK_SIZE]})
+    yield "data: [DONE]\n\n"
+
+async def wait_for_admission(ticket: AdmissionTicket):
+    """排队等待上游并发名额，期间定期下发排队位置；超时未轮到时撤销排队（ticket.timed_out）并下发错误"""
+    waited = 0
+    while not ticket.granted:
+        if waited >= settings.ai_queue_timeout_seconds:
+            # 先撤销再下发：挂起在 yield 期间名额空出来也不会再放行这个请求
+            ai_admission.abandon(ticket)
+            yield _sse_data({'error': 'AI 服务繁忙，排队超时，请稍后重试'})
+            return
+        yield _sse_data({'type': 'queued', 'position': ai_admission.position(ticket)})
+        await ticket.wait(QUEUE_STATUS_INTERVAL)
+        waited += QUEUE_STATUS_INTERVAL
+
+def deduct_ai_generate(membership_id: int, limit: int) -> bool:
+    """扣减一次 AI 生成次数（独立会话）；条件更新，排队期间并发的请求不会超出上限，已用完时返回 False"""
+    db = SessionLocal()
+    try:
+        query = db.query(Membership).filter(Membership.id == membership_id)
+        if limit != -1:
+            query = query.filter(Membership.ai_generates_used < limit)
+        updated = query.update({
+            Membership.ai_generates_used: Membership.ai_generates_used + 1,
+            Membership.ai_generates_total: Membership.ai_generates_total + 1,
+        }, synchronize_session=False)
+        db.commit()
+        return updated == 1
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
 def extract_colors_from_description(description: str) -> List[str]:
     color_keywords = {
@@ -107,57 +167,6 @@ def extract_colors_from_description(description: str) -> List[str]:
 
 
 
-def extract_html_content(text: str) -> str:
-    """从 AI 响应中提取 HTML 内容"""
-    if not text:
-        return ""
-    cleaned_text = text.replace("```html", "").replace("```", "").strip()
-    root_match = re.search(r'<div\s+id=["\']template-root["\'][^>]*>', cleaned_text, re.IGNORECASE)
-    if root_match:
-        start_idx = root_match.start()
-        end_idx = _find_matching_closing_tag(cleaned_text, start_idx)
-        if end_idx != -1:
-            return cleaned_text[start_idx:end_idx + 6]
-        else:
-            return cleaned_text[start_idx:]
-    div_match = re.search(r'<div[^>]*>', cleaned_text, re.IGNORECASE)
-    if div_match:
-        start_idx = div_match.start()
-        end_idx = _find_matching_closing_tag(cleaned_text, start_idx)
-        if end_idx != -1:
-            return cleaned_text[start_idx:end_idx + 6]
-        return cleaned_text[start_idx:]
-    return cleaned_text
-
-def _find_matching_closing_tag(html: str, start_idx: int) -> int:
-    depth = 1
-    i = start_idx
-    while i < len(html) and html[i] != '>':
-        i += 1
-    i += 1
-    while i < len(html):
-        div_match = re.search(r'</?div[^>]*>', html[i:], re.IGNORECASE)
-        if not div_match: break
-        match_start = i + div_match.start()
-        match_end = i + div_match.end()
-        if html[match_start + 1] == '/':
-            depth -= 1
-            if depth == 0: return match_end
-        else:
-            depth += 1
-        i = match_end
-    return -1
-
-def validate_generated_html(html: str) -> Tuple[bool, str]:
-    if not html or not html.strip():
-        return False, "生成的HTML内容为空"
-    if len(html.strip()) < 200:
-        return False, "生成的HTML内容过短"
-    if not re.search(r'<div\s+id=["\']template-root["\']', html, re.IGNORECASE):
-        if not re.search(r'<div[^>]*>', html, re.IGNORECASE):
-            return False, "缺少必需的div容器"
-    return True, ""
-
 def build_traditional_user_prompt(description: str, available_fields: List[FieldInfo] = None) -> str:
     fields_info = ""
     if available_fields:
@@ -313,15 +322,19 @@ def build_prompts(request: GenerateTemplateRequest) -> Tuple[str, str]:
         return build_design_system_prompt(), build_user_prompt(request)
 
 @router.post("/generate-template-stream")
-async def generate_template_stream(request: GenerateTemplateRequest, db: Session = Depends(get_db)):
+async def generate_template_stream(
+    request: GenerateTemplateRequest,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
     """生成模板（流式）- 纯 HTML 生成模式"""
     
-    # 权限检查与配额扣减
-    user = db.query(User).filter(User.feishu_user_id == request.feishu_user_id).first()
-    if not user or not user.membership:
+    # 权限检查（次数在排队轮到后扣减，见 event_generator）；token 属于同一用户时不再查询 users 表
+    user_id = get_user_id(db, request.feishu_user_id, identity)
+    membership = db.query(Membership).filter(Membership.user_id == user_id).first()
+    if not membership:
         raise HTTPException(status_code=403, detail="用户不存在或未初始化")
         
-    membership = user.membership
     reset_usage_if_needed(membership, db)
     
     plan_limits = PLAN_LIMITS.get(membership.plan_type, PLAN_LIMITS["free"])
@@ -329,32 +342,53 @@ async def generate_template_stream(request: GenerateTemplateRequest, db: Session
     
     if limit != -1 and membership.ai_generates_used >= limit:
         raise HTTPException(status_code=403, detail=f"AI生成次数已用完（{limit}次/月），请升级会员")
-        
-    # 扣减次数（预扣减）
-    try:
-        membership.ai_generates_used += 1
-        membership.ai_generates_total += 1
-        db.commit()
-    except Exception as e:
-        db.rollback()
-        logger.error(f"扣减AI次数失败: {e}")
-        raise HTTPException(status_code=500, detail="系统繁忙，请重试")
 
-    async def event_generator():
+    # 生成缓存：命中时直接回放，不调用模型、不扣减次数；未命中时生成结果写入缓存
+    cache_key = None
+    if settings.ai_generation_cache_enabled and request.useCache:
+        cache_key = generation_cache_key(
+            request.description, request.mode, [f.name for f in request.availableFields], settings.ai_model
+        )
+        cached_html = lookup_generation(db, cache_key)
+        if cached_html is not None:
+            return StreamingResponse(
+                replay_cached_generation(cached_html),
+                media_type="text/event-stream",
+                headers={"X-AI-Cache": "hit"}
+            )
+
+    # 排队也已满时直接拒绝，不扣减次数
+    if ai_admission.is_full():
+        raise HTTPException(status_code=503, detail="AI 服务繁忙，请稍后重试")
+    plan_type = membership.plan_type
+    membership_id = membership.id
+
+    async def upstream_events():
         retry_count = 0
         max_retries = MAX_RETRY_ATTEMPTS
+        retry_message = None
+        hint_rules = []  # 之前的尝试违反过的规则，重试时写入纠正提示
         
         while retry_count <= max_retries:
             buffer = ""
             has_started = False
-            full_content = ""
+            # 边接收边提取，流结束时 template-root 的边界已经确定，无需再解析全文
+            extractor = IncrementalHtmlExtractor()
+            validator = StreamingOutputValidator() if settings.ai_stream_validation_enabled else None
+            # 攒够时间或字节数再合并为一帧下发，减少 SSE 帧数和 json.dumps 次数
+            coalescer = DeltaCoalescer(settings.ai_stream_flush_ms, settings.ai_stream_flush_bytes)
+            violation = None
             
             try:
                 client = get_ai_client()
                 sys_p, usr_p = build_prompts(request)
+                if hint_rules:
+                    usr_p += corrective_hint(hint_rules)
                 
                 if retry_count > 0:
-                    yield f"data: {json.dumps({'type': 'retry', 'message': f'正在重试生成（第{retry_count}次）...'}, ensure_ascii=False)}\n\n"
+                    # 重试从头生成，插件收到后清空已接收的内容
+                    yield _sse_data({'type': 'retry', 'message': retry_message or f'正在重试生成（第{retry_count}次）...'})
+                    retry_message = None
                 
                 stream = await client.chat.completions.create(
                     model=settings.ai_model,
@@ -367,34 +401,73 @@ async def generate_template_stream(request: GenerateTemplateRequest, db: Session
                 if retry_count == 0:  # 只在第一次尝试时记录
                     logger.debug(f"Stream started")
                 
-                async for chunk in stream:
+                # 上游停顿时按时下发攒着的内容（chunk 为 None）
+                async for chunk in read_with_flush_deadline(stream, coalescer):
+                    if chunk is None:
+                        pending = coalescer.flush()
+                        if pending:
+                            yield _sse_data({'content': pending})
+                        continue
                     if chunk.choices and chunk.choices[0].delta.content:
                         content = chunk.choices[0].delta.content
                         if not has_started and content.strip():
                             has_started = True
                         
-                        buffer += content
                         if has_started:
-                            yield f"data: {json.dumps({'content': content}, ensure_ascii=False)}\n\n"
-                            full_content += content
-                        elif "<div" in buffer or len(buffer) > STREAM_BUFFER_THRESHOLD:
+                            piece = content
+                        else:
+                            buffer += content
+                            if "<div" not in buffer and len(buffer) <= STREAM_BUFFER_THRESHOLD:
+                                continue
                             has_started = True
-                            yield f"data: {json.dumps({'content': buffer}, ensure_ascii=False)}\n\n"
-                            full_content += buffer
-                            buffer = ""
+                            piece, buffer = buffer, ""
+
+                        # 还有重试机会时，命中硬性规则立即中断，不再为不可用的输出付费
+                        violation = validator.feed(piece) if validator else None
+                        if violation and retry_count < max_retries:
+                            break
+                        violation = None
+                        extractor.feed(piece)
+                        pending = coalescer.push(piece)
+                        if pending:
+                            yield _sse_data({'content': pending})
+
+                if violation:
+                    await stream.close()
+                    output_validation_stats.record_stream(validator, aborted=True)
+                    logger.warning(
+                        f"[ai-validate] 输出违反规则 {violation.name}（已接收 {validator.received} 字符），中断并重新生成"
+                    )
+                    hint_rules += [rule for rule in validator.violations if rule not in hint_rules]
+                    retry_count += 1
+                    retry_message = f'生成内容使用了禁止的 {violation.description}，正在按规范重新生成...'
+                    continue
 
                 if buffer and not has_started:
-                     yield f"data: {json.dumps({'content': buffer}, ensure_ascii=False)}\n\n"
-                     full_content += buffer
+                     extractor.feed(buffer)
+                     if validator:
+                         validator.feed(buffer)
+                     pending = buffer
+                else:
+                     pending = coalescer.flush()
+                if pending:
+                    yield _sse_data({'content': pending})
                 
-                if full_content:
-                    extracted_html = extract_html_content(full_content)
-                    if not extracted_html:
-                        extracted_html = full_content.replace("```html", "").replace("```", "").strip()
+                if extractor.received:
+                    extracted_html = extractor.result()
                     
-                    is_valid, error_msg = validate_generated_html(extracted_html)
+                    is_valid, error_msg, failed_rule = validate_generated_html(extracted_html)
+                    output_validation_stats.record_final(failed_rule)
+                    if validator:
+                        output_validation_stats.record_stream(validator, aborted=False)
+                        if is_valid and validator.violations:
+                            # 最后一次尝试不再中断，但违规的结果不写入缓存
+                            is_valid = False
+                            error_msg = "、".join(rule.description for rule in validator.violations)
                     if not is_valid:
                         logger.warning(f"Validation failed: {error_msg}")
+                    elif cache_key:
+                        await asyncio.to_thread(store_generation, cache_key, request.mode, extracted_html)
                     
                     yield "data: [DONE]\n\n"
                     return
@@ -405,7 +478,30 @@ async def generate_template_stream(request: GenerateTemplateRequest, db: Session
                 logger.error(f"Error: {e}")
                 retry_count += 1
                 if retry_count > max_retries:
-                     yield f"data: {json.dumps({'error': str(e)}, ensure_ascii=False)}\n\n"
+                     yield _sse_data({'error': str(e)})
                 await asyncio.sleep(1)
 
+    async def event_generator():
+        # 重试期间保持占用名额；生成结束、失败或客户端断开时释放
+        ticket = ai_admission.enqueue(plan_type)
+        try:
+            async for event in wait_for_admission(ticket):
+                yield event
+            if ticket.timed_out:
+                return
+            # 轮到后才扣减次数：排队超时或排队期间客户端断开不计次
+            try:
+                deducted = await asyncio.to_thread(deduct_ai_generate, membership_id, limit)
+            except Exception as e:
+                logger.error(f"扣减AI次数失败: {e}")
+                yield _sse_data({'error': '系统繁忙，请重试'})
+                return
+            if not deducted:
+                yield _sse_data({'error': f'AI生成次数已用完（{limit}次/月），请升级会员'})
+                return
+            async for event in upstream_events():
+                yield event
+        finally:
+            ai_admission.release(ticket)
+
     return StreamingResponse(event_generator(), media_type="text/event-stream")
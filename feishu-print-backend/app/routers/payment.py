@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 import logging
 import random
 import string
+from app.auth import RequestIdentity, get_request_identity, get_user_id
 from app.database import get_db
 from app.models.user import User, Membership, Order, OrderStatus
 from app.models.plan import MembershipPlan
@@ -120,7 +121,11 @@ async def get_plans(db: Session = Depends(get_db)):
 
 
 @router.post("/create-order", response_model=OrderResponse)
-async def create_order(request: CreateOrderRequest, db: Session = Depends(get_db)):
+async def create_order(
+    request: CreateOrderRequest,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
     """创建订单"""
     try:
         # 验证计划类型
@@ -129,10 +134,8 @@ async def create_order(request: CreateOrderRequest, db: Session = Depends(get_db
         if not plan:
             raise HTTPException(status_code=400, detail="无效的会员计划类型")
         
-        # 获取用户
-        user = db.query(User).filter(User.feishu_user_id == request.feishu_user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="用户不存在")
+        # 获取用户（token 属于同一用户时直接取自声明）
+        user_id = get_user_id(db, request.feishu_user_id, identity)
         
         # 生成订单号
         order_no = generate_order_no()
@@ -140,7 +143,7 @@ async def create_order(request: CreateOrderRequest, db: Session = Depends(get_db
         # 创建订单
         order = Order(
             order_no=order_no,
-            user_id=user.id,
+            user_id=user_id,
             plan_type=request.plan_type,
             plan_name=plan["name"],  # 设置计划名称
             amount=plan["price"],
@@ -170,7 +173,9 @@ async def create_order(request: CreateOrderRequest, db: Session = Depends(get_db
         raise HTTPException(status_code=500, detail=f"创建订单失败: {str(e)}")
 
 
-async def _create_alipay_native_pay(request: CreateOrderRequest, db: Session):
+async def _create_alipay_native_pay(
+    request: CreateOrderRequest, db: Session, identity: Optional[RequestIdentity] = None
+):
     """创建支付宝扫码支付订单（内部实现，不对外暴露路由）"""
     try:
         # 验证计划类型
@@ -179,10 +184,8 @@ async def _create_alipay_native_pay(request: CreateOrderRequest, db: Session):
         if not plan:
             raise HTTPException(status_code=400, detail="无效的会员计划类型")
         
-        # 获取用户
-        user = db.query(User).filter(User.feishu_user_id == request.feishu_user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="用户不存在")
+        # 获取用户（token 属于同一用户时直接取自声明）
+        user_id = get_user_id(db, request.feishu_user_id, identity)
         
         # 生成订单号
         order_no = generate_order_no()
@@ -190,7 +193,7 @@ async def _create_alipay_native_pay(request: CreateOrderRequest, db: Session):
         # 创建订单
         order = Order(
             order_no=order_no,
-            user_id=user.id,
+            user_id=user_id,
             plan_type=request.plan_type,
             plan_name=plan["name"],
             amount=plan["price"],
@@ -250,13 +253,17 @@ async def _create_alipay_native_pay(request: CreateOrderRequest, db: Session):
 # === 新对外接口（与前端约定）===
 # 创建订单: POST /api/payment/alipay/create
 @router.post("/alipay/create", response_model=NativePayResponse)
-async def alipay_create(request: CreateOrderRequest, db: Session = Depends(get_db)):
+async def alipay_create(
+    request: CreateOrderRequest,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
     """
     创建支付宝/YunGouOS 扫码支付订单（对外统一入口）。
 
     返回结构与旧接口保持一致（旧接口路由已移除）。
     """
-    return await _create_alipay_native_pay(request=request, db=db)
+    return await _create_alipay_native_pay(request=request, db=db, identity=identity)
 
 
 @router.post("/alipay/notify")
@@ -411,13 +418,15 @@ async def _get_order_status(order_no: str, db: Session):
 
 
 @router.get("/orders")
-async def get_orders(feishu_user_id: str, db: Session = Depends(get_db)):
+async def get_orders(
+    feishu_user_id: str,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
     """获取订单列表"""
-    user = db.query(User).filter(User.feishu_user_id == feishu_user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="用户不存在")
+    user_id = get_user_id(db, feishu_user_id, identity)
     
-    orders = db.query(Order).filter(Order.user_id == user.id).order_by(Order.created_at.desc()).all()
+    orders = db.query(Order).filter(Order.user_id == user_id).order_by(Order.created_at.desc()).all()
     
     return {
         "orders": [
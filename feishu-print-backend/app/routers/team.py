@@ -8,7 +8,9 @@ import logging
 from app.database import get_db
 from app.models.user import User, Membership, PlanType
 from app.models.team import Team, TeamMember, TeamInvite, TeamTemplate, TeamRole, InviteStatus
-from app.models.template import Template
+from app.models.template import Template, not_deleted
+from app.auth import RequestIdentity, get_request_identity, get_user_id
+from app.services.template_access import template_access_cache
 
 logger = logging.getLogger(__name__)
 
@@ -91,11 +93,11 @@ def get_user_by_feishu_id(db: Session, feishu_user_id: str) -> User:
     return user
 
 
-def check_team_permission(db: Session, user: User, team: Team, require_admin: bool = False):
+def check_team_permission(db: Session, user_id: int, team: Team, require_admin: bool = False):
     """检查用户是否有团队权限"""
     member = db.query(TeamMember).filter(
         TeamMember.team_id == team.id,
-        TeamMember.user_id == user.id
+        TeamMember.user_id == user_id
     ).first()
     
     if not member:
@@ -113,14 +115,15 @@ def check_team_permission(db: Session, user: User, team: Team, require_admin: bo
 async def create_team(
     request: CreateTeamRequest,
     feishu_user_id: str,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
     db: Session = Depends(get_db)
 ):
     """创建团队"""
     try:
-        user = get_user_by_feishu_id(db, feishu_user_id)
+        user_id = get_user_id(db, feishu_user_id, identity)
         
         # 检查用户是否已拥有团队
-        existing_team = db.query(Team).filter(Team.owner_id == user.id).first()
+        existing_team = db.query(Team).filter(Team.owner_id == user_id).first()
         if existing_team:
             raise HTTPException(status_code=400, detail="您已拥有一个团队")
         
@@ -128,7 +131,7 @@ async def create_team(
         team = Team(
             name=request.name,
             description=request.description,
-            owner_id=user.id,
+            owner_id=user_id,
             max_members=5
         )
         db.add(team)
@@ -137,7 +140,7 @@ async def create_team(
         # 将创建者添加为团队所有者
         owner_member = TeamMember(
             team_id=team.id,
-            user_id=user.id,
+            user_id=user_id,
             role=TeamRole.OWNER
         )
         db.add(owner_member)
@@ -162,12 +165,16 @@ async def create_team(
 
 
 @router.get("/my-team", response_model=Optional[TeamResponse])
-async def get_my_team(feishu_user_id: str, db: Session = Depends(get_db)):
+async def get_my_team(
+    feishu_user_id: str,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
     """获取我所在的团队"""
-    user = get_user_by_feishu_id(db, feishu_user_id)
+    user_id = get_user_id(db, feishu_user_id, identity)
     
     # 查找用户所在的团队
-    member = db.query(TeamMember).filter(TeamMember.user_id == user.id).first()
+    member = db.query(TeamMember).filter(TeamMember.user_id == user_id).first()
     if not member:
         return None
     
@@ -189,15 +196,16 @@ async def get_my_team(feishu_user_id: str, db: Session = Depends(get_db)):
 async def get_team_members(
     team_id: int,
     feishu_user_id: str,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
     db: Session = Depends(get_db)
 ):
     """获取团队成员列表"""
-    user = get_user_by_feishu_id(db, feishu_user_id)
+    user_id = get_user_id(db, feishu_user_id, identity)
     team = db.query(Team).filter(Team.id == team_id).first()
     if not team:
         raise HTTPException(status_code=404, detail="团队不存在")
     
-    check_team_permission(db, user, team)
+    check_team_permission(db, user_id, team)
     
     from sqlalchemy.orm import joinedload
     members = db.query(TeamMember).options(joinedload(TeamMember.user)).filter(TeamMember.team_id == team_id).all()
@@ -223,15 +231,16 @@ async def invite_member(
     team_id: int,
     request: InviteMemberRequest,
     feishu_user_id: str,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
     db: Session = Depends(get_db)
 ):
     """邀请成员加入团队"""
-    user = get_user_by_feishu_id(db, feishu_user_id)
+    user_id = get_user_id(db, feishu_user_id, identity)
     team = db.query(Team).filter(Team.id == team_id).first()
     if not team:
         raise HTTPException(status_code=404, detail="团队不存在")
     
-    check_team_permission(db, user, team, require_admin=True)
+    check_team_permission(db, user_id, team, require_admin=True)
     
     # 检查团队人数限制
     member_count = db.query(TeamMember).filter(TeamMember.team_id == team_id).count()
@@ -253,7 +262,7 @@ async def invite_member(
     invite_code = secrets.token_urlsafe(16)
     invite = TeamInvite(
         team_id=team_id,
-        inviter_id=user.id,
+        inviter_id=user_id,
         invitee_feishu_id=request.invitee_feishu_id,
         invite_code=invite_code,
         expires_at=datetime.now() + timedelta(days=7)
@@ -268,10 +277,14 @@ async def invite_member(
 
 
 @router.post("/accept-invite")
-async def accept_invite(request: AcceptInviteRequest, db: Session = Depends(get_db)):
+async def accept_invite(
+    request: AcceptInviteRequest,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
     """接受团队邀请"""
     try:
-        user = get_user_by_feishu_id(db, request.feishu_user_id)
+        user_id = get_user_id(db, request.feishu_user_id, identity)
         
         # 查找邀请（支持通用邀请码和指定用户的邀请码）
         invite = db.query(TeamInvite).filter(
@@ -292,7 +305,7 @@ async def accept_invite(request: AcceptInviteRequest, db: Session = Depends(get_
             raise HTTPException(status_code=400, detail="邀请已过期")
         
         # 检查用户是否已在其他团队
-        existing_member = db.query(TeamMember).filter(TeamMember.user_id == user.id).first()
+        existing_member = db.query(TeamMember).filter(TeamMember.user_id == user_id).first()
         if existing_member:
             raise HTTPException(status_code=400, detail="您已在其他团队中，请先退出当前团队")
         
@@ -305,13 +318,14 @@ async def accept_invite(request: AcceptInviteRequest, db: Session = Depends(get_
         # 加入团队
         member = TeamMember(
             team_id=team.id,
-            user_id=user.id,
+            user_id=user_id,
             role=TeamRole.MEMBER
         )
         db.add(member)
         
         invite.status = InviteStatus.ACCEPTED
         db.commit()
+        template_access_cache.invalidate_users([user_id])
         
         return {"success": True, "team_name": team.name}
     except HTTPException:
@@ -327,16 +341,17 @@ async def remove_member(
     team_id: int,
     member_id: int,
     feishu_user_id: str,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
     db: Session = Depends(get_db)
 ):
     """移除团队成员"""
     try:
-        user = get_user_by_feishu_id(db, feishu_user_id)
+        user_id = get_user_id(db, feishu_user_id, identity)
         team = db.query(Team).filter(Team.id == team_id).first()
         if not team:
             raise HTTPException(status_code=404, detail="团队不存在")
         
-        operator = check_team_permission(db, user, team, require_admin=True)
+        operator = check_team_permission(db, user_id, team, require_admin=True)
         
         member = db.query(TeamMember).filter(
             TeamMember.id == member_id,
@@ -349,8 +364,10 @@ async def remove_member(
         if member.role == TeamRole.OWNER:
             raise HTTPException(status_code=400, detail="无法移除团队所有者")
         
+        removed_user_id = member.user_id
         db.delete(member)
         db.commit()
+        template_access_cache.invalidate_users([removed_user_id])
         
         return {"success": True, "message": "已成功移除成员"}
     except HTTPException:
@@ -362,17 +379,22 @@ async def remove_member(
 
 
 @router.post("/{team_id}/leave")
-async def leave_team(team_id: int, feishu_user_id: str, db: Session = Depends(get_db)):
+async def leave_team(
+    team_id: int,
+    feishu_user_id: str,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
     """退出团队"""
     try:
-        user = get_user_by_feishu_id(db, feishu_user_id)
+        user_id = get_user_id(db, feishu_user_id, identity)
         team = db.query(Team).filter(Team.id == team_id).first()
         if not team:
             raise HTTPException(status_code=404, detail="团队不存在")
         
         member = db.query(TeamMember).filter(
             TeamMember.team_id == team_id,
-            TeamMember.user_id == user.id
+            TeamMember.user_id == user_id
         ).first()
         
         if not member:
@@ -383,6 +405,7 @@ async def leave_team(team_id: int, feishu_user_id: str, db: Session = Depends(ge
         
         db.delete(member)
         db.commit()
+        template_access_cache.invalidate_users([user_id])
         
         return {"success": True, "message": "已成功退出团队"}
     except HTTPException:
@@ -399,16 +422,17 @@ async def update_member_role(
     member_id: int,
     request: UpdateMemberRoleRequest,
     feishu_user_id: str,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
     db: Session = Depends(get_db)
 ):
     """更新成员角色"""
     try:
-        user = get_user_by_feishu_id(db, feishu_user_id)
+        user_id = get_user_id(db, feishu_user_id, identity)
         team = db.query(Team).filter(Team.id == team_id).first()
         if not team:
             raise HTTPException(status_code=404, detail="团队不存在")
         
-        operator = check_team_permission(db, user, team)
+        operator = check_team_permission(db, user_id, team)
         if operator.role != TeamRole.OWNER:
             raise HTTPException(status_code=403, detail="只有团队所有者可以更改成员角色")
         
@@ -445,23 +469,24 @@ async def update_member_role(
 async def dissolve_team(
     team_id: int,
     feishu_user_id: str,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
     db: Session = Depends(get_db)
 ):
     """解散团队（仅团队所有者可以操作）"""
     try:
-        user = get_user_by_feishu_id(db, feishu_user_id)
+        user_id = get_user_id(db, feishu_user_id, identity)
         team = db.query(Team).filter(Team.id == team_id).first()
         if not team:
             raise HTTPException(status_code=404, detail="团队不存在")
         
         # 检查是否为团队所有者
-        if team.owner_id != user.id:
+        if team.owner_id != user_id:
             raise HTTPException(status_code=403, detail="只有团队所有者可以解散团队")
         
         # 验证用户确实是团队成员（双重检查）
         member = db.query(TeamMember).filter(
             TeamMember.team_id == team_id,
-            TeamMember.user_id == user.id,
+            TeamMember.user_id == user_id,
             TeamMember.role == TeamRole.OWNER
         ).first()
         
@@ -471,9 +496,14 @@ async def dissolve_team(
         # 先删除所有相关的邀请记录（避免外键约束错误）
         db.query(TeamInvite).filter(TeamInvite.team_id == team_id).delete()
         
+        member_user_ids = [
+            row.user_id for row in db.query(TeamMember.user_id).filter(TeamMember.team_id == team_id)
+        ]
+        
         # 删除团队（级联删除会同时删除所有成员和共享模板）
         db.delete(team)
         db.commit()
+        template_access_cache.invalidate_users(member_user_ids)
         
         return {"success": True, "message": "团队已成功解散"}
     except HTTPException:
@@ -489,17 +519,18 @@ async def transfer_ownership(
     team_id: int,
     new_owner_member_id: int,
     feishu_user_id: str,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
     db: Session = Depends(get_db)
 ):
     """转让团队所有权"""
     try:
-        user = get_user_by_feishu_id(db, feishu_user_id)
+        user_id = get_user_id(db, feishu_user_id, identity)
         team = db.query(Team).filter(Team.id == team_id).first()
         if not team:
             raise HTTPException(status_code=404, detail="团队不存在")
         
         # 检查是否为团队所有者
-        if team.owner_id != user.id:
+        if team.owner_id != user_id:
             raise HTTPException(status_code=403, detail="只有团队所有者可以转让所有权")
         
         # 查找新所有者成员
@@ -511,7 +542,7 @@ async def transfer_ownership(
         if not new_owner_member:
             raise HTTPException(status_code=404, detail="新所有者成员不存在")
         
-        if new_owner_member.user_id == user.id:
+        if new_owner_member.user_id == user_id:
             raise HTTPException(status_code=400, detail="不能将所有权转让给自己")
         
         # 更新团队所有者
@@ -520,7 +551,7 @@ async def transfer_ownership(
         # 更新成员角色：原所有者变为管理员，新所有者变为所有者
         old_owner_member = db.query(TeamMember).filter(
             TeamMember.team_id == team_id,
-            TeamMember.user_id == user.id
+            TeamMember.user_id == user_id
         ).first()
         
         if old_owner_member:
@@ -546,18 +577,19 @@ async def share_template(
     team_id: int,
     request: ShareTemplateRequest,
     feishu_user_id: str,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
     db: Session = Depends(get_db)
 ):
     """共享模版到团队"""
-    user = get_user_by_feishu_id(db, feishu_user_id)
+    user_id = get_user_id(db, feishu_user_id, identity)
     team = db.query(Team).filter(Team.id == team_id).first()
     if not team:
         raise HTTPException(status_code=404, detail="团队不存在")
     
-    check_team_permission(db, user, team)
+    check_team_permission(db, user_id, team)
     
     # 检查模版是否存在
-    template = db.query(Template).filter(Template.id == request.template_id).first()
+    template = db.query(Template).filter(Template.id == request.template_id, not_deleted()).first()
     if not template:
         raise HTTPException(status_code=404, detail="模版不存在")
     
@@ -573,11 +605,12 @@ async def share_template(
     team_template = TeamTemplate(
         team_id=team_id,
         template_id=request.template_id,
-        shared_by_id=user.id,
+        shared_by_id=user_id,
         can_edit=request.can_edit
     )
     db.add(team_template)
     db.commit()
+    template_access_cache.invalidate_template(request.template_id)
     
     return {"success": True}
 
@@ -586,15 +619,16 @@ async def share_template(
 async def get_team_templates(
     team_id: int,
     feishu_user_id: str,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
     db: Session = Depends(get_db)
 ):
     """获取团队共享模版列表"""
-    user = get_user_by_feishu_id(db, feishu_user_id)
+    user_id = get_user_id(db, feishu_user_id, identity)
     team = db.query(Team).filter(Team.id == team_id).first()
     if not team:
         raise HTTPException(status_code=404, detail="团队不存在")
     
-    check_team_permission(db, user, team)
+    check_team_permission(db, user_id, team)
     
     from sqlalchemy.orm import joinedload
     team_templates = db.query(TeamTemplate).options(
@@ -604,6 +638,9 @@ async def get_team_templates(
     
     result = []
     for tt in team_templates:
+        # 已删除（等待清理）的模板不再展示
+        if tt.template.deleted_at is not None:
+            continue
         result.append(TeamTemplateResponse(
             id=tt.id,
             template_id=tt.template_id,
@@ -621,15 +658,16 @@ async def unshare_template(
     team_id: int,
     team_template_id: int,
     feishu_user_id: str,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
     db: Session = Depends(get_db)
 ):
     """取消共享模版"""
-    user = get_user_by_feishu_id(db, feishu_user_id)
+    user_id = get_user_id(db, feishu_user_id, identity)
     team = db.query(Team).filter(Team.id == team_id).first()
     if not team:
         raise HTTPException(status_code=404, detail="团队不存在")
     
-    check_team_permission(db, user, team, require_admin=True)
+    check_team_permission(db, user_id, team, require_admin=True)
     
     team_template = db.query(TeamTemplate).filter(
         TeamTemplate.id == team_template_id,
@@ -639,7 +677,9 @@ async def unshare_template(
     if not team_template:
         raise HTTPException(status_code=404, detail="共享记录不存在")
     
+    template_id = team_template.template_id
     db.delete(team_template)
     db.commit()
+    template_access_cache.invalidate_template(template_id)
     
     return {"success": True}
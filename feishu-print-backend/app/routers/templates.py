@@ -1,199 +1,1000 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import HTMLResponse, StreamingResponse
+from sqlalchemy import case
+from sqlalchemy.dialects.mysql import match as mysql_match
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, load_only
 from typing import List, Optional
-from ..database import get_db
-from ..models.template import Template as TemplateModel
-from ..models.user import User
-from ..schemas.template import Template, TemplateCreate, TemplateUpdate
-from ..auth import get_current_user_optional
+from datetime import datetime
+import base64
+import heapq
+import json
+import logging
+from ..database import get_db, SessionLocal
+from ..models.template import Template as TemplateModel, defer_content, not_deleted
+from ..models.team import TeamTemplate, TeamMember
+from ..models.template_stats import TemplateStats
+from ..models.template_blob import TemplateBlob
+from ..schemas.template import (
+    Template, TemplateCreate, TemplateUpdate, TemplateSummary, TemplateContent,
+    TemplateVersionInfo, TemplateVersionDetail, TemplateBatchRequest, TemplateBatchResponse,
+    TemplateFieldMatchRequest, TemplateFieldMatch, TemplateChangeItem, TemplateChangesResponse,
+    TemplateUsageEvent, TemplateUsage
+)
+from ..auth import RequestIdentity, get_request_identity
+from ..services.template_content import (
+    compute_content_hash, make_etag, combine_etag, etag_matches, accepts_gzip
+)
+from ..services.template_text import build_search_text
+from ..services.template_access import resolve_template_access
+from ..services.template_preview import (
+    PREVIEW_MEDIA_TYPE, read_preview, render_and_store_preview, generate_preview, generate_previews
+)
+from ..services.template_changes import (
+    CHANGE_DELETE, CHANGE_UPSERT, record_template_change, latest_change_id, list_changes_since
+)
+from ..services.template_fields import sync_template_fields, rank_templates_by_fields
+from ..services.template_batch import (
+    batch_upsert_templates, batch_response, validate_batch_request, preview_jobs
+)
+from ..services.template_versions import template_state, record_version, list_versions, materialize_version
+from ..services.template_forks import write_template_content
+from ..services.template_blobs import preload_blobs, stored_gzip_body
+from ..services.template_normalize import UnknownStyleClassError, normalize_template_html
+from ..services.template_names import is_name_conflict, next_free_name
+from ..services.template_stats import template_stats_buffer, USAGE_EVENTS, EVENT_OPEN
+from ..services.system_template_cache import system_template_cache, CachedTemplate
+
+logger = logging.getLogger(__name__)
+
+# 批量获取正文时单次最多允许的 id 数量
+MAX_CONTENT_BATCH = 100
+# 增量同步单次最多返回的变更记录数
+MAX_CHANGES_PAGE = 1000
+# 单次上报的使用事件最大次数
+MAX_USAGE_EVENT_COUNT = 100
+# 按字段匹配模板时单次最多传入的字段数
+MAX_MATCH_FIELDS = 200
+# 全文搜索：MySQL ngram 默认分词长度为 2，更短的关键词退化为 LIKE
+MIN_FULLTEXT_KEYWORD_LENGTH = 2
+# 分页：单页最大条数，下一页游标通过响应头返回
+MAX_PAGE_SIZE = 200
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# 保存模板时正文规范化前后的字节数
+CONTENT_BYTES_BEFORE_HEADER = "X-Content-Bytes-Before"
+CONTENT_BYTES_AFTER_HEADER = "X-Content-Bytes-After"
+# 自动编号模式下并发保存撞名时最多重新选名的次数
+MAX_NAME_SUFFIX_ATTEMPTS = 3
+# 流式列表：请求头 Accept 包含此类型时逐行输出 NDJSON（每行一个模板）
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# 流式列表每次从数据库取的行数
+STREAM_BATCH_SIZE = 200
 
 router = APIRouter(
     prefix="/api/templates",
     tags=["templates"]
 )
 
-@router.get("/", response_model=List[Template])
-def get_templates(
-    search: Optional[str] = Query(None, description="搜索关键词，支持按模板名称搜索"),
-    template_type: Optional[str] = Query(None, description="模板类型：'normal' 或 'ai'"),
-    owner: Optional[str] = Query(None, description="所有者过滤：'me' 表示只返回当前用户的模板"),
-    current_user: Optional[dict] = Depends(get_current_user_optional),
-    db: Session = Depends(get_db)
+
+def _build_list_query(
+    db: Session,
+    identity: Optional[RequestIdentity],
+    owner: Optional[str],
+    search: Optional[str],
+    template_type: Optional[str],
 ):
-    """获取模板列表（用户自己的模板 + 系统模板）"""
-    import logging
-    logger = logging.getLogger(__name__)
-    
-    user = None
-    if current_user:
-        user = db.query(User).filter(User.feishu_user_id == current_user["sub"]).first()
-    
+    """构建模板列表查询（可见性 + 过滤条件），owner=me 且未登录时返回 None"""
     # 如果请求 owner=me，只返回当前用户自己的非系统模板
     if owner == 'me':
-        if not user:
-            return []
+        if not identity:
+            return None
         query = db.query(TemplateModel).filter(
             TemplateModel.is_system == False,
-            (TemplateModel.owner_id == user.id) | (TemplateModel.owner_id == None)
+            (TemplateModel.owner_id == identity.user_id) | (TemplateModel.owner_id == None)
+        )
+    elif identity:
+        # 查询条件：系统模板 OR 用户自己的模板 OR owner_id为NULL的非系统模板（兼容旧数据）
+        query = db.query(TemplateModel).filter(
+            (TemplateModel.is_system == True) |
+            (TemplateModel.owner_id == identity.user_id) |
+            ((TemplateModel.owner_id == None) & (TemplateModel.is_system == False))
         )
     else:
         # 基础查询：系统模板对所有人可见
         query = db.query(TemplateModel).filter(TemplateModel.is_system == True)
-        
-        # 如果用户已登录，还要包含用户自己的模板
-        if user:
-            # 查询条件：系统模板 OR 用户自己的模板 OR owner_id为NULL的非系统模板（兼容旧数据）
-            query = db.query(TemplateModel).filter(
-                (TemplateModel.is_system == True) | 
-                (TemplateModel.owner_id == user.id) |
-                ((TemplateModel.owner_id == None) & (TemplateModel.is_system == False))
-            )
-        else:
-            if current_user:
-                logger.warning(f"[get_templates] 未找到用户: {current_user.get('sub')}")
-    
+
+    query = query.filter(not_deleted())
+
     if search:
-        # 按模板名称模糊搜索
-        search_filter = TemplateModel.name.ilike(f"%{search}%")
+        # 全文搜索：模板名称 + 占位符字段名 + 可见文本
+        search_filter, _ = _search_expressions(db, search)
         query = query.filter(search_filter)
-    
+
     if template_type:
         # 按模板类型过滤
         query = query.filter(TemplateModel.template_type == template_type)
+
+    return query
+
+
+def _search_expressions(db: Session, search: str):
+    """返回 (过滤条件, 相关度表达式)
+
+    MySQL 下使用 ngram FULLTEXT 索引 MATCH ... AGAINST，按相关度排序；
+    关键词短于 ngram 分词长度或非 MySQL 数据库（本地开发）时退化为 LIKE。
+    """
+    keyword = search.strip()
+    if db.bind.dialect.name == "mysql" and len(keyword) >= MIN_FULLTEXT_KEYWORD_LENGTH:
+        score = mysql_match(
+            TemplateModel.name, TemplateModel.search_text, against=keyword
+        ).in_natural_language_mode()
+        return score > 0, score
+
+    pattern = f"%{keyword}%"
+    name_hit = TemplateModel.name.ilike(pattern)
+    return name_hit | TemplateModel.search_text.ilike(pattern), case((name_hit, 1), else_=0)
+
+
+def _encode_cursor(**position: int) -> str:
+    raw = json.dumps(position, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, key: str = "id") -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))[key]
+        if not isinstance(value, int) or value < 0:
+            raise ValueError(value)
+        return value
+    except Exception:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
+def _page_query(query, limit: Optional[int], cursor: Optional[str]):
+    """按 id 做游标（keyset）分页：WHERE id > :last_id ORDER BY id LIMIT n+1
+
+    只走主键索引范围扫描，任意深度的翻页代价与第一页相同。
+    不传 limit 时保持旧行为，返回全部结果。
+    """
+    if cursor:
+        query = query.filter(TemplateModel.id > _decode_cursor(cursor))
+    query = query.order_by(TemplateModel.id)
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return query
+
+
+def _search_page_query(db: Session, query, search: str, limit: Optional[int], cursor: Optional[str]):
+    """搜索结果按相关度排序；相关度不是单调键，这里的游标记录的是结果序号"""
+    _, score = _search_expressions(db, search)
+    query = query.order_by(score.desc(), TemplateModel.id)
+    if cursor:
+        query = query.offset(_decode_cursor(cursor, "offset"))
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return query
+
+
+def _finish_page(rows: list, limit: Optional[int], response: Response, offset: Optional[int] = None) -> list:
+    """截掉多取的一条，还有下一页时通过 X-Next-Cursor 响应头返回游标"""
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        if offset is None:
+            response.headers[NEXT_CURSOR_HEADER] = _encode_cursor(id=rows[-1].id)
+        else:
+            response.headers[NEXT_CURSOR_HEADER] = _encode_cursor(offset=offset + limit)
+    return rows
+
+
+def _list_etag(rows, view: str) -> str:
+    """根据 id / content_hash 等元数据计算列表级 ETag（rows 可以是查询行或缓存条目）"""
+    return combine_etag([view] + [
+        f"{row.id}:{row.content_hash or row.updated_at}:{row.owner_id}:{int(bool(row.is_system))}"
+        for row in rows
+    ])
+
+
+def _not_modified_response(
+    rows: list,
+    limit: Optional[int],
+    response: Response,
+    if_none_match: Optional[str],
+    view: str,
+    offset: Optional[int] = None,
+) -> Optional[Response]:
+    """设置 ETag / 分页响应头，命中 If-None-Match 时返回 304 响应"""
+    etag = _list_etag(_finish_page(rows, limit, response, offset), view)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=dict(response.headers))
+    return None
+
+
+def _check_list_etag(
+    page_query,
+    limit: Optional[int],
+    response: Response,
+    if_none_match: Optional[str],
+    view: str,
+    offset: Optional[int] = None,
+) -> Optional[Response]:
+    """只查询 id / content_hash 等元数据计算列表级 ETag，命中 If-None-Match 时直接返回 304"""
+    rows = page_query.with_entities(
+        TemplateModel.id,
+        TemplateModel.content_hash,
+        TemplateModel.owner_id,
+        TemplateModel.is_system,
+        TemplateModel.updated_at,
+    ).all()
+    return _not_modified_response(rows, limit, response, if_none_match, view, offset)
+
+
+def _cached_list_response(
+    db: Session,
+    identity: Optional[RequestIdentity],
+    template_type: Optional[str],
+    limit: Optional[int],
+    cursor: Optional[str],
+    response: Response,
+    if_none_match: Optional[str],
+    view: str,
+) -> Response:
+    """系统模板取自进程内缓存（预序列化 JSON），用户模板按请求查询，两者按 id 归并后直接输出字节"""
+    last_id = _decode_cursor(cursor) if cursor else None
+    system_entries = [
+        entry for entry in system_template_cache.get(db)
+        if (not template_type or entry.template_type == template_type)
+        and (last_id is None or entry.id > last_id)
+    ]
+    if limit is not None:
+        system_entries = system_entries[:limit + 1]
+
+    user_meta = []
+    if identity:
+        # owner=me 的查询条件正好是列表中"非系统模板"那一部分
+        user_query = _page_query(_build_list_query(db, identity, 'me', None, template_type), limit, cursor)
+        user_meta = user_query.with_entities(
+            TemplateModel.id,
+            TemplateModel.content_hash,
+            TemplateModel.owner_id,
+            TemplateModel.is_system,
+            TemplateModel.updated_at,
+        ).all()
+
+    merged = list(heapq.merge(system_entries, user_meta, key=lambda row: row.id))
+    if limit is not None:
+        merged = merged[:limit + 1]
+    not_modified = _not_modified_response(merged, limit, response, if_none_match, view)
+    if not_modified:
+        return not_modified
+    page = _finish_page(merged, limit, response)
+
+    schema = Template if view == "full" else TemplateSummary
+    user_ids = [row.id for row in page if not isinstance(row, CachedTemplate)]
+    user_json = {}
+    if user_ids:
+        user_query = db.query(TemplateModel).filter(TemplateModel.id.in_(user_ids))
+        if view != "full":
+            user_query = user_query.options(*defer_content(raiseload=True))
+        user_rows = user_query.all()
+        if view == "full":
+            preload_blobs(db, user_rows)
+        user_json = {
+            row.id: schema.model_validate(row).model_dump_json().encode("utf-8")
+            for row in user_rows
+        }
+
+    parts = []
+    for row in page:
+        if isinstance(row, CachedTemplate):
+            parts.append(row.full_json if view == "full" else row.summary_json)
+        elif row.id in user_json:
+            parts.append(user_json[row.id])
+    return Response(
+        content=b"[" + b",".join(parts) + b"]",
+        media_type="application/json",
+        headers=dict(response.headers),
+    )
+
+
+def _wants_ndjson(accept: Optional[str]) -> bool:
+    return bool(accept) and NDJSON_MEDIA_TYPE in accept.lower()
+
+
+def _preload_fork_parents(db: Session, query) -> list:
+    """流式输出前一次加载派生模板的父模板及其正文（返回值须保持引用，identity map 只持有弱引用）
+
+    MySQL 逐批读取结果时连接被占用，不能再发出查询；父模板提前加载后，还原派生模板只访问 identity map。
+    """
+    parent_ids = query.with_entities(TemplateModel.parent_id).filter(
+        TemplateModel.parent_id != None
+    ).order_by(None).distinct()
+    parents = db.query(TemplateModel).filter(TemplateModel.id.in_(parent_ids.scalar_subquery())).all()
+    preload_blobs(db, parents)
+    for parent in parents:
+        parent.content
+    return parents
+
+
+def _stream_rows(db: Session, query, view: str):
+    """逐批读取模板行，产出 (id, NDJSON 行)；正文随模板行一起 JOIN 出来，不再逐行查询 template_blobs"""
+    if view != "full":
+        query = query.options(*defer_content(raiseload=True))
+        for row in query.yield_per(STREAM_BATCH_SIZE):
+            yield row.id, TemplateSummary.model_validate(row).model_dump_json().encode("utf-8") + b"\n"
+        return
+
+    # 保持父模板的引用直到输出结束
+    parents = _preload_fork_parents(db, query)
+    query = query.outerjoin(TemplateBlob, TemplateBlob.hash == TemplateModel.blob_hash).add_entity(TemplateBlob)
+    for row, _ in query.yield_per(STREAM_BATCH_SIZE):
+        yield row.id, Template.model_validate(row).model_dump_json().encode("utf-8") + b"\n"
+
+
+def _stream_list_response(
+    db: Session,
+    identity: Optional[RequestIdentity],
+    owner: Optional[str],
+    search: Optional[str],
+    template_type: Optional[str],
+    view: str,
+) -> StreamingResponse:
+    """以 NDJSON 流式输出完整列表，边查询边发送，插件可以边接收边渲染
+
+    流式模式下不分页、不计算 ETag。生成器在响应发送期间运行，使用独立的会话（不依赖请求会话的生命周期）。
+    """
+    system_entries = None
+    if not search and owner != 'me':
+        system_entries = [
+            entry for entry in system_template_cache.get(db)
+            if not template_type or entry.template_type == template_type
+        ]
+
+    def generate():
+        stream_db = SessionLocal()
+        try:
+            if system_entries is None:
+                query = _build_list_query(stream_db, identity, owner, search, template_type)
+                if query is None:
+                    return
+                if search:
+                    query = _search_page_query(stream_db, query, search, None, None)
+                else:
+                    query = _page_query(query, None, None)
+                for _, line in _stream_rows(stream_db, query, view):
+                    yield line
+                return
+
+            # 系统模板取自缓存中预序列化的 JSON，与按 id 排序的用户模板归并输出
+            user_lines = iter(())
+            if identity:
+                user_query = _page_query(_build_list_query(stream_db, identity, 'me', None, template_type), None, None)
+                user_lines = _stream_rows(stream_db, user_query, view)
+            system_lines = (
+                (entry.id, (entry.full_json if view == "full" else entry.summary_json) + b"\n")
+                for entry in system_entries
+            )
+            for _, line in heapq.merge(system_lines, user_lines, key=lambda item: item[0]):
+                yield line
+        finally:
+            stream_db.close()
+
+    return StreamingResponse(generate(), media_type=NDJSON_MEDIA_TYPE)
+
+
+def _list_templates(
+    db: Session,
+    identity: Optional[RequestIdentity],
+    owner: Optional[str],
+    search: Optional[str],
+    template_type: Optional[str],
+    limit: Optional[int],
+    cursor: Optional[str],
+    response: Response,
+    if_none_match: Optional[str],
+    view: str,
+    stream: bool = False,
+):
+    """列表接口的公共实现：view 为 'full'（含 content）或 'summary'（不含 content）"""
+    if stream:
+        if limit is not None or cursor:
+            raise HTTPException(status_code=400, detail="NDJSON 流式模式不支持分页参数")
+        return _stream_list_response(db, identity, owner, search, template_type, view)
+    if not search and owner != 'me':
+        return _cached_list_response(db, identity, template_type, limit, cursor, response, if_none_match, view)
+
+    query = _build_list_query(db, identity, owner, search, template_type)
+    if query is None:
+        return []
+
+    offset = None
+    if search:
+        offset = _decode_cursor(cursor, "offset") if cursor else 0
+        page_query = _search_page_query(db, query, search, limit, cursor)
+    else:
+        page_query = _page_query(query, limit, cursor)
+    not_modified = _check_list_etag(page_query, limit, response, if_none_match, view, offset)
+    if not_modified:
+        return not_modified
+
+    if view != "full":
+        # content 延迟加载且禁止隐式加载，保证列表查询不会从 MySQL 读取正文
+        page_query = page_query.options(*defer_content(raiseload=True))
+        return _finish_page(page_query.all(), limit, response, offset)
+    rows = page_query.all()
+    preload_blobs(db, rows)
+    return _finish_page(rows, limit, response, offset)
+
+
+def _refresh_derived_fields(template: TemplateModel) -> None:
+    """模板写入前重新计算派生字段（内容哈希、全文搜索文本）"""
+    template.content_hash = compute_content_hash(template.name, template.content, template.template_type)
+    template.search_text = build_search_text(template.content)
+
+
+def _normalize_content(response: Response, html: str, previous_html: Optional[str] = None) -> str:
+    """保存前规范化正文（见 services/template_normalize.py），前后字节数通过响应头返回"""
+    try:
+        result = normalize_template_html(html, previous_html)
+    except UnknownStyleClassError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    response.headers[CONTENT_BYTES_BEFORE_HEADER] = str(result.bytes_before)
+    response.headers[CONTENT_BYTES_AFTER_HEADER] = str(result.bytes_after)
+    return result.html
+
+
+def _name_conflict_error(name: str) -> HTTPException:
+    return HTTPException(status_code=400, detail=f"模板名称 '{name}' 已存在，请使用其他名称")
+
+
+def _insert_template(db: Session, template: TemplateModel, base_name: str, auto_suffix: bool) -> None:
+    """插入新模板，重名由唯一索引检测（抛出 IntegrityError）；auto_suffix 时改用下一个可用名称重试"""
+    if not auto_suffix:
+        db.add(template)
+        db.flush()
+        return
+    for attempt in range(MAX_NAME_SUFFIX_ATTEMPTS):
+        try:
+            with db.begin_nested():
+                db.add(template)
+                db.flush()
+            return
+        except IntegrityError as e:
+            if not is_name_conflict(e) or attempt == MAX_NAME_SUFFIX_ATTEMPTS - 1:
+                raise
+            # 选名之后被并发请求占用：重新选名
+            template.name = next_free_name(db, template.owner_id, base_name)
+            _refresh_derived_fields(template)
+
+
+def _template_etag(db: Session, template: TemplateModel) -> str:
+    """单个模板的强 ETag；旧数据缺少 content_hash 时补算并回写"""
+    if not template.content_hash:
+        template.content_hash = compute_content_hash(template.name, template.content, template.template_type)
+        db.commit()
+    return make_etag(template.content_hash)
+
+
+def _get_readable_template(
+    db: Session,
+    template_id: int,
+    identity: Optional[RequestIdentity],
+    defer_body: bool = False,
+) -> TemplateModel:
+    """加载模板并校验读权限（系统模板 / 用户自己的模板 / 团队共享给用户的模板）
+
+    defer_body=True 时暂不加载正文，命中 304 的请求不会从 MySQL 读取正文。
+    """
+    user_id = identity.user_id if identity else None
+    options = tuple(defer_content()) if defer_body else ()
+    # 模板与团队共享关系在一条 SQL 中判定（见 services/template_access.py）
+    template, access = resolve_template_access(db, template_id, user_id, options)
+    if not template:
+        raise HTTPException(status_code=404, detail="模板不存在")
+
+    # 检查权限：系统模板 / 所有者 / 团队共享
+    if access is not None:
+        return template
+
+    if not identity:
+        raise HTTPException(status_code=401, detail="需要登录")
+
+    raise HTTPException(status_code=403, detail="无权访问此模板")
+
+
+def _get_writable_template(
+    db: Session,
+    template_id: int,
+    identity: Optional[RequestIdentity],
+) -> TemplateModel:
+    """加载模板并校验写权限（只能修改自己的模板）"""
+    db_template = db.query(TemplateModel).filter(TemplateModel.id == template_id, not_deleted()).first()
+    if not db_template:
+        raise HTTPException(status_code=404, detail="模板不存在")
     
-    templates = query.order_by(TemplateModel.id).all()
+    # 禁止修改系统模板
+    if db_template.is_system:
+        raise HTTPException(status_code=403, detail="系统模板不能修改")
+    
+    # 检查权限：只能修改自己的模板
+    if not identity:
+        raise HTTPException(status_code=401, detail="需要登录")
     
-    return templates
+    # 允许修改：owner_id 匹配，或 owner_id 为空（兼容旧数据，自动认领）
+    if db_template.owner_id is None:
+        db_template.owner_id = identity.user_id
+    elif db_template.owner_id != identity.user_id:
+        raise HTTPException(status_code=403, detail="无权修改此模板")
+    
+    return db_template
 
-from ..models.team import TeamTemplate, TeamMember
+
+@router.get("/", response_model=List[Template])
+def get_templates(
+    response: Response,
+    search: Optional[str] = Query(None, description="搜索关键词，匹配模板名称、占位符字段名和正文文字，按相关度排序"),
+    template_type: Optional[str] = Query(None, description="模板类型：'normal' 或 'ai'"),
+    owner: Optional[str] = Query(None, description="所有者过滤：'me' 表示只返回当前用户的模板"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="每页条数，不传则返回全部"),
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页响应头 X-Next-Cursor"),
+    if_none_match: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None),
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
+    """获取模板列表（用户自己的模板 + 系统模板）；Accept: application/x-ndjson 时流式逐行输出"""
+    return _list_templates(
+        db, identity, owner, search, template_type, limit, cursor, response, if_none_match, "full",
+        stream=_wants_ndjson(accept)
+    )
+
+@router.get("/summary", response_model=List[TemplateSummary])
+def get_template_summaries(
+    response: Response,
+    search: Optional[str] = Query(None, description="搜索关键词，匹配模板名称、占位符字段名和正文文字，按相关度排序"),
+    template_type: Optional[str] = Query(None, description="模板类型：'normal' 或 'ai'"),
+    owner: Optional[str] = Query(None, description="所有者过滤：'me' 表示只返回当前用户的模板"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="每页条数，不传则返回全部"),
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页响应头 X-Next-Cursor"),
+    if_none_match: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None),
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
+    """获取模板元数据列表（不含 content），正文通过 /contents 或 /{id}/content 获取
+
+    Accept: application/x-ndjson 时流式逐行输出。
+    """
+    return _list_templates(
+        db, identity, owner, search, template_type, limit, cursor, response, if_none_match, "summary",
+        stream=_wants_ndjson(accept)
+    )
+
+@router.get("/changes", response_model=TemplateChangesResponse)
+def get_template_changes(
+    since: Optional[str] = Query(None, description="上次同步返回的 cursor；不传时只返回当前游标"),
+    limit: int = Query(500, ge=1, le=MAX_CHANGES_PAGE, description="单次最多返回的变更记录数"),
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
+    """增量同步：返回游标之后新建/修改/删除的模板（删除以墓碑返回）
+
+    首次同步：先不带 since 取得当前游标，再拉取完整列表，之后每次带上游标调用本接口；
+    has_more 为 true 时应立即用新游标继续拉取。
+    """
+    if since is None:
+        return TemplateChangesResponse(changes=[], cursor=_encode_cursor(change=latest_change_id(db)), has_more=False)
+
+    user_id = identity.user_id if identity else None
+    changes, cursor, has_more = list_changes_since(db, _decode_cursor(since, "change"), user_id, limit)
+
+    upsert_ids = [change.template_id for change in changes if change.action == CHANGE_UPSERT]
+    templates = {}
+    if upsert_ids:
+        query = _build_list_query(db, identity, None, None, None)
+        templates = {
+            row.id: row for row in query.options(*defer_content(raiseload=True)).filter(
+                TemplateModel.id.in_(upsert_ids)
+            )
+        }
+
+    items = []
+    for change in changes:
+        template = templates.get(change.template_id)
+        if change.action == CHANGE_UPSERT and template is not None:
+            items.append(TemplateChangeItem(
+                template_id=change.template_id,
+                action=CHANGE_UPSERT,
+                template=TemplateSummary.model_validate(template),
+            ))
+        else:
+            # 已删除（或已不可见）的模板以墓碑返回
+            items.append(TemplateChangeItem(template_id=change.template_id, action=CHANGE_DELETE))
+    return TemplateChangesResponse(changes=items, cursor=_encode_cursor(change=cursor), has_more=has_more)
+
+def _usage_ranking(
+    db: Session,
+    identity: Optional[RequestIdentity],
+    template_type: Optional[str],
+    order_column,
+    limit: int,
+) -> List[TemplateUsage]:
+    """按 template_stats 的索引列排序，只返回列表中可见的模板"""
+    rows = _build_list_query(db, identity, None, None, template_type).options(
+        *defer_content(raiseload=True)
+    ).join(
+        TemplateStats, TemplateStats.template_id == TemplateModel.id
+    ).add_entity(TemplateStats).filter(
+        order_column != None
+    ).order_by(order_column.desc(), TemplateModel.id.desc()).limit(limit).all()
+    return [
+        TemplateUsage(
+            template=TemplateSummary.model_validate(template),
+            use_count=stats.use_count,
+            open_count=stats.open_count,
+            export_count=stats.export_count,
+            backfill_count=stats.backfill_count,
+            last_used_at=stats.last_used_at,
+        )
+        for template, stats in rows
+    ]
+
+@router.get("/popular", response_model=List[TemplateUsage])
+def get_popular_templates(
+    template_type: Optional[str] = Query(None, description="模板类型：'normal' 或 'ai'"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
+    """最常用的模板（按打开 + 导出 + 回填次数降序，统计每隔一段时间写库一次）"""
+    return _usage_ranking(db, identity, template_type, TemplateStats.use_count, limit)
+
+@router.get("/recent", response_model=List[TemplateUsage])
+def get_recent_templates(
+    template_type: Optional[str] = Query(None, description="模板类型：'normal' 或 'ai'"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
+    """最近使用的模板（按最后一次使用时间降序）"""
+    return _usage_ranking(db, identity, template_type, TemplateStats.last_used_at, limit)
+
+@router.get("/contents", response_model=List[TemplateContent])
+def get_template_contents(
+    ids: List[int] = Query(..., description="模板ID列表，例如 ?ids=1&ids=2"),
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
+    """批量获取模板正文（无权访问或不存在的 id 会被忽略）"""
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_CONTENT_BATCH:
+        raise HTTPException(status_code=400, detail=f"单次最多获取 {MAX_CONTENT_BATCH} 个模板")
+
+    # 可见范围与 get_template 一致：系统模板 / 自己的模板 / 团队共享给自己的模板
+    visible = TemplateModel.is_system == True
+    if identity:
+        shared_ids = db.query(TeamTemplate.template_id).join(
+            TeamMember, TeamTemplate.team_id == TeamMember.team_id
+        ).filter(TeamMember.user_id == identity.user_id)
+        visible = visible | (TemplateModel.owner_id == identity.user_id) | TemplateModel.id.in_(shared_ids)
+
+    rows = db.query(TemplateModel).options(
+        load_only(
+            TemplateModel.id, TemplateModel.content_text, TemplateModel.content_gz, TemplateModel.content_encoding,
+            TemplateModel.parent_id, TemplateModel.blob_hash, TemplateModel.content_hash
+        )
+    ).filter(
+        TemplateModel.id.in_(ids),
+        visible,
+        not_deleted()
+    ).order_by(TemplateModel.id).all()
+    preload_blobs(db, rows)
+
+    return [TemplateContent(id=row.id, content=row.content) for row in rows]
+
+@router.post("/match-fields", response_model=List[TemplateFieldMatch])
+def match_templates_by_fields(
+    request: TemplateFieldMatchRequest,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
+    """按字段重合度推荐模板（例如传入多维表格的字段名列表），只查询 template_fields 索引"""
+    if len(request.fields) > MAX_MATCH_FIELDS:
+        raise HTTPException(status_code=400, detail=f"单次最多传入 {MAX_MATCH_FIELDS} 个字段")
+    limit = max(1, min(request.limit, MAX_PAGE_SIZE))
+
+    query = _build_list_query(db, identity, None, None, request.template_type)
+    matches = rank_templates_by_fields(db, query, request.fields, limit)
+    if not matches:
+        return []
+
+    templates = {
+        row.id: row for row in db.query(TemplateModel).options(*defer_content(raiseload=True)).filter(
+            TemplateModel.id.in_([m.template_id for m in matches])
+        )
+    }
+    return [
+        TemplateFieldMatch(
+            template=TemplateSummary.model_validate(templates[m.template_id]),
+            matched_fields=m.matched_fields,
+            matched_count=m.matched_count,
+            field_count=m.field_count,
+            coverage=round(m.coverage, 4),
+        )
+        for m in matches
+        if m.template_id in templates
+    ]
 
 @router.get("/{template_id}", response_model=Template)
 def get_template(
     template_id: int,
-    current_user: Optional[dict] = Depends(get_current_user_optional),
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
     db: Session = Depends(get_db)
 ):
     """获取单个模板（系统模板 / 用户自己的模板 / 团队共享给用户的模板）"""
-    template = db.query(TemplateModel).filter(TemplateModel.id == template_id).first()
-    if not template:
-        raise HTTPException(status_code=404, detail="模板不存在")
+    template = _get_readable_template(db, template_id, identity, defer_body=True)
+    etag = _template_etag(db, template)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    # 只统计真正下发内容的打开，304 重新验证不计数
+    template_stats_buffer.record(template.id, EVENT_OPEN)
     
-    # 检查权限
-    if template.is_system:
-        return template
+    # 一次查询补齐延迟加载的正文列（逐列懒加载会各发一条 SELECT）
+    db.refresh(template, attribute_names=["content_text", "content_gz"])
+    response.headers.update(headers)
+    return template
 
-    if not current_user:
-        raise HTTPException(status_code=401, detail="需要登录")
+@router.get("/{template_id}/content", response_class=HTMLResponse)
+def get_template_content(
+    template_id: int,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
+    """获取单个模板的 HTML 正文（客户端支持 gzip 且正文压缩存储时，直接下发库中的压缩字节）"""
+    template = _get_readable_template(db, template_id, identity, defer_body=True)
+    etag = _template_etag(db, template)
+    gzip_etag = make_etag(f"{template.content_hash}-gzip")
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(if_none_match, etag) or etag_matches(if_none_match, gzip_etag):
+        return Response(status_code=304, headers=headers)
+    template_stats_buffer.record(template.id, EVENT_OPEN)
     
-    user = db.query(User).filter(User.feishu_user_id == current_user["sub"]).first()
-    if not user:
-        raise HTTPException(status_code=403, detail="用户不存在")
-
-    # 1. 检查是否为所有者
-    if template.owner_id == user.id:
-        return template
-        
-    # 2. 检查是否为团队共享模板
-    # 查询是否存在一条共享记录：该模板被分享到了某个团队，且当前用户是该团队成员
-    shared_access = db.query(TeamTemplate).join(
-        TeamMember, TeamTemplate.team_id == TeamMember.team_id
-    ).filter(
-        TeamTemplate.template_id == template_id,
-        TeamMember.user_id == user.id
-    ).first()
+    gzip_body = stored_gzip_body(db, template) if accepts_gzip(accept_encoding) else None
+    if gzip_body is not None:
+        headers.update({"ETag": gzip_etag, "Content-Encoding": "gzip"})
+        return Response(content=gzip_body, media_type="text/html; charset=utf-8", headers=headers)
     
-    if shared_access:
-        return template
+    return HTMLResponse(content=template.content, headers=headers)
 
-    raise HTTPException(status_code=403, detail="无权访问此模板")
+@router.get("/{template_id}/preview")
+def get_template_preview(
+    template_id: int,
+    v: Optional[str] = Query(None, description="content_hash；与当前内容一致时响应可被永久缓存"),
+    if_none_match: Optional[str] = Header(None),
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
+    """获取模板预览图（SVG 骨架图，按 content_hash 缓存在磁盘）"""
+    template = _get_readable_template(db, template_id, identity, defer_body=True)
+    _template_etag(db, template)  # 旧数据缺少 content_hash 时补算
+    content_hash = template.content_hash
+    etag = make_etag(f"{content_hash}-preview")
+    if v == content_hash:
+        # 地址中带内容哈希：内容变化后地址随之变化，可以永久缓存
+        scope = "public" if template.is_system else "private"
+        cache_control = f"{scope}, max-age=31536000, immutable"
+    else:
+        cache_control = "no-cache"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    # 磁盘缓存命中时不读取、不解压正文
+    data = read_preview(content_hash)
+    if data is None:
+        data = render_and_store_preview(content_hash, template.content)
+    return Response(content=data, media_type=PREVIEW_MEDIA_TYPE, headers=headers)
+
+@router.post("/{template_id}/usage")
+def record_template_usage(
+    template_id: int,
+    usage: TemplateUsageEvent,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
+    """上报模板使用事件（导出 / 回填；插件使用本地缓存打开模板时也可上报 open）"""
+    if usage.event not in USAGE_EVENTS:
+        raise HTTPException(status_code=400, detail="event 只能为 'open'、'export' 或 'backfill'")
+    if not 1 <= usage.count <= MAX_USAGE_EVENT_COUNT:
+        raise HTTPException(status_code=400, detail=f"count 必须在 1 到 {MAX_USAGE_EVENT_COUNT} 之间")
+    template = _get_readable_template(db, template_id, identity, defer_body=True)
+    template_stats_buffer.record(template.id, usage.event, usage.count)
+    return {"success": True}
+
+@router.get("/{template_id}/versions", response_model=List[TemplateVersionInfo])
+def get_template_versions(
+    template_id: int,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
+    """获取模板的历史版本列表（新版本在前）"""
+    _get_readable_template(db, template_id, identity, defer_body=True)
+    return list_versions(db, template_id)
+
+@router.get("/{template_id}/versions/{version}", response_model=TemplateVersionDetail)
+def get_template_version(
+    template_id: int,
+    version: int,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
+    """获取模板指定版本的完整内容"""
+    _get_readable_template(db, template_id, identity, defer_body=True)
+    state = materialize_version(db, template_id, version)
+    if state is None:
+        raise HTTPException(status_code=404, detail="版本不存在")
+    return TemplateVersionDetail(template_id=template_id, version=version, **state)
+
+@router.post("/{template_id}/versions/{version}/restore", response_model=Template)
+def restore_template_version(
+    template_id: int,
+    version: int,
+    background_tasks: BackgroundTasks,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
+    """把模板回滚到指定版本（回滚本身会生成一个新版本）"""
+    try:
+        db_template = _get_writable_template(db, template_id, identity)
+        state = materialize_version(db, template_id, version)
+        if state is None:
+            raise HTTPException(status_code=404, detail="版本不存在")
+        
+        previous = template_state(db_template)
+        db_template.name = state["name"]
+        db_template.template_type = state["template_type"]
+        write_template_content(db, db_template, state["content"])
+        _refresh_derived_fields(db_template)
+        sync_template_fields(db, db_template.id, db_template.content)
+        record_version(db, db_template, previous, identity.user_id)
+        record_template_change(db, db_template)
+        
+        db.commit()
+        db.refresh(db_template)
+        background_tasks.add_task(generate_preview, db_template.content_hash, db_template.content)
+        return db_template
+    except HTTPException:
+        raise
+    except IntegrityError as e:
+        db.rollback()
+        if is_name_conflict(e):
+            raise _name_conflict_error(state["name"])
+        raise HTTPException(status_code=500, detail=f"回滚模板失败: {str(e)}")
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"回滚模板失败: {str(e)}")
 
 @router.post("/", response_model=Template)
 def create_template(
     template: TemplateCreate,
-    current_user: Optional[dict] = Depends(get_current_user_optional),
+    background_tasks: BackgroundTasks,
+    response: Response,
+    auto_suffix: bool = Query(False, description="名称已存在时自动改用 '名称 (n)'，否则返回 400"),
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
     db: Session = Depends(get_db)
 ):
-    """创建新模板（自动关联到当前用户）"""
+    """创建新模板（自动关联到当前用户）
+
+    同一用户下模板名称唯一（未登录创建的模板与系统模板共用一个作用域），由数据库唯一索引保证。
+    """
     try:
-        # 获取用户ID
-        user = None
-        if current_user:
-            user = db.query(User).filter(User.feishu_user_id == current_user["sub"]).first()
-        
-        # 检查模板名称是否已存在
-        if user:
-            # 检查用户自己的模板中是否有重名
-            existing = db.query(TemplateModel).filter(
-                TemplateModel.owner_id == user.id,
-                TemplateModel.name == template.name
-            ).first()
-            if existing:
-                raise HTTPException(status_code=400, detail=f"模板名称 '{template.name}' 已存在，请使用其他名称")
-        else:
-            # 未登录用户，检查系统模板中是否有重名
-            existing = db.query(TemplateModel).filter(
-                TemplateModel.is_system == True,
-                TemplateModel.name == template.name
-            ).first()
-            if existing:
-                raise HTTPException(status_code=400, detail=f"模板名称 '{template.name}' 已存在，请使用其他名称")
-        
         template_dict = template.dict()
+        parent_id = template_dict.pop('parent_id', None)
+        # 另存为 / 复制：编辑器丢弃了正文中的样式块，用来源模板的规则展开提升过的类
+        source = _get_readable_template(db, parent_id, identity) if parent_id else None
+        content = _normalize_content(response, template_dict.pop('content'), source.content if source else None)
         # 设置 owner_id（如果用户已登录）
-        template_dict['owner_id'] = user.id if user else None
+        template_dict['owner_id'] = identity.user_id if identity else None
         # 用户创建的模版，确保is_system为False
         template_dict['is_system'] = False
+        if auto_suffix:
+            template_dict['name'] = next_free_name(db, template_dict['owner_id'], template.name)
         
         db_template = TemplateModel(**template_dict)
-        db.add(db_template)
+        # 另存为系统模板时只保存相对父模板的差异（见 services/template_forks.py）
+        write_template_content(db, db_template, content, parent_id)
+        _refresh_derived_fields(db_template)
+        _insert_template(db, db_template, template.name, auto_suffix)
+        sync_template_fields(db, db_template.id, db_template.content)
+        record_version(db, db_template, None, identity.user_id if identity else None)
+        record_template_change(db, db_template)
         db.commit()
         db.refresh(db_template)
+        background_tasks.add_task(generate_preview, db_template.content_hash, db_template.content)
         return db_template
     except HTTPException:
         raise
+    except IntegrityError as e:
+        db.rollback()
+        if is_name_conflict(e):
+            raise _name_conflict_error(template.name)
+        raise HTTPException(status_code=500, detail=f"创建模板失败: {str(e)}")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"创建模板失败: {str(e)}")
 
+@router.post("/batch", response_model=TemplateBatchResponse)
+def batch_create_templates(
+    request: TemplateBatchRequest,
+    background_tasks: BackgroundTasks,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
+    """批量创建模板（导入脚本使用），整批一个事务，逐条返回结果
+
+    与单个创建接口相同：登录用户创建的模板归属当前用户，未登录时 owner_id 为空；is_system 一律为 False。
+    """
+    validate_batch_request(request)
+    if request.on_conflict == "update" and not identity:
+        raise HTTPException(status_code=401, detail="覆盖同名模板需要登录")
+
+    user_id = identity.user_id if identity else None
+    try:
+        results = batch_upsert_templates(
+            db, request.templates, owner_id=user_id, on_conflict=request.on_conflict, user_id=user_id
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"批量创建模板失败: {str(e)}")
+    background_tasks.add_task(generate_previews, preview_jobs(request, results))
+    return batch_response(results)
+
 @router.put("/{template_id}", response_model=Template)
 def update_template(
     template_id: int, 
     template: TemplateUpdate,
-    current_user: Optional[dict] = Depends(get_current_user_optional),
+    background_tasks: BackgroundTasks,
+    response: Response,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
     db: Session = Depends(get_db)
 ):
     """更新模板（只能更新自己的模板）"""
     try:
-        db_template = db.query(TemplateModel).filter(TemplateModel.id == template_id).first()
-        if not db_template:
-            raise HTTPException(status_code=404, detail="模板不存在")
-        
-        # 禁止修改系统模板
-        if db_template.is_system:
-            raise HTTPException(status_code=403, detail="系统模板不能修改")
-        
-        # 检查权限：只能修改自己的模板
-        if not current_user:
-            raise HTTPException(status_code=401, detail="需要登录")
+        db_template = _get_writable_template(db, template_id, identity)
+        previous = template_state(db_template)
         
-        user = db.query(User).filter(User.feishu_user_id == current_user["sub"]).first()
-        if not user:
-            raise HTTPException(status_code=403, detail="用户不存在")
-        
-        # 允许修改：owner_id 匹配，或 owner_id 为空（兼容旧数据，自动认领）
-        if db_template.owner_id is None:
-            db_template.owner_id = user.id
-        elif db_template.owner_id != user.id:
-            raise HTTPException(status_code=403, detail="无权修改此模板")
-        
-        for key, value in template.dict(exclude_none=True).items():
+        values = template.dict(exclude_none=True)
+        content = values.pop("content", None)
+        for key, value in values.items():
             setattr(db_template, key, value)
+        if content is not None:
+            content = _normalize_content(response, content, previous["content"])
+            write_template_content(db, db_template, content)
+        _refresh_derived_fields(db_template)
+        if template.content is not None:
+            sync_template_fields(db, db_template.id, db_template.content)
+        record_version(db, db_template, previous, identity.user_id)
+        record_template_change(db, db_template)
         
         db.commit()
         db.refresh(db_template)
+        background_tasks.add_task(generate_preview, db_template.content_hash, db_template.content)
         return db_template
     except HTTPException:
         raise
+    except IntegrityError as e:
+        db.rollback()
+        if is_name_conflict(e):
+            raise _name_conflict_error(template.name)
+        raise HTTPException(status_code=500, detail=f"更新模板失败: {str(e)}")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"更新模板失败: {str(e)}")
@@ -201,12 +1002,16 @@ def update_template(
 @router.delete("/{template_id}")
 def delete_template(
     template_id: int,
-    current_user: Optional[dict] = Depends(get_current_user_optional),
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
     db: Session = Depends(get_db)
 ):
-    """删除模板（只能删除自己的模板）"""
+    """删除模板（只能删除自己的模板）
+
+    软删除：只记录删除时间，保留期内可通过 POST /{id}/undelete 恢复，之后由后台任务物理删除
+    （见 services/template_purge.py）。
+    """
     try:
-        db_template = db.query(TemplateModel).filter(TemplateModel.id == template_id).first()
+        db_template = db.query(TemplateModel).filter(TemplateModel.id == template_id, not_deleted()).first()
         if not db_template:
             raise HTTPException(status_code=404, detail="模板不存在")
         
@@ -215,18 +1020,16 @@ def delete_template(
             raise HTTPException(status_code=403, detail="系统模板不能删除")
         
         # 检查权限：只能删除自己的模板
-        if not current_user:
+        if not identity:
             raise HTTPException(status_code=401, detail="需要登录")
         
-        user = db.query(User).filter(User.feishu_user_id == current_user["sub"]).first()
-        if not user:
-            raise HTTPException(status_code=403, detail="用户不存在")
-        
         # 允许删除：owner_id 匹配，或 owner_id 为空（兼容旧数据）
-        if db_template.owner_id is not None and db_template.owner_id != user.id:
+        if db_template.owner_id is not None and db_template.owner_id != identity.user_id:
             raise HTTPException(status_code=403, detail="无权删除此模板")
         
-        db.delete(db_template)
+        # 留下墓碑，增量同步的客户端据此删除本地副本
+        record_template_change(db, db_template, CHANGE_DELETE)
+        db_template.deleted_at = datetime.now()
         db.commit()
         return {"success": True, "message": "模板已删除"}
     except HTTPException:
@@ -234,3 +1037,39 @@ def delete_template(
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"删除模板失败: {str(e)}")
+
+@router.post("/{template_id}/undelete", response_model=Template)
+def undelete_template(
+    template_id: int,
+    identity: Optional[RequestIdentity] = Depends(get_request_identity),
+    db: Session = Depends(get_db)
+):
+    """恢复已删除的模板（删除后 TEMPLATE_PURGE_RETENTION_HOURS 小时内有效）"""
+    if not identity:
+        raise HTTPException(status_code=401, detail="需要登录")
+    try:
+        db_template = db.query(TemplateModel).filter(
+            TemplateModel.id == template_id,
+            TemplateModel.deleted_at != None
+        ).first()
+        if not db_template:
+            raise HTTPException(status_code=404, detail="模板不存在或已被彻底删除")
+        if db_template.owner_id is not None and db_template.owner_id != identity.user_id:
+            raise HTTPException(status_code=403, detail="无权恢复此模板")
+
+        name = db_template.name
+        db_template.deleted_at = None
+        record_template_change(db, db_template)
+        db.commit()
+        db.refresh(db_template)
+        return db_template
+    except HTTPException:
+        raise
+    except IntegrityError as e:
+        db.rollback()
+        if is_name_conflict(e):
+            raise HTTPException(status_code=400, detail=f"模板名称 '{name}' 已存在，请先重命名同名模板")
+        raise HTTPException(status_code=500, detail=f"恢复模板失败: {str(e)}")
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"恢复模板失败: {str(e)}")
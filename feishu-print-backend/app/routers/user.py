@@ -20,18 +20,21 @@ PLAN_LIMITS = {
         "ai_generates": 5,  # 每月5次
         "signature": False,  # 不支持电子签名
         "premium_templates": False,  # 不支持高级模板
+        "ai_queue_weight": 1,  # AI 生成排队时的权重（加权公平排队，见 services/ai_admission.py）
     },
     "pro": {
         "pdf_exports": 500,  # 每月500次
         "ai_generates": 50,  # 每月50次
         "signature": True,
         "premium_templates": False,  # 不支持高级模板
+        "ai_queue_weight": 2,
     },
     "team": {
         "pdf_exports": -1,  # 无限
         "ai_generates": 200,  # 每月200次
         "signature": True,
         "premium_templates": True,  # 支持高级模板
+        "ai_queue_weight": 4,
     },
 }
 
@@ -235,13 +238,20 @@ async def init_user(request: Request, user_data: UserInitRequest, db: Session =
             reset_usage_if_needed(user.membership, db)
         
         # 6. 颁发 JWT Session Token（7天有效期）
+        # user_id / tenant_key / plan_type 声明供 get_request_identity 使用，免去每个请求按 feishu_user_id 查库
+        session_membership = user.membership
         session_token = create_access_token(
             data={
                 "sub": user.feishu_user_id,
                 "user_id": user.id,
                 "tenant_key": user.tenant_key,
                 "role": "user",
-                "security_level": security_checks["risk_level"]
+                "security_level": security_checks["risk_level"],
+                "plan_type": session_membership.plan_type if session_membership else "free",
+                "plan_expires_at": (
+                    int(session_membership.expires_at.timestamp())
+                    if session_membership and session_membership.expires_at else None
+                ),
             },
             expires_delta=timedelta(days=7)
         )
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class TemplateBase(BaseModel):
     name: str
@@ -9,7 +9,7 @@ class TemplateBase(BaseModel):
     is_system: Optional[bool] = False  # 是否为系统模版
 
 class TemplateCreate(TemplateBase):
-    pass
+    parent_id: Optional[int] = None  # 另存为 / 复制时的来源模板 id：补回编辑器丢弃的样式规则；来源是系统模板时正文只保存差异
 
 class TemplateUpdate(BaseModel):
     name: Optional[str] = None
@@ -20,8 +20,115 @@ class TemplateUpdate(BaseModel):
 class Template(TemplateBase):
     id: int
     owner_id: Optional[int] = None
+    parent_id: Optional[int] = None  # 派生自的系统模板 id（另存为）
     created_at: datetime
     updated_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
+
+class TemplateSummary(BaseModel):
+    """模板元数据（不含 content），用于模板库列表"""
+    id: int
+    name: str
+    template_type: Optional[str] = 'normal'
+    is_system: Optional[bool] = False
+    owner_id: Optional[int] = None
+    content_hash: Optional[str] = None  # 内容哈希，可拼接预览图地址 /{id}/preview?v=<content_hash>
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class TemplateContent(BaseModel):
+    """模板正文，用于按 id 批量获取 content"""
+    id: int
+    content: str
+
+    class Config:
+        from_attributes = True
+
+class TemplateVersionInfo(BaseModel):
+    """模板历史版本（列表项，不含正文）"""
+    version: int
+    is_snapshot: bool
+    content_hash: Optional[str] = None
+    content_length: Optional[int] = None
+    created_by: Optional[int] = None
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class TemplateVersionDetail(BaseModel):
+    """模板指定版本的完整内容"""
+    template_id: int
+    version: int
+    name: str
+    template_type: Optional[str] = 'normal'
+    content: str
+
+class TemplateBatchRequest(BaseModel):
+    """批量创建/更新模板"""
+    templates: List[TemplateCreate]
+    on_conflict: str = 'skip'  # 'skip'：同名模板跳过；'update'：覆盖同名模板
+
+class TemplateBatchItemResult(BaseModel):
+    """批量写入中单个模板的结果"""
+    index: int  # 在请求 templates 数组中的下标
+    name: str
+    status: str  # created / updated / unchanged / skipped / error
+    id: Optional[int] = None
+    content_hash: Optional[str] = None
+    bytes_before: Optional[int] = None  # 正文规范化前的字节数
+    bytes_after: Optional[int] = None  # 正文规范化后（实际保存）的字节数
+    detail: Optional[str] = None
+
+class TemplateBatchResponse(BaseModel):
+    created: int
+    updated: int
+    skipped: int
+    failed: int
+    bytes_before: int = 0  # 已写入模板的正文规范化前后字节数合计
+    bytes_after: int = 0
+    results: List[TemplateBatchItemResult]
+
+class TemplateFieldMatchRequest(BaseModel):
+    """按字段匹配模板"""
+    fields: List[str]  # 字段名列表（例如多维表格的字段名）
+    template_type: Optional[str] = None
+    limit: int = 20
+
+class TemplateFieldMatch(BaseModel):
+    """字段匹配结果（按 matched_count、coverage 降序）"""
+    template: TemplateSummary
+    matched_fields: List[str]
+    matched_count: int
+    field_count: int  # 模板自身的占位符字段数
+    coverage: float  # matched_count / field_count
+
+class TemplateChangeItem(BaseModel):
+    """增量同步中的一条变更"""
+    template_id: int
+    action: str  # 'upsert'：新建或修改（template 为最新元数据）；'delete'：已删除（墓碑）
+    template: Optional[TemplateSummary] = None
+
+class TemplateChangesResponse(BaseModel):
+    changes: List[TemplateChangeItem]
+    cursor: str  # 下次同步时作为 since 传入
+    has_more: bool
+
+class TemplateUsageEvent(BaseModel):
+    """插件上报的模板使用事件"""
+    event: str  # 'open' / 'export' / 'backfill'
+    count: int = 1
+
+class TemplateUsage(BaseModel):
+    """模板使用统计（最常用 / 最近使用列表项）"""
+    template: TemplateSummary
+    use_count: int
+    open_count: int
+    export_count: int
+    backfill_count: int
+    last_used_at: Optional[datetime] = None
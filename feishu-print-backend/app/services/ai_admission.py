@@ -0,0 +1,107 @@
+"""
+AI 生成准入控制（上游并发上限 + 按会员计划加权公平排队）
+
+每个生成请求都会向 DashScope 打开一个流式请求；突发流量超过服务商的并发限制后，所有请求一起失败、
+一起重试，吞吐反而跌到零。这里限制同时打开的上游流数量（ai_max_concurrent_streams），超出的请求排队：
+- 按会员计划加权公平排队（Start-time Fair Queuing）：每个计划有独立的虚拟时钟，
+  排队请求的开始标签 = max(系统虚拟时间, 本计划上一个请求的结束标签)，结束标签 = 开始标签 + 1 / 权重，
+  总是放行开始标签最小的请求。所有计划都有请求排队时，放行次数之比等于权重之比；空闲计划的份额由其他计划使用
+- 一个流结束立即放行下一个请求，上游始终保持满负载，不会空转也不会超限
+- 排队位置通过 SSE {'type': 'queued', 'position': n} 下发给插件
+
+上限按进程计算（asyncio，每个 worker 一个事件循环）：多 worker 部署时每个 worker 的上限应为服务商上限 / worker 数。
+"""
+import asyncio
+import heapq
+import itertools
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+
+@dataclass(order=True)
+class AdmissionTicket:
+    """一个排队中（或已放行）的生成请求"""
+    start: float
+    seq: int
+    plan: str = field(compare=False)
+    finish: float = field(compare=False)
+    granted: bool = field(default=False, compare=False)
+    released: bool = field(default=False, compare=False)
+    timed_out: bool = field(default=False, compare=False)
+    event: asyncio.Event = field(default_factory=asyncio.Event, compare=False, repr=False)
+
+    async def wait(self, timeout: float) -> bool:
+        """等待放行，超时返回 False（调用方可以借机下发排队位置）"""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.granted
+
+
+class AiAdmissionController:
+    """上游流的并发上限与加权公平队列（只在事件循环线程中使用，无需加锁）"""
+
+    def __init__(self, max_concurrent: int, max_queue: int, weights: Dict[str, float], default_weight: float = 1.0):
+        self._max_concurrent = max(1, max_concurrent)
+        self._max_queue = max_queue
+        self._weights = weights
+        self._default_weight = default_weight
+        self._active = 0
+        self._waiting: List[AdmissionTicket] = []
+        self._plan_finish: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiting)
+
+    def is_full(self) -> bool:
+        """并发已满且队列已满，新请求应直接拒绝"""
+        return self._active >= self._max_concurrent and len(self._waiting) >= self._max_queue
+
+    def enqueue(self, plan: str) -> AdmissionTicket:
+        """请求排队；有空闲并发时立即放行（ticket.granted 为 True）"""
+        weight = self._weights.get(plan) or self._default_weight
+        start = max(self._virtual_time, self._plan_finish.get(plan, 0.0))
+        ticket = AdmissionTicket(start=start, seq=next(self._seq), plan=plan, finish=start + 1.0 / weight)
+        self._plan_finish[plan] = ticket.finish
+        heapq.heappush(self._waiting, ticket)
+        self._dispatch()
+        return ticket
+
+    def position(self, ticket: AdmissionTicket) -> int:
+        """排队位置（1 表示下一个放行），已放行时为 0"""
+        if ticket.granted:
+            return 0
+        return 1 + sum(1 for other in self._waiting if other < ticket)
+
+    def release(self, ticket: AdmissionTicket) -> None:
+        """请求结束（完成、失败或客户端断开）时调用，重复调用无副作用"""
+        if ticket.released:
+            return
+        ticket.released = True
+        if ticket.granted:
+            self._active -= 1
+        else:
+            self._waiting.remove(ticket)
+            heapq.heapify(self._waiting)
+        self._dispatch()
+
+    def abandon(self, ticket: AdmissionTicket) -> None:
+        """排队超时：撤销排队并标记 timed_out，之后不会再被放行（须在下发超时错误之前调用）"""
+        ticket.timed_out = True
+        self.release(ticket)
+
+    def _dispatch(self) -> None:
+        while self._active < self._max_concurrent and self._waiting:
+            ticket = heapq.heappop(self._waiting)
+            self._virtual_time = max(self._virtual_time, ticket.start)
+            self._active += 1
+            ticket.granted = True
+            ticket.event.set()
@@ -0,0 +1,139 @@
+"""
+AI 生成结果缓存（精确匹配）
+
+很多用户输入几乎相同的需求（例如"请假申请单" + 同一张多维表格的字段），每次都要调用数秒的模型并扣减一次次数。
+缓存键为 SHA-256(规范化后的需求描述, mode, 排序后的字段名, 模型名, 提示词版本)：
+- 需求描述做 NFKC 规范化（全角转半角）、去掉首尾空白、折叠连续空白、转小写
+- 只缓存通过 validate_generated_html 校验且未违反流式规则的提取结果
+- 命中时按相同的 SSE 格式回放，不调用模型、不扣减次数；请求 useCache=false（"重新生成"）或
+  AI_GENERATION_CACHE_ENABLED=false 时既不读也不写缓存
+- 条目保留 ai_generation_cache_ttl_hours 小时，过期后下次生成时覆盖
+
+命中率按进程统计（GenerationCacheStats），全局的命中次数和节省字节数由表中的 hit_count * size 汇总。
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+from sqlalchemy import delete, func, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.ai_generation import AiGenerationCache
+from app.services.template_content import encode_content
+
+logger = logging.getLogger(__name__)
+
+# 提示词有实质修改时递增，旧缓存随之失效
+PROMPT_CACHE_VERSION = 1
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_description(description: str) -> str:
+    text = unicodedata.normalize("NFKC", description or "")
+    return _WHITESPACE_RE.sub(" ", text).strip().lower()
+
+
+def generation_cache_key(description: str, mode: str, field_names: Iterable[str], model: str) -> str:
+    payload = json.dumps(
+        [PROMPT_CACHE_VERSION, normalize_description(description), mode, sorted(set(field_names)), model],
+        ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _cutoff() -> datetime:
+    return datetime.now() - timedelta(hours=settings.ai_generation_cache_ttl_hours)
+
+
+class GenerationCacheStats:
+    """当前进程的缓存命中统计（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def record_hit(self, size: int) -> None:
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += size
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "bytes_saved": self.bytes_saved,
+            }
+
+
+generation_cache_stats = GenerationCacheStats()
+
+
+def lookup_generation(db: Session, cache_key: str) -> Optional[str]:
+    """查找未过期的缓存结果，命中时累加命中次数并返回 HTML"""
+    entry = db.get(AiGenerationCache, cache_key)
+    if entry is None or entry.created_at is None or entry.created_at < _cutoff():
+        generation_cache_stats.record_miss()
+        return None
+    db.execute(update(AiGenerationCache).where(AiGenerationCache.cache_key == cache_key).values(
+        hit_count=AiGenerationCache.hit_count + 1,
+        last_hit_at=datetime.now(),
+    ))
+    db.commit()
+    generation_cache_stats.record_hit(entry.size)
+    return entry.content
+
+
+def store_generation(cache_key: str, mode: str, html: str) -> None:
+    """保存通过校验的生成结果（覆盖同键的过期条目，顺带删除其他过期条目）；使用独立会话，失败只记录日志"""
+    db = SessionLocal()
+    try:
+        content, content_gz, content_encoding = encode_content(html)
+        db.execute(delete(AiGenerationCache).where(AiGenerationCache.created_at < _cutoff()))
+        db.merge(AiGenerationCache(
+            cache_key=cache_key,
+            mode=mode,
+            model=settings.ai_model,
+            content_text=content,
+            content_gz=content_gz,
+            content_encoding=content_encoding,
+            size=len(html.encode("utf-8")),
+            hit_count=0,
+            created_at=datetime.now(),
+            last_hit_at=None,
+        ))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"[ai-cache] 保存生成结果失败: {e}")
+    finally:
+        db.close()
+
+
+def generation_cache_summary(db: Session) -> dict:
+    """缓存统计：表中的全局汇总 + 当前进程的命中率"""
+    entries, hits, bytes_saved = db.query(
+        func.count(AiGenerationCache.cache_key),
+        func.coalesce(func.sum(AiGenerationCache.hit_count), 0),
+        func.coalesce(func.sum(AiGenerationCache.hit_count * AiGenerationCache.size), 0),
+    ).one()
+    return {
+        "entries": int(entries),
+        "total_hits": int(hits),
+        "total_bytes_saved": int(bytes_saved),
+        "process": generation_cache_stats.snapshot(),
+    }
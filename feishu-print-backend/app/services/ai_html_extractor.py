@@ -0,0 +1,166 @@
+"""
+AI 输出的增量 HTML 提取
+
+模型流式输出的 HTML 外面常包着 ```html 代码块标记，前后还可能有说明文字。提取规则：
+1. 去掉所有 ```html / ``` 标记
+2. 有 <div id="template-root"> 时取它到与之配对的 </div>（未闭合则取到结尾）
+3. 否则取第一个 <div> 到与之配对的 </div>
+4. 都没有时返回去掉首尾空白的全文
+
+IncrementalHtmlExtractor 在收到每个增量时只扫描新到达的文本（单遍、线性时间），同时为"第一个 div"和
+"template-root"两个候选维护各自的 div 嵌套深度；流结束时两者的边界已经确定，result() 只做一次切片，不再重新解析。
+跨增量被截断的标签和代码块标记会留到下一个增量到达后再处理。
+"""
+import re
+from typing import List, Optional
+
+FENCE = "```"
+FENCE_HTML = "```html"
+
+# 完整的标签：<div ...> / </div>
+_OPEN_DIV_RE = re.compile(r"<div(?:[\s/][^>]*)?>", re.IGNORECASE)
+_CLOSE_DIV_RE = re.compile(r"</div\s*>", re.IGNORECASE)
+_ROOT_ID_RE = re.compile(r"""\bid\s*=\s*["']template-root["']""", re.IGNORECASE)
+
+
+class _DivSpan:
+    """一个候选 div 的起止位置（在去掉代码块标记后的文本中）"""
+    __slots__ = ("start", "end", "depth")
+
+    def __init__(self, start: int):
+        self.start = start
+        self.end: Optional[int] = None
+        self.depth = 1
+
+    def on_tag(self, is_open: bool, tag_end: int) -> None:
+        if self.end is not None:
+            return
+        self.depth += 1 if is_open else -1
+        if self.depth == 0:
+            self.end = tag_end
+
+
+class IncrementalHtmlExtractor:
+    """逐个增量喂入模型输出，流结束后调用 result() 取得提取出的 HTML"""
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._length = 0  # 已接收的（去掉代码块标记后的）字符数
+        self._fence_carry = ""  # 结尾处可能是代码块标记开头的几个字符
+        self._tag_tail = ""  # 尚未扫描完的文本（从最后一个未闭合的 '<' 开始）
+        self._tag_tail_start = 0  # _tag_tail 在文本中的起始位置
+        self._tag_searched = 0  # _tag_tail 中已确认没有 '>' 的长度
+        self.first_div: Optional[_DivSpan] = None
+        self.root: Optional[_DivSpan] = None
+
+    @property
+    def received(self) -> int:
+        """已接收的字符数（不含代码块标记）"""
+        return self._length + len(self._fence_carry)
+
+    def feed(self, delta: str) -> None:
+        if not delta:
+            return
+        text = self._fence_carry + delta
+        if "`" not in text:
+            # 绝大多数增量不含反引号，直接扫描
+            self._fence_carry = ""
+            self._append(text)
+            return
+        carry = _partial_fence_suffix(text)
+        self._fence_carry = text[len(text) - carry:] if carry else ""
+        text = text[:len(text) - carry] if carry else text
+        self._append(text.replace(FENCE_HTML, "").replace(FENCE, ""))
+
+    def _append(self, text: str) -> None:
+        if not text:
+            return
+        if not self._tag_tail:
+            self._tag_tail_start = self._length
+            self._tag_searched = 0
+        self._chunks.append(text)
+        self._length += len(text)
+        self._tag_tail += text
+        self._scan()
+
+    def _scan(self) -> None:
+        tail = self._tag_tail
+        pos = 0
+        while True:
+            lt = tail.find("<", pos)
+            if lt == -1:
+                tail = ""
+                break
+            gt = tail.find(">", max(lt + 1, self._tag_searched))
+            if gt == -1:
+                # 标签尚未完整到达：保留 '<' 之后的部分，下次只在新文本中找 '>'
+                tail = tail[lt:]
+                self._tag_tail_start += lt
+                self._tag_searched = len(tail)
+                self._tag_tail = tail
+                return
+            # '<' 与 '>' 之间的其他 '<'（如文本中的比较符号）不是标签开头
+            lt = tail.rfind("<", lt, gt)
+            self._tag(tail, lt, gt + 1)
+            self._tag_searched = 0
+            pos = gt + 1
+        self._tag_tail = tail
+        self._tag_tail_start = self._length
+        self._tag_searched = 0
+
+    def _tag(self, tail: str, start: int, end: int) -> None:
+        # 只在标签可能是 div 时才做正则匹配
+        if tail[start + 1:start + 4].lower() == "div":
+            if not _OPEN_DIV_RE.fullmatch(tail, start, end):
+                return
+            is_open = True
+        elif tail[start + 1:start + 5].lower() == "/div":
+            if not _CLOSE_DIV_RE.fullmatch(tail, start, end):
+                return
+            is_open = False
+        else:
+            return
+
+        absolute_end = self._tag_tail_start + end
+        if self.first_div is not None:
+            self.first_div.on_tag(is_open, absolute_end)
+        if self.root is not None:
+            self.root.on_tag(is_open, absolute_end)
+        if is_open:
+            absolute_start = self._tag_tail_start + start
+            if self.first_div is None:
+                self.first_div = _DivSpan(absolute_start)
+            if self.root is None and _ROOT_ID_RE.search(tail, start, end):
+                self.root = _DivSpan(absolute_start)
+
+    def result(self) -> str:
+        """流结束后调用：返回提取出的 HTML"""
+        if self._fence_carry:
+            # 结尾剩下的可能是完整的 ``` 标记，同样要去掉
+            carry, self._fence_carry = self._fence_carry, ""
+            self._append(carry.replace(FENCE_HTML, "").replace(FENCE, ""))
+        text = "".join(self._chunks)
+        span = self.root or self.first_div
+        if span is None:
+            return text.strip()
+        if span.end is None:
+            # 未闭合时取到结尾，去掉末尾的空白（与对全文 strip 后切片一致）
+            return text[span.start:].rstrip()
+        return text[span.start:span.end]
+
+
+def _partial_fence_suffix(text: str) -> int:
+    """text 结尾可能是 ```html 开头的最长后缀长度（需要等下一个增量才能确定是不是代码块标记）"""
+    for size in range(min(len(FENCE_HTML) - 1, len(text)), 0, -1):
+        if FENCE_HTML.startswith(text[-size:]):
+            return size
+    return 0
+
+
+def extract_html_content(text: str) -> str:
+    """从完整的 AI 响应中提取 HTML 内容"""
+    if not text:
+        return ""
+    extractor = IncrementalHtmlExtractor()
+    extractor.feed(text)
+    return extractor.result()
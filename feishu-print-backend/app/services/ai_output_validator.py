@@ -0,0 +1,137 @@
+"""
+AI 输出校验（流式规则 + 结束后校验）
+
+系统提示词禁止 display: flex / grid、动画和竖排文字（会导致编辑器分页异常或打印效果错误），但模型偶尔仍会输出。
+StreamingOutputValidator 在每个增量到达时只检查新文本（保留 RULE_LOOKBACK 个字符，匹配跨增量截断的属性），
+命中硬性规则后由调用方立即关闭上游流，带上纠正提示重新生成，不必等满 4000 token 的不可用输出。
+
+流结束后 validate_generated_html 检查内容是否为空、过短、缺少 div 容器。
+每条规则的检查次数、违规次数和中断次数按进程统计（OutputValidationStats），管理端 /api/admin/ai-validation/stats 查看。
+"""
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# 上一个增量末尾保留的字符数，足以覆盖被截断的 "writing-mode : vertical" 等属性
+RULE_LOOKBACK = 64
+
+MIN_HTML_LENGTH = 200
+
+
+@dataclass(frozen=True)
+class OutputRule:
+    name: str
+    description: str  # 写入纠正提示和日志
+    pattern: "re.Pattern[str]"
+
+
+HARD_RULES: List[OutputRule] = [
+    OutputRule("flex", "display: flex 布局", re.compile(r"display\s*:\s*(?:inline-)?flex\b", re.IGNORECASE)),
+    OutputRule("grid", "display: grid / grid-template 布局",
+               re.compile(r"display\s*:\s*(?:inline-)?grid\b|grid-template", re.IGNORECASE)),
+    OutputRule("animation", "animation / transition / @keyframes 动画",
+               re.compile(r"@keyframes\b|\banimation(?:-name)?\s*:|\btransition\s*:", re.IGNORECASE)),
+    OutputRule("vertical_text", "writing-mode 竖排文字",
+               re.compile(r"writing-mode\s*:\s*(?:vertical|tb)|text-orientation\s*:\s*upright", re.IGNORECASE)),
+]
+
+# 结束后校验的规则名
+FINAL_RULES = ("empty", "too_short", "missing_div")
+
+
+class StreamingOutputValidator:
+    """逐个增量检查一次生成（一次尝试）的输出"""
+
+    def __init__(self, rules: List[OutputRule] = None):
+        self._rules = HARD_RULES if rules is None else rules
+        self._tail = ""
+        self.received = 0
+        self.violations: List[OutputRule] = []
+
+    def feed(self, delta: str) -> Optional[OutputRule]:
+        """检查新到达的文本，返回本次新命中的第一条规则"""
+        if not delta:
+            return None
+        window = self._tail + delta
+        offset = len(self._tail)
+        self._tail = window[-RULE_LOOKBACK:]
+        self.received += len(delta)
+        hit = None
+        for rule in self._rules:
+            if rule in self.violations:
+                continue
+            # 只算结束位置落在新文本中的匹配，保留区中的匹配在上一个增量已经检查过
+            if any(match.end() > offset for match in rule.pattern.finditer(window)):
+                self.violations.append(rule)
+                hit = hit or rule
+        return hit
+
+
+def validate_generated_html(html: str) -> Tuple[bool, str, Optional[str]]:
+    """流结束后的校验，返回 (是否通过, 错误信息, 规则名)"""
+    if not html or not html.strip():
+        return False, "生成的HTML内容为空", "empty"
+    if len(html.strip()) < MIN_HTML_LENGTH:
+        return False, "生成的HTML内容过短", "too_short"
+    if not re.search(r'<div\s+id=["\']template-root["\']', html, re.IGNORECASE):
+        if not re.search(r'<div[^>]*>', html, re.IGNORECASE):
+            return False, "缺少必需的div容器", "missing_div"
+    return True, "", None
+
+
+def corrective_hint(rules: List[OutputRule]) -> str:
+    """重试时追加到用户提示词末尾"""
+    names = "、".join(rule.description for rule in rules)
+    return (
+        f"\n\n【纠正】上一次生成使用了被禁止的 {names}，已被丢弃。"
+        "本次必须严格遵守【强制规范】：多列布局只用 <table>、float 或 inline-block，不使用任何动画，所有文字水平排列。"
+    )
+
+
+class OutputValidationStats:
+    """当前进程每条规则的检查/违规/中断次数（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.streams = 0
+        self.aborted = 0
+        self.aborted_chars = 0
+        self._rules: Dict[str, Dict[str, int]] = {
+            name: {"checked": 0, "violations": 0, "aborted": 0}
+            for name in [rule.name for rule in HARD_RULES] + list(FINAL_RULES)
+        }
+
+    def record_stream(self, validator: StreamingOutputValidator, aborted: bool) -> None:
+        """一次尝试的流式检查结束（正常结束或被中断）"""
+        with self._lock:
+            self.streams += 1
+            if aborted:
+                self.aborted += 1
+                self.aborted_chars += validator.received
+            for rule in HARD_RULES:
+                self._rules[rule.name]["checked"] += 1
+            for rule in validator.violations:
+                counters = self._rules[rule.name]
+                counters["violations"] += 1
+                if aborted:
+                    counters["aborted"] += 1
+
+    def record_final(self, failed_rule: Optional[str]) -> None:
+        with self._lock:
+            for name in FINAL_RULES:
+                self._rules[name]["checked"] += 1
+            if failed_rule:
+                self._rules[failed_rule]["violations"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "streams": self.streams,
+                "aborted": self.aborted,
+                "aborted_chars": self.aborted_chars,
+                "rules": {name: dict(counters) for name, counters in self._rules.items()},
+            }
+
+
+output_validation_stats = OutputValidationStats()
@@ -0,0 +1,126 @@
+"""
+系统模板进程内缓存
+
+系统模板（is_system=True）只会在管理员导入/修改时变化，这里把它们连同预序列化好的
+JSON 字节缓存在进程内。失效通过数据库 cache_versions 表中的版本号实现：
+写入方调用 bump_system_templates_version()，各 worker 每隔几秒比对一次版本号即可感知变化。
+"""
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from app.models.cache_version import CacheVersion
+from app.models.template import Template as TemplateModel, not_deleted
+from app.schemas.template import Template, TemplateSummary
+from app.services.template_blobs import preload_blobs
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_TEMPLATES_CACHE_NAME = "system_templates"
+# 两次版本号检查之间的最小间隔（秒）
+VERSION_CHECK_INTERVAL = 5
+# 即使版本号未变化，缓存最长保留时间（秒），兜底直接改库但忘记递增版本号的情况
+MAX_CACHE_AGE = 600
+
+
+@dataclass(frozen=True)
+class CachedTemplate:
+    """单个系统模板的缓存条目（元数据 + 预序列化 JSON）"""
+    id: int
+    template_type: str
+    content_hash: Optional[str]
+    owner_id: Optional[int]
+    is_system: bool
+    updated_at: Optional[datetime]
+    full_json: bytes
+    summary_json: bytes
+
+
+def get_cache_version(db: Session, name: str) -> int:
+    row = db.query(CacheVersion.version).filter(CacheVersion.name == name).first()
+    return int(row.version) if row else 0
+
+
+def bump_cache_version(db: Session, name: str) -> None:
+    """递增缓存版本号（随调用方事务一起提交）"""
+    updated = db.query(CacheVersion).filter(CacheVersion.name == name).update(
+        {CacheVersion.version: CacheVersion.version + 1},
+        synchronize_session=False
+    )
+    if not updated:
+        db.add(CacheVersion(name=name, version=1))
+
+
+def bump_system_templates_version(db: Session) -> None:
+    """系统模板发生变化后调用，通知所有 worker 重建缓存"""
+    bump_cache_version(db, SYSTEM_TEMPLATES_CACHE_NAME)
+
+
+class SystemTemplateCache:
+    """系统模板缓存（进程级单例，线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Optional[List[CachedTemplate]] = None
+        self._version: Optional[int] = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+
+    def get(self, db: Session) -> List[CachedTemplate]:
+        """返回按 id 升序排列的系统模板缓存条目，必要时从数据库重建"""
+        now = time.monotonic()
+        entries = self._entries
+        if entries is not None and now - self._checked_at < VERSION_CHECK_INTERVAL:
+            return entries
+
+        with self._lock:
+            now = time.monotonic()
+            if self._entries is not None and now - self._checked_at < VERSION_CHECK_INTERVAL:
+                return self._entries
+
+            version = get_cache_version(db, SYSTEM_TEMPLATES_CACHE_NAME)
+            self._checked_at = now
+            if (
+                self._entries is not None
+                and version == self._version
+                and now - self._loaded_at < MAX_CACHE_AGE
+            ):
+                return self._entries
+
+            self._entries = self._load(db)
+            self._version = version
+            self._loaded_at = now
+            logger.info(f"系统模板缓存已重建: version={version}, count={len(self._entries)}")
+            return self._entries
+
+    def invalidate(self) -> None:
+        """仅清空当前进程的缓存（其他 worker 依赖版本号失效）"""
+        with self._lock:
+            self._entries = None
+
+    @staticmethod
+    def _load(db: Session) -> List[CachedTemplate]:
+        rows = db.query(TemplateModel).filter(
+            TemplateModel.is_system == True,
+            not_deleted()
+        ).order_by(TemplateModel.id).all()
+        preload_blobs(db, rows)
+        return [
+            CachedTemplate(
+                id=row.id,
+                template_type=row.template_type,
+                content_hash=row.content_hash,
+                owner_id=row.owner_id,
+                is_system=bool(row.is_system),
+                updated_at=row.updated_at,
+                full_json=Template.model_validate(row).model_dump_json().encode("utf-8"),
+                summary_json=TemplateSummary.model_validate(row).model_dump_json().encode("utf-8"),
+            )
+            for row in rows
+        ]
+
+
+system_template_cache = SystemTemplateCache()
@@ -0,0 +1,159 @@
+"""
+模板访问权限解析
+
+打开模板是插件最频繁的请求。当前用户 id 取自 token 声明（见 app/auth.py::get_request_identity），
+这里用一条 SQL 同时取回模板和团队共享记录（关联子查询），并把结果缓存在进程内的短期用户缓存里：
+同一用户在 ACCESS_CACHE_TTL 秒内再次打开已判定过的模板时，只需按主键读取模板本身。
+
+共享关系变化时由 team.py 调用 invalidate_template() / invalidate_users() 清理缓存；
+多 worker 部署下其他进程依赖 TTL 过期，最长延迟 ACCESS_CACHE_TTL 秒。
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+from app.models.template import Template as TemplateModel, not_deleted
+from app.models.team import TeamTemplate, TeamMember
+
+# 用户访问缓存有效期（秒）
+ACCESS_CACHE_TTL = 30
+# 最多缓存的用户数，超出后淘汰最久未使用的用户
+ACCESS_CACHE_MAX_USERS = 10000
+
+ACCESS_SYSTEM = "system"
+ACCESS_OWNER = "owner"
+ACCESS_TEAM = "team"
+
+
+@dataclass(frozen=True)
+class TemplateAccess:
+    """模板访问判定结果"""
+    level: str  # system / owner / team
+    can_edit: bool
+
+
+@dataclass
+class _UserAccessEntry:
+    expires_at: float
+    # template_id -> 团队共享的 can_edit；None 表示该模板未共享给此用户
+    shared: Dict[int, Optional[bool]] = field(default_factory=dict)
+
+
+class TemplateAccessCache:
+    """按用户 id 缓存已判定过的模板共享关系（线程安全）"""
+
+    def __init__(self, ttl: float = ACCESS_CACHE_TTL, max_users: int = ACCESS_CACHE_MAX_USERS):
+        self._ttl = ttl
+        self._max_users = max_users
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, _UserAccessEntry]" = OrderedDict()
+
+    def lookup(self, user_id: int, template_id: int) -> Tuple[bool, Optional[bool]]:
+        """返回 (是否已判定过该模板, 共享 can_edit)"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return False, None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return False, None
+            self._entries.move_to_end(user_id)
+            if template_id not in entry.shared:
+                return False, None
+            return True, entry.shared[template_id]
+
+    def remember(self, user_id: int, template_id: int, shared: Optional[bool]) -> None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            now = time.monotonic()
+            if entry is None or entry.expires_at <= now:
+                entry = _UserAccessEntry(expires_at=now + self._ttl)
+                self._entries[user_id] = entry
+            entry.shared[template_id] = shared
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self._max_users:
+                self._entries.popitem(last=False)
+
+    def invalidate_template(self, template_id: int) -> None:
+        """模板共享/取消共享后调用：清除所有用户对该模板的判定"""
+        with self._lock:
+            for entry in self._entries.values():
+                entry.shared.pop(template_id, None)
+
+    def invalidate_users(self, user_ids: Iterable[int]) -> None:
+        """用户加入/退出/被移出团队后调用：清除这些用户的全部缓存"""
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+template_access_cache = TemplateAccessCache()
+
+
+def _shared_can_edit_subquery(user_id: int):
+    """用户通过团队共享获得的当前行模板的 can_edit（1/0），未共享时为 NULL"""
+    return select(
+        func.max(case((TeamTemplate.can_edit == True, 1), else_=0))
+    ).select_from(TeamTemplate).join(
+        TeamMember, TeamTemplate.team_id == TeamMember.team_id
+    ).where(
+        TeamTemplate.template_id == TemplateModel.id,
+        TeamMember.user_id == user_id
+    ).correlate(TemplateModel).scalar_subquery()
+
+
+def _decide(template: TemplateModel, user_id: Optional[int], shared: Optional[bool]) -> Optional[TemplateAccess]:
+    if template.is_system:
+        return TemplateAccess(level=ACCESS_SYSTEM, can_edit=False)
+    if user_id is None:
+        return None
+    if template.owner_id == user_id:
+        return TemplateAccess(level=ACCESS_OWNER, can_edit=True)
+    if shared is not None:
+        return TemplateAccess(level=ACCESS_TEAM, can_edit=bool(shared))
+    return None
+
+
+def resolve_template_access(
+    db: Session,
+    template_id: int,
+    user_id: Optional[int],
+    options: tuple = (),
+) -> Tuple[Optional[TemplateModel], Optional[TemplateAccess]]:
+    """加载模板并判定访问权限，返回 (模板, 访问判定)
+
+    模板不存在时模板为 None；无权访问（或未登录访问非系统模板）时访问判定为 None。
+    options 为附加到模板查询上的 loader 选项（例如 defer_content()）。
+    """
+    known, shared = (False, None)
+    if user_id is not None:
+        known, shared = template_access_cache.lookup(user_id, template_id)
+
+    if user_id is None or known:
+        # 未登录或缓存命中：只需按主键读取模板
+        template = db.query(TemplateModel).options(*options).filter(
+            TemplateModel.id == template_id, not_deleted()
+        ).first()
+        if template is None:
+            return None, None
+        return template, _decide(template, user_id, shared)
+
+    # 一条 SQL：模板 + 团队共享 can_edit
+    row = db.query(
+        TemplateModel,
+        _shared_can_edit_subquery(user_id).label("shared_can_edit")
+    ).options(*options).filter(TemplateModel.id == template_id, not_deleted()).first()
+    if row is None:
+        return None, None
+
+    template, shared_can_edit = row
+    shared = None if shared_can_edit is None else bool(shared_can_edit)
+    template_access_cache.remember(user_id, template_id, shared)
+    return template, _decide(template, user_id, shared)
@@ -0,0 +1,273 @@
+"""
+模板批量写入（导入脚本 / 数据迁移使用）
+
+整批在一个事务内完成：
+1. 一条 IN 查询找出同一作用域内已存在的同名模板
+2. 正文按内容寻址写入 template_blobs（已存在的正文只累加引用计数），
+   新模板通过一次 executemany 写入（PyMySQL 会改写为多行 INSERT ... VALUES）
+3. 再用一条 IN 查询取回新模板的 id，占位符字段索引同样一次 executemany 写入
+
+名称冲突作用域与单个创建接口一致：登录用户为自己的模板，未登录 / 系统模板为 owner_id 为空的模板。
+名称按唯一索引的比较方式（不区分大小写，见 template_names.name_key）判断重复；排序规则认为相同而这里没识别出的名称
+（或并发写入的同名模板）在写入时触发唯一索引冲突，此时改为逐条写入，冲突的条目单独返回错误，不影响整批。
+"""
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import and_, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.template import Template as TemplateModel, not_deleted
+from app.schemas.template import (
+    TemplateCreate, TemplateBatchRequest, TemplateBatchItemResult, TemplateBatchResponse
+)
+from app.services.template_content import compute_content_hash
+from app.services.template_text import build_search_text
+from app.services.template_versions import template_state, record_version
+from app.services.template_fields import sync_template_fields, bulk_insert_template_fields
+from app.services.template_changes import record_template_changes
+from app.services.template_forks import fork_columns, write_template_content, rebase_forks
+from app.services.template_blobs import BLOB_COLUMNS, acquire_blobs, release_blobs
+from app.services.template_names import is_name_conflict, name_key, name_scope_key
+from app.services.template_normalize import UnknownStyleClassError, normalize_template_html
+
+# 单次批量请求最多允许的模板数量
+MAX_BATCH_SIZE = 500
+
+ON_CONFLICT_SKIP = "skip"
+ON_CONFLICT_UPDATE = "update"
+ON_CONFLICT_MODES = (ON_CONFLICT_SKIP, ON_CONFLICT_UPDATE)
+
+
+def validate_batch_request(request: TemplateBatchRequest) -> None:
+    if not request.templates:
+        raise HTTPException(status_code=400, detail="模板列表不能为空")
+    if len(request.templates) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"单次最多导入 {MAX_BATCH_SIZE} 个模板")
+    if request.on_conflict not in ON_CONFLICT_MODES:
+        raise HTTPException(status_code=400, detail="on_conflict 只能为 'skip' 或 'update'")
+
+
+def batch_response(results: List[TemplateBatchItemResult]) -> TemplateBatchResponse:
+    counts = {"created": 0, "updated": 0, "skipped": 0, "error": 0}
+    for result in results:
+        if result.status in counts:
+            counts[result.status] += 1
+    return TemplateBatchResponse(
+        created=counts["created"],
+        updated=counts["updated"],
+        skipped=counts["skipped"],
+        failed=counts["error"],
+        bytes_before=sum(result.bytes_before or 0 for result in results),
+        bytes_after=sum(result.bytes_after or 0 for result in results),
+        results=results,
+    )
+
+
+def preview_jobs(request: TemplateBatchRequest, results: List[TemplateBatchItemResult]) -> List[Tuple[str, str]]:
+    """需要生成预览图的 (content_hash, HTML) 列表（新建或内容有变化的模板）"""
+    return [
+        (result.content_hash, request.templates[result.index].content)
+        for result in results
+        if result.status in ("created", "updated") and result.content_hash
+    ]
+
+
+def _scope_filter(owner_id: Optional[int]):
+    """同名冲突的作用域：同一所有者下未删除的模板"""
+    if owner_id is not None:
+        return and_(TemplateModel.owner_id == owner_id, not_deleted())
+    return and_(TemplateModel.owner_id == None, not_deleted())
+
+
+def _normalize_item(item: TemplateCreate, previous_html: Optional[str] = None) -> Tuple[int, int]:
+    """规范化条目正文并写回条目（预览图、字段索引都基于实际保存的正文），返回前后字节数"""
+    result = normalize_template_html(item.content, previous_html)
+    item.content = result.html
+    return result.bytes_before, result.bytes_after
+
+
+def _row_values(
+    item: TemplateCreate,
+    owner_id: Optional[int],
+    is_system: bool,
+    parent: Optional[TemplateModel] = None,
+) -> dict:
+    """构造 templates 表的一行（列名为数据库列名，派生字段与 _refresh_derived_fields 一致）"""
+    template_type = item.template_type or "normal"
+    columns = fork_columns(parent, item.content)
+    # 不能派生时正文存入 template_blobs，blob_hash 由调用方批量写入正文后填充
+    content, content_gz, content_encoding = columns if columns is not None else BLOB_COLUMNS
+    return {
+        "owner_id": owner_id,
+        "name_scope": name_scope_key(owner_id),
+        "parent_id": parent.id if columns is not None else None,
+        "blob_hash": None,
+        "name": item.name,
+        "content": content,
+        "content_gz": content_gz,
+        "content_encoding": content_encoding,
+        "template_type": template_type,
+        "is_system": is_system,
+        "content_hash": compute_content_hash(item.name, item.content, template_type),
+        "search_text": build_search_text(item.content),
+    }
+
+
+def _insert_rows(
+    db: Session,
+    rows: List[dict],
+    first_index: Dict[str, int],
+    results: List[Optional[TemplateBatchItemResult]],
+) -> List[dict]:
+    """写入新模板，返回实际写入的行
+
+    正常情况下一次 executemany 写入全部行；触发名称唯一索引冲突时回滚到保存点，改为逐条写入，
+    冲突的条目记为错误并释放其正文引用。
+    """
+    table = TemplateModel.__table__
+    try:
+        with db.begin_nested():
+            # executemany：一次往返写入全部新模板
+            db.execute(insert(table), rows)
+        return rows
+    except IntegrityError as e:
+        if not is_name_conflict(e):
+            raise
+
+    inserted = []
+    for row in rows:
+        try:
+            with db.begin_nested():
+                db.execute(insert(table), [row])
+            inserted.append(row)
+        except IntegrityError as e:
+            if not is_name_conflict(e):
+                raise
+            index = first_index[name_key(row["name"])]
+            results[index] = TemplateBatchItemResult(
+                index=index, name=row["name"], status="error", detail="模板名称已存在"
+            )
+            release_blobs(db, [row["blob_hash"]])
+    return inserted
+
+
+def batch_upsert_templates(
+    db: Session,
+    items: List[TemplateCreate],
+    owner_id: Optional[int],
+    is_system: bool = False,
+    on_conflict: str = ON_CONFLICT_SKIP,
+    user_id: Optional[int] = None,
+) -> List[TemplateBatchItemResult]:
+    """批量创建（或更新同名）模板，按请求顺序返回逐条结果；调用方负责提交事务
+
+    on_conflict='skip' 时同名模板跳过；'update' 时覆盖同名模板的正文与类型（并记录新版本）。
+    """
+    results: List[Optional[TemplateBatchItemResult]] = [None] * len(items)
+
+    # 键为 name_key(名称)：仅大小写不同的名称在唯一索引中视为重复
+    first_index: Dict[str, int] = {}
+    for index, item in enumerate(items):
+        key = name_key(item.name)
+        if key in first_index:
+            results[index] = TemplateBatchItemResult(
+                index=index, name=item.name, status="error", detail="批量请求中模板名称重复"
+            )
+        else:
+            first_index[key] = index
+
+    # 一条 IN 查询检查名称冲突（MySQL 上 IN 同样不区分大小写）
+    scope = _scope_filter(owner_id)
+    names = [items[index].name for index in first_index.values()]
+    existing_query = db.query(TemplateModel).filter(scope, TemplateModel.name.in_(names))
+    if on_conflict == ON_CONFLICT_UPDATE:
+        existing = {name_key(row.name): row for row in existing_query.order_by(TemplateModel.id)}
+    else:
+        existing = {
+            name_key(row.name): row
+            for row in existing_query.with_entities(TemplateModel.id, TemplateModel.name)
+        }
+
+    # 另存为的父模板同样一条 IN 查询取回
+    parent_ids = {items[index].parent_id for index in first_index.values() if items[index].parent_id}
+    parents = {
+        parent.id: parent
+        for parent in db.query(TemplateModel).filter(TemplateModel.id.in_(parent_ids))
+    } if parent_ids else {}
+
+    sizes: Dict[int, Tuple[int, int]] = {}
+    new_rows = []
+    rebased: Dict[int, Tuple[TemplateModel, str]] = {}
+    for key, index in first_index.items():
+        item = items[index]
+        name = item.name
+        row = existing.get(key)
+        parent = parents.get(item.parent_id)
+        if parent is not None and not (parent.is_system or parent.owner_id == owner_id):
+            parent = None  # 只从可见的来源模板取样式规则、派生
+        if row is None:
+            try:
+                sizes[index] = _normalize_item(item, parent.content if parent is not None else None)
+            except UnknownStyleClassError as e:
+                results[index] = TemplateBatchItemResult(index=index, name=name, status="error", detail=str(e))
+                continue
+            new_rows.append(_row_values(item, owner_id, is_system, parent))
+            continue
+
+        if on_conflict != ON_CONFLICT_UPDATE:
+            results[index] = TemplateBatchItemResult(
+                index=index, name=name, status="skipped", id=row.id, detail="模板名称已存在"
+            )
+            continue
+
+        previous = template_state(row)
+        try:
+            sizes[index] = _normalize_item(item, previous["content"])
+        except UnknownStyleClassError as e:
+            results[index] = TemplateBatchItemResult(index=index, name=name, status="error", detail=str(e))
+            continue
+        write_template_content(db, row, item.content, item.parent_id)
+        row.template_type = item.template_type or "normal"
+        row.content_hash = compute_content_hash(row.name, row.content, row.template_type)
+        row.search_text = build_search_text(row.content)
+        status = "unchanged"
+        if row.content_hash != previous["content_hash"]:
+            sync_template_fields(db, row.id, row.content)
+            record_version(db, row, previous, user_id)
+            if row.content != previous["content"]:
+                rebased[row.id] = (row, previous["content"])
+            status = "updated"
+        results[index] = TemplateBatchItemResult(
+            index=index, name=name, status=status, id=row.id, content_hash=row.content_hash,
+            bytes_before=sizes[index][0], bytes_after=sizes[index][1]
+        )
+
+    if new_rows:
+        blob_rows = [row for row in new_rows if row["content_encoding"] == BLOB_COLUMNS[2]]
+        blob_hashes = acquire_blobs(db, [items[first_index[name_key(row["name"])]].content for row in blob_rows])
+        for row, blob_hash in zip(blob_rows, blob_hashes):
+            row["blob_hash"] = blob_hash
+        new_rows = _insert_rows(db, new_rows, first_index, results)
+        created_ids = {
+            name_key(name): template_id
+            for name, template_id in db.query(TemplateModel.name, TemplateModel.id).filter(
+                scope, TemplateModel.name.in_([row["name"] for row in new_rows])
+            ).order_by(TemplateModel.id)
+        } if new_rows else {}
+        contents = {}
+        for row in new_rows:
+            index = first_index[name_key(row["name"])]
+            template_id = created_ids.get(name_key(row["name"]))
+            if template_id is not None:
+                contents[template_id] = items[index].content
+            results[index] = TemplateBatchItemResult(
+                index=index, name=row["name"], status="created", id=template_id,
+                content_hash=row["content_hash"], bytes_before=sizes[index][0], bytes_after=sizes[index][1]
+            )
+        bulk_insert_template_fields(db, contents)
+
+    # 系统模板正文被覆盖：派生自它的用户模板相对新正文重新计算差异（内容本身不变）
+    rebase_forks(db, rebased)
+    changed_ids = [result.id for result in results if result.status in ("created", "updated") and result.id]
+    record_template_changes(db, changed_ids, owner_id, is_system)
+    return results
@@ -0,0 +1,155 @@
+"""
+模板正文去重（按内容寻址）
+
+templates 中大量正文逐字节相同：AI 重试重复保存、多个用户复制同一系统模板、重复执行导入脚本。
+正文统一存放在 template_blobs 表，主键为正文的 SHA-256，templates.blob_hash 指向该行：
+- 写入已存在的正文只需一条按主键的 UPDATE ref_count = ref_count + 1（一次索引探测），不再压缩、不再写正文
+- 模板改用其他正文或被删除时 ref_count 减一，归零且确实没有模板引用时删除该行
+- 引用计数与模板写入在同一事务内；删除用户等数据库级联删除不经过这里，
+  计数可能偏大（只会多保留正文，不会误删），run_migration_template_blobs.py 可重新统计
+"""
+import hashlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import bindparam, exists, insert, select, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.template import Template as TemplateModel
+from app.models.template_blob import TemplateBlob
+from app.services.template_content import (
+    CONTENT_ENCODING_BLOB, CONTENT_ENCODING_GZIP, encode_content
+)
+
+# 模板行中正文列的取值：正文在 template_blobs 中
+BLOB_COLUMNS = ("", None, CONTENT_ENCODING_BLOB)
+
+_blobs = TemplateBlob.__table__
+
+
+def content_digest(html: str) -> str:
+    return hashlib.sha256((html or "").encode("utf-8")).hexdigest()
+
+
+def _blob_row(blob_hash: str, html: str, ref_count: int) -> dict:
+    content, content_gz, content_encoding = encode_content(html)
+    return {
+        "hash": blob_hash,
+        "content": content,
+        "content_gz": content_gz,
+        "content_encoding": content_encoding,
+        "size": len((html or "").encode("utf-8")),
+        "ref_count": ref_count,
+    }
+
+
+def _increment(db: Session, counts: Dict[str, int]) -> None:
+    db.execute(
+        update(_blobs).where(_blobs.c.hash == bindparam("b_hash")).values(
+            ref_count=_blobs.c.ref_count + bindparam("b_count")
+        ),
+        [{"b_hash": blob_hash, "b_count": count} for blob_hash, count in counts.items()]
+    )
+
+
+def _acquire_one(db: Session, blob_hash: str, html: str, count: int) -> None:
+    """已存在时只累加计数；不存在时插入（并发插入同一正文时退回累加）"""
+    result = db.execute(
+        update(_blobs).where(_blobs.c.hash == blob_hash).values(ref_count=_blobs.c.ref_count + count)
+    )
+    if result.rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(_blobs), [_blob_row(blob_hash, html, count)])
+    except IntegrityError:
+        _increment(db, {blob_hash: count})
+
+
+def acquire_blob(db: Session, html: str) -> str:
+    """为一个模板引用正文，返回 blob_hash"""
+    blob_hash = content_digest(html)
+    _acquire_one(db, blob_hash, html, 1)
+    return blob_hash
+
+
+def acquire_blobs(db: Session, bodies: List[str]) -> List[str]:
+    """批量引用正文（批量导入使用），按顺序返回 blob_hash
+
+    一条 IN 查询找出已存在的正文，新正文一次 executemany 写入，已存在的正文一次 executemany 累加计数。
+    """
+    hashes = [content_digest(html) for html in bodies]
+    if not hashes:
+        return hashes
+    counts = Counter(hashes)
+    body_by_hash = dict(zip(hashes, bodies))
+    existing = set(db.execute(select(_blobs.c.hash).where(_blobs.c.hash.in_(list(counts)))).scalars())
+
+    missing = [blob_hash for blob_hash in counts if blob_hash not in existing]
+    if missing:
+        try:
+            with db.begin_nested():
+                db.execute(insert(_blobs), [
+                    _blob_row(blob_hash, body_by_hash[blob_hash], counts[blob_hash]) for blob_hash in missing
+                ])
+        except IntegrityError:
+            # 并发写入了其中部分正文：逐个处理
+            for blob_hash in missing:
+                _acquire_one(db, blob_hash, body_by_hash[blob_hash], counts[blob_hash])
+    if existing:
+        _increment(db, {blob_hash: counts[blob_hash] for blob_hash in existing})
+    return hashes
+
+
+def release_blobs(db: Session, blob_hashes: Iterable[Optional[str]]) -> None:
+    """模板不再引用这些正文后调用（模板的修改 / 删除须已加入会话），计数归零的正文被删除"""
+    counts = Counter(blob_hash for blob_hash in blob_hashes if blob_hash)
+    if not counts:
+        return
+    # 会话未开启 autoflush：先把模板的修改写入，删除正文时才能确认已无引用
+    db.flush()
+    _increment(db, {blob_hash: -count for blob_hash, count in counts.items()})
+    db.execute(delete(_blobs).where(
+        _blobs.c.hash.in_(list(counts)),
+        _blobs.c.ref_count <= 0,
+        ~exists().where(TemplateModel.blob_hash == _blobs.c.hash)
+    ))
+
+
+def store_template_body(db: Session, template: TemplateModel, html: str) -> None:
+    """把模板正文写入 template_blobs，并释放模板原来引用的正文"""
+    previous = template.blob_hash
+    blob_hash = content_digest(html)
+    if blob_hash != previous:
+        _acquire_one(db, blob_hash, html, 1)
+    template.store_content(BLOB_COLUMNS, html)
+    template.blob_hash = blob_hash
+    if previous and previous != blob_hash:
+        release_blobs(db, [previous])
+
+
+def detach_template_body(db: Session, template: TemplateModel) -> None:
+    """模板改为不经 template_blobs 存储（例如改存为派生差异）后调用"""
+    previous = template.blob_hash
+    template.blob_hash = None
+    release_blobs(db, [previous])
+
+
+def preload_blobs(db: Session, templates: Iterable[TemplateModel]) -> None:
+    """批量读取正文前一次加载所需的 template_blobs 行（之后 Template.content 从 identity map 取）"""
+    blob_hashes = {
+        template.blob_hash for template in templates
+        if template.content_encoding == CONTENT_ENCODING_BLOB and template.blob_hash
+    }
+    if blob_hashes:
+        db.query(TemplateBlob).filter(TemplateBlob.hash.in_(list(blob_hashes))).all()
+
+
+def stored_gzip_body(db: Session, template: TemplateModel) -> Optional[bytes]:
+    """正文以 gzip 存储时返回压缩字节（可直接作为 Content-Encoding: gzip 下发），否则返回 None"""
+    if template.content_encoding == CONTENT_ENCODING_GZIP:
+        return template.content_gz
+    if template.content_encoding == CONTENT_ENCODING_BLOB:
+        blob = db.get(TemplateBlob, template.blob_hash)
+        if blob is not None and blob.content_encoding == CONTENT_ENCODING_GZIP:
+            return blob.content_gz
+    return None
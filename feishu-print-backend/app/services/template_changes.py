@@ -0,0 +1,96 @@
+"""
+模板变更日志（template_changes 表）与增量同步
+
+写入模板时与模板在同一事务内追加变更记录；插件带上次的游标调用 /api/templates/changes，
+只拿到游标之后变化过的模板（删除的以墓碑返回），本地镜像按变更量而不是模板总量同步。
+
+自增 id 按插入顺序分配、按提交顺序可见，并发事务可能让较小的 id 稍晚才可见；
+因此最近 CHANGE_SETTLE_SECONDS 秒内的记录虽然照常返回，但游标不会越过它们，下次同步会再次返回（幂等）。
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import insert, or_, and_
+from sqlalchemy.orm import Session
+from app.models.template import Template as TemplateModel
+from app.models.template_change import TemplateChange
+
+CHANGE_UPSERT = "upsert"
+CHANGE_DELETE = "delete"
+# 变更记录的“沉淀”时间（秒），游标只推进到早于该时间的记录
+CHANGE_SETTLE_SECONDS = 5
+
+
+def record_template_change(db: Session, template: TemplateModel, action: str = CHANGE_UPSERT) -> None:
+    """记录单个模板的变更（随调用方事务提交）"""
+    db.add(TemplateChange(
+        template_id=template.id,
+        owner_id=template.owner_id,
+        is_system=bool(template.is_system),
+        action=action,
+    ))
+
+
+def record_template_changes(
+    db: Session,
+    template_ids: Iterable[int],
+    owner_id: Optional[int],
+    is_system: bool,
+    action: str = CHANGE_UPSERT,
+) -> None:
+    """批量记录同一作用域下多个模板的变更（一次 executemany）"""
+    rows = [
+        {"template_id": template_id, "owner_id": owner_id, "is_system": is_system, "action": action}
+        for template_id in template_ids
+    ]
+    if rows:
+        db.execute(insert(TemplateChange.__table__), rows)
+
+
+def latest_change_id(db: Session) -> int:
+    row = db.query(TemplateChange.id).order_by(TemplateChange.id.desc()).first()
+    return row.id if row else 0
+
+
+def _visible_filter(user_id: Optional[int]):
+    """可见范围与模板列表一致：系统模板 + 自己的模板 + owner_id 为空的旧数据"""
+    if user_id is None:
+        return TemplateChange.is_system == True
+    return or_(
+        TemplateChange.is_system == True,
+        TemplateChange.owner_id == user_id,
+        and_(TemplateChange.owner_id == None, TemplateChange.is_system == False),
+    )
+
+
+def list_changes_since(
+    db: Session,
+    since: int,
+    user_id: Optional[int],
+    limit: int,
+) -> Tuple[List[TemplateChange], int, bool]:
+    """返回 (每个模板最后一次变更, 新游标, 是否还有更多)
+
+    同一模板在区间内多次变更时只保留最后一次。
+    """
+    rows = db.query(TemplateChange).filter(
+        TemplateChange.id > since,
+        _visible_filter(user_id)
+    ).order_by(TemplateChange.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    cursor = since
+    settle_before = datetime.now() - timedelta(seconds=CHANGE_SETTLE_SECONDS)
+    for row in rows:
+        if row.created_at is not None and row.created_at > settle_before:
+            break
+        cursor = row.id
+    if has_more and cursor == since and rows:
+        # 整页都在沉淀期内时仍需推进，避免客户端原地循环
+        cursor = rows[-1].id
+
+    latest = {}
+    for row in rows:
+        latest.pop(row.template_id, None)
+        latest[row.template_id] = row
+    return list(latest.values()), cursor, has_more
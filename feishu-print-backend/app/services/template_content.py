@@ -0,0 +1,89 @@
+"""
+模板正文相关的工具函数（内容哈希 / ETag / 压缩存储）
+"""
+import gzip
+import hashlib
+from typing import Iterable, Optional, Tuple
+from app.config import settings
+
+# content_encoding 取值：NULL 表示旧数据，正文以明文存放在 content 列
+CONTENT_ENCODING_GZIP = "gzip"
+# 派生模板：content_gz 为相对父模板（parent_id）的差异，由 services/template_forks.py 还原
+CONTENT_ENCODING_FORK = "fork"
+# 正文存放在 template_blobs 表（按内容寻址，见 services/template_blobs.py），templates.blob_hash 指向该行
+CONTENT_ENCODING_BLOB = "blob"
+
+
+def compute_content_hash(name: str, content: str, template_type: Optional[str]) -> str:
+    """计算模板内容哈希：SHA-256(name + content + template_type)，字段间以 \\x00 分隔"""
+    digest = hashlib.sha256()
+    for part in (name or "", content or "", template_type or "normal"):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def make_etag(value: str) -> str:
+    """生成强 ETag（带引号）"""
+    return f'"{value}"'
+
+
+def combine_etag(parts: Iterable[str]) -> str:
+    """把多个条目的版本信息合并成一个列表级 ETag"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\n")
+    return make_etag(digest.hexdigest())
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判断 If-None-Match 是否命中当前 ETag（If-None-Match 使用弱比较）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def encode_content(html: str) -> Tuple[str, Optional[bytes], Optional[str]]:
+    """把正文编码为入库格式，返回 (content 列, content_gz 列, content_encoding 列)
+
+    AI 生成的 HTML 大量重复内联 style，gzip 压缩率很高；过短的正文压缩收益有限，仍以明文存放。
+    使用标准 gzip 格式（mtime 固定为 0，相同正文得到相同字节），客户端支持 gzip 时可直接下发。
+    """
+    html = html or ""
+    raw = html.encode("utf-8")
+    if (
+        settings.template_content_compression != CONTENT_ENCODING_GZIP
+        or len(raw) < settings.template_content_compress_min_bytes
+    ):
+        return html, None, None
+    compressed = gzip.compress(raw, compresslevel=6, mtime=0)
+    if len(compressed) >= len(raw):
+        return html, None, None
+    return "", compressed, CONTENT_ENCODING_GZIP
+
+
+def decode_content(content: Optional[str], content_gz: Optional[bytes], content_encoding: Optional[str]) -> str:
+    """把入库格式还原为正文"""
+    if content_encoding == CONTENT_ENCODING_GZIP and content_gz is not None:
+        return gzip.decompress(content_gz).decode("utf-8")
+    return content or ""
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Accept-Encoding 是否接受 gzip（忽略 q=0 的显式拒绝）"""
+    if not accept_encoding:
+        return False
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "").lower() not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
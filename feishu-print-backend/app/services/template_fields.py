@@ -0,0 +1,101 @@
+"""
+模板占位符字段索引（template_fields 表）
+
+写入模板时调用 sync_template_fields() 解析一次占位符并落库；
+rank_templates_by_fields() 只通过 field_name 索引查询，按与给定字段列表的重合度为模板排序。
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Query, Session
+from app.models.template import Template as TemplateModel
+from app.models.template_field import TemplateField
+from app.services.template_text import extract_placeholder_fields
+
+# field_name 列长度
+MAX_FIELD_NAME_LENGTH = 255
+
+
+@dataclass
+class FieldMatch:
+    """单个模板的字段匹配结果"""
+    template_id: int
+    matched_fields: List[str]
+    field_count: int
+
+    @property
+    def matched_count(self) -> int:
+        return len(self.matched_fields)
+
+    @property
+    def coverage(self) -> float:
+        """模板自身字段中能被填充的比例"""
+        return self.matched_count / self.field_count if self.field_count else 0.0
+
+
+def _field_rows(template_id: int, html: str) -> List[dict]:
+    rows = []
+    seen = set()
+    for field_name in extract_placeholder_fields(html):
+        field_name = field_name[:MAX_FIELD_NAME_LENGTH]
+        if field_name in seen:
+            continue
+        seen.add(field_name)
+        rows.append({"template_id": template_id, "field_name": field_name, "position": len(rows)})
+    return rows
+
+
+def sync_template_fields(db: Session, template_id: int, html: str) -> None:
+    """重建单个模板的字段索引（与调用方同一事务提交）"""
+    db.query(TemplateField).filter(TemplateField.template_id == template_id).delete(synchronize_session=False)
+    rows = _field_rows(template_id, html)
+    if rows:
+        db.execute(insert(TemplateField.__table__), rows)
+
+
+def bulk_insert_template_fields(db: Session, contents: Dict[int, str]) -> None:
+    """批量写入新模板的字段索引（template_id -> HTML），一次 executemany"""
+    rows = []
+    for template_id, html in contents.items():
+        rows.extend(_field_rows(template_id, html))
+    if rows:
+        db.execute(insert(TemplateField.__table__), rows)
+
+
+def rank_templates_by_fields(
+    db: Session,
+    visible_query: Query,
+    fields: List[str],
+    limit: int,
+) -> List[FieldMatch]:
+    """按字段重合度为可见模板排序：命中字段数降序，其次覆盖率降序，最后按 id
+
+    visible_query 为已带可见性/类型过滤的 TemplateModel 查询，这里只取其 id 作为子查询。
+    """
+    fields = list(dict.fromkeys(name for name in fields if name))
+    if not fields:
+        return []
+
+    visible_ids = visible_query.with_entities(TemplateModel.id)
+    matched: Dict[int, List[str]] = defaultdict(list)
+    rows = db.query(TemplateField.template_id, TemplateField.field_name).filter(
+        TemplateField.field_name.in_(fields),
+        TemplateField.template_id.in_(visible_ids)
+    ).order_by(TemplateField.template_id, TemplateField.position)
+    for template_id, field_name in rows:
+        matched[template_id].append(field_name)
+    if not matched:
+        return []
+
+    field_counts = dict(
+        db.query(TemplateField.template_id, func.count(TemplateField.id)).filter(
+            TemplateField.template_id.in_(list(matched))
+        ).group_by(TemplateField.template_id)
+    )
+    results = [
+        FieldMatch(template_id=template_id, matched_fields=names, field_count=field_counts.get(template_id, 0))
+        for template_id, names in matched.items()
+    ]
+    results.sort(key=lambda m: (-m.matched_count, -m.coverage, m.template_id))
+    return results[:limit]
@@ -0,0 +1,198 @@
+"""
+派生模板（写时复制）
+
+用户常把系统模板"另存为"后只改一两处，每份副本都在 templates 表里完整保存 20~60 KB 的 HTML。
+派生模板只保存 parent_id 和相对父模板的差异：
+- content_encoding = 'fork'，content_gz 为 gzip 压缩的差异操作（格式与 template_versions 的差异相同）
+- 差异超过完整正文压缩后大小的 template_fork_max_delta_ratio，或差异计算超出 diff_tokens 的工作量上限时
+  不再派生，完整正文存入 template_blobs（大模板的保存和 rebase_forks 不会被差异计算拖住）
+- 子模板保存时总是规范化的（见 template_normalize.py），规范化上线前导入的系统模板却没有，两者相比每个带样式的单元格
+  都不同，差异必然超限。第一次从这样的父模板派生时先把父模板本身规范化（渲染结果不变，记录版本和变更，
+  已有的派生模板随之重新计算差异），之后的差异只包含用户真正改动的部分
+- 父模板只能是系统模板（用户接口不能修改或删除系统模板）；系统模板被批量导入覆盖时，
+  rebase_forks() 先用旧正文还原各派生模板，再相对新正文重新计算差异，派生模板的内容保持不变
+- 读取时由 Template.content 调用 materialize_fork()，还原结果按 (id, content_hash) 缓存在进程内 LRU 中
+"""
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session, object_session
+from app.config import settings
+from app.models.template import Template as TemplateModel
+from app.services.template_changes import record_template_change
+from app.services.template_content import CONTENT_ENCODING_FORK, compute_content_hash
+from app.services.template_blobs import store_template_body, detach_template_body
+from app.services.template_fields import sync_template_fields
+from app.services.template_normalize import normalize_template_html
+from app.services.template_text import build_search_text
+from app.services.template_versions import (
+    DeltaOp, apply_delta, diff_tokens, record_version, template_state, tokenize_html
+)
+from app.services.system_template_cache import bump_system_templates_version
+
+
+class ForkContentCache:
+    """派生模板还原结果的 LRU 缓存（线程安全）
+
+    键包含 content_hash，模板内容变化后旧条目自然失效；父模板变化时派生模板内容不变，缓存仍然有效。
+    """
+
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[int, str], str]" = OrderedDict()
+
+    def get(self, key: Tuple[int, str]) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Tuple[int, str], value: str) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+fork_content_cache = ForkContentCache(settings.template_fork_cache_size)
+
+
+def _pack_ops(ops: List[DeltaOp]) -> bytes:
+    return gzip.compress(json.dumps(ops, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), mtime=0)
+
+
+def _unpack_ops(payload: bytes) -> List[DeltaOp]:
+    return json.loads(gzip.decompress(payload).decode("utf-8"))
+
+
+def can_fork_from(parent: Optional[TemplateModel]) -> bool:
+    """只有系统模板（且本身不是派生模板）可以作为父模板"""
+    return parent is not None and bool(parent.is_system) and parent.content_encoding != CONTENT_ENCODING_FORK
+
+
+def encode_fork(parent_html: str, html: str) -> Optional[tuple]:
+    """编码为相对父模板的差异，返回 (content, content_gz, content_encoding)；差异过大或计算超限时返回 None"""
+    html = html or ""
+    ops = diff_tokens(tokenize_html(parent_html), tokenize_html(html))
+    if ops is None:
+        return None
+    payload = _pack_ops(ops)
+    full_size = len(gzip.compress(html.encode("utf-8"), compresslevel=6, mtime=0))
+    if len(payload) >= full_size or len(payload) > full_size * settings.template_fork_max_delta_ratio:
+        return None
+    return "", payload, CONTENT_ENCODING_FORK
+
+
+def normalize_fork_parent(parent: TemplateModel) -> None:
+    """派生前确保父模板正文已规范化（与子模板的形式一致），随调用方事务提交"""
+    if parent.__dict__.get("_fork_base_checked"):
+        return
+    # 先做标记：下面的 rebase_forks 会再次经过 fork_columns
+    parent.__dict__["_fork_base_checked"] = True
+    html = normalize_template_html(parent.content).html
+    if html == parent.content:
+        return
+    db = object_session(parent)
+    previous = template_state(parent)
+    store_template_body(db, parent, html)
+    parent.content_hash = compute_content_hash(parent.name, html, parent.template_type)
+    parent.search_text = build_search_text(html)
+    sync_template_fields(db, parent.id, html)
+    record_version(db, parent, previous)
+    record_template_change(db, parent)
+    bump_system_templates_version(db)
+    rebase_forks(db, {parent.id: (parent, previous["content"])})
+
+
+def fork_columns(parent: Optional[TemplateModel], html: str) -> Optional[tuple]:
+    """parent 可以派生且差异足够小时返回派生的正文列，否则返回 None（应保存完整正文）"""
+    if not can_fork_from(parent):
+        return None
+    normalize_fork_parent(parent)
+    return encode_fork(parent.content, html)
+
+
+def set_template_content(
+    db: Session,
+    template: TemplateModel,
+    html: str,
+    parent: Optional[TemplateModel],
+) -> None:
+    """写入正文：parent 可以派生且差异足够小时保存差异，否则保存完整正文并解除派生关系"""
+    columns = fork_columns(parent, html)
+    if columns is None:
+        store_template_body(db, template, html)
+        template.parent_id = None
+        return
+    template.store_content(columns, html)
+    template.parent_id = parent.id
+    if template.blob_hash:
+        detach_template_body(db, template)
+
+
+def write_template_content(
+    db: Session,
+    template: TemplateModel,
+    html: str,
+    parent_id: Optional[int] = None,
+) -> None:
+    """写入模板正文；指定了 parent_id（另存为）或模板本身是派生模板时尽量保存为差异"""
+    parent_id = parent_id if parent_id is not None else template.parent_id
+    parent = db.get(TemplateModel, parent_id) if parent_id else None
+    set_template_content(db, template, html, parent)
+
+
+def _apply_fork(parent_html: str, payload: bytes) -> str:
+    return apply_delta(tokenize_html(parent_html), _unpack_ops(payload))
+
+
+def materialize_fork(template: TemplateModel) -> str:
+    """还原派生模板正文（Template.content 在 content_encoding='fork' 时调用）"""
+    key = (template.id, template.content_hash) if template.id and template.content_hash else None
+    if key is not None:
+        cached = fork_content_cache.get(key)
+        if cached is not None:
+            return cached
+
+    db = object_session(template)
+    parent = db.get(TemplateModel, template.parent_id) if db is not None and template.parent_id else None
+    if parent is None:
+        raise ValueError(f"派生模板 {template.id} 的父模板不存在")
+
+    html = _apply_fork(parent.content, template.content_gz)
+    if key is not None:
+        fork_content_cache.put(key, html)
+    return html
+
+
+def rebase_forks(db: Session, parents: Dict[int, Tuple[TemplateModel, str]]) -> int:
+    """父模板正文变化后重新计算派生模板的差异，返回处理的派生模板数
+
+    parents 为 {父模板 id: (父模板, 修改前的正文)}，在父模板写入新正文之后、提交之前调用。
+    """
+    if not parents:
+        return 0
+    children = db.query(TemplateModel).filter(
+        TemplateModel.parent_id.in_(list(parents)),
+        TemplateModel.content_encoding == CONTENT_ENCODING_FORK,
+    ).all()
+
+    old_tokens = {}
+    for child in children:
+        parent, old_html = parents[child.parent_id]
+        if child.parent_id not in old_tokens:
+            old_tokens[child.parent_id] = tokenize_html(old_html)
+        html = child.__dict__.get("_decoded_content")
+        if html is None:
+            html = apply_delta(old_tokens[child.parent_id], _unpack_ops(child.content_gz))
+        set_template_content(db, child, html, parent)
+    return len(children)
@@ -0,0 +1,63 @@
+"""
+模板名称唯一性
+
+同一所有者下未删除模板的名称由唯一索引 uq_templates_owner_name (name_scope, name) 保证（见 models/template.py），
+写入前不再先 SELECT 检查重名：直接 INSERT / UPDATE，重名时数据库抛出 IntegrityError，由接口转换为 400。
+两个插件窗口并发保存同名模板时也只会有一个成功。
+
+自动编号模式下，一条按唯一索引范围扫描的查询取出同一作用域内以该名称开头的名称，选出下一个可用的 "名称 (n)"。
+"""
+import re
+from typing import Iterable, Optional
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.template import Template as TemplateModel, NAME_UNIQUE_CONSTRAINT
+
+# templates.name 的最大长度
+MAX_NAME_LENGTH = 255
+
+
+def name_scope_key(owner_id: Optional[int]) -> int:
+    """未删除的模板的 templates.name_scope 取值（与 models/template.py::_sync_name_scope 一致）"""
+    return owner_id if owner_id is not None else 0
+
+
+def is_name_conflict(error: IntegrityError) -> bool:
+    """IntegrityError 是否由名称唯一索引引起"""
+    message = str(error.orig)
+    # MySQL: Duplicate entry ... for key 'templates.uq_templates_owner_name'
+    # SQLite（本地开发）: UNIQUE constraint failed: templates.name_scope, templates.name
+    return NAME_UNIQUE_CONSTRAINT in message or "templates.name_scope" in message
+
+
+def name_key(name: str) -> str:
+    """按唯一索引比较名称时使用的键：MySQL 默认排序规则不区分大小写，也忽略末尾空格"""
+    return name.rstrip(" ").lower()
+
+
+def suffixed_name(name: str, number: int) -> str:
+    suffix = f" ({number})"
+    return name[:MAX_NAME_LENGTH - len(suffix)] + suffix
+
+
+def pick_free_name(name: str, taken: Iterable[str]) -> str:
+    """taken 为同一作用域内已占用的名称，返回 name 或第一个大于已有编号的 "name (n)"
+
+    MySQL 默认排序规则不区分大小写，这里也按不区分大小写比较。
+    """
+    taken = {name_key(value) for value in taken}
+    if name_key(name) not in taken:
+        return name
+    pattern = re.compile(re.escape(name_key(name)) + r" \((\d+)\)$")
+    numbers = [int(match.group(1)) for match in map(pattern.match, taken) if match]
+    return suffixed_name(name, max(numbers, default=1) + 1)
+
+
+def next_free_name(db: Session, owner_id: Optional[int], name: str) -> str:
+    """一条查询选出 owner_id 作用域下 name 的下一个可用名称"""
+    taken = db.execute(select(TemplateModel.name).where(
+        TemplateModel.name_scope == name_scope_key(owner_id),
+        TemplateModel.name.startswith(name, autoescape=True)
+    )).scalars().all()
+    return pick_free_name(name, taken)
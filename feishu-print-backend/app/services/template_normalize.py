@@ -0,0 +1,262 @@
+"""
+模板 HTML 写入时规范化
+
+AI 生成的模板在每个 <td> 上重复同样的长 inline style，既占存储、增加下发体积，也让编辑器要遍历的 DOM 变大。
+保存模板（创建 / 修改 / 批量导入）时做一次规范化，渲染结果保持不变：
+1. 在 #template-root 内重复出现的 inline style 提升为 <style data-template-styles> 中的类（ts-<哈希>），
+   选择器写成 #template-root .ts-xxxxxxxx，优先级高于编辑器注入的类选择器，层叠结果与 inline style 相同；
+   样式块放在 #template-root 内的第一个子节点，插件只取 #template-root 的 outerHTML（模板库预览、导出）时规则随之带上
+2. 去掉无效属性：空的 style / class / id / title，TinyMCE 内部的 data-mce-style 等
+3. 折叠文本中的连续空白（pre / textarea 以及设置了 white-space 的元素内除外）
+
+TinyMCE 加载正文时会丢弃 body 中的 <style>（编辑器把它注入 iframe head），保存回来的正文只剩类名；
+规范化时先用本次正文和上一版本正文中的规则把类展开回 inline style，再重新提升，编辑后保存不会丢样式；
+另存为 / 复制时上一版本是来源模板（parent_id）。仍有找不到规则的 ts- 类时抛出 UnknownStyleClassError，
+不保存类名指向空处的正文。
+模板自带 <style> / <link> 时不提升样式，自带的 CSS 涉及 white-space 时不折叠空白。
+"""
+import hashlib
+import html as html_module
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import lxml.html
+from lxml import etree
+from app.config import settings
+
+STYLE_BLOCK_ATTR = "data-template-styles"
+ROOT_ID = "template-root"
+# 提升后的类名：ts- + 样式的 SHA-1 前 8 位（相同样式在任何模板中得到相同类名）
+CLASS_PREFIX = "ts-"
+# 至少重复出现这么多次的 inline style 才考虑提升
+MIN_HOIST_OCCURRENCES = 2
+
+# 这些标签内的空白有意义
+PRESERVE_WHITESPACE_TAGS = {"pre", "textarea", "script", "style", "xmp", "listing", "plaintext"}
+# 渲染无关的 TinyMCE 内部属性
+NOOP_ATTRIBUTES = ("data-mce-style", "data-mce-src", "data-mce-href", "data-mce-selected")
+# 值为空时无意义的属性
+EMPTY_NOOP_ATTRIBUTES = ("style", "class", "id", "title")
+
+_CLASS_RE = re.compile(r"^ts-[0-9a-f]{8}$")
+_RULE_RE = re.compile(r"#template-root\s+\.(ts-[0-9a-f]{8})\s*\{([^{}]*)\}")
+_FULL_DOCUMENT_RE = re.compile(r"^\s*<(!doctype|html|head|body)\b", re.IGNORECASE)
+_WHITE_SPACE_STYLE_RE = re.compile(r"white-space\s*:\s*(pre|break-spaces)", re.IGNORECASE)
+# 只折叠 HTML 空白字符（不含 &nbsp;）
+_WHITESPACE_RE = re.compile(r"[ \t\n\r\f]+")
+
+
+class UnknownStyleClassError(ValueError):
+    """正文引用了提升后的类，但本次正文和上一版本正文中都没有对应的规则"""
+
+    def __init__(self, class_names: List[str]):
+        self.class_names = class_names
+        super().__init__(f"正文引用的样式类 {', '.join(class_names)} 缺少定义，请从原模板另存为或复制")
+
+
+@dataclass
+class NormalizedHtml:
+    """规范化结果（字节数为 UTF-8 编码长度）"""
+    html: str
+    bytes_before: int
+    bytes_after: int
+
+
+def _byte_length(html: str) -> int:
+    return len((html or "").encode("utf-8"))
+
+
+def _unchanged(html: str) -> NormalizedHtml:
+    size = _byte_length(html)
+    return NormalizedHtml(html=html, bytes_before=size, bytes_after=size)
+
+
+def _split_declarations(style: str) -> List[str]:
+    """按 ; 切分样式声明（忽略括号和引号内的 ;，例如 url(data:image/png;base64,...)）"""
+    parts = []
+    depth = 0
+    quote = None
+    start = 0
+    for index, char in enumerate(style):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(depth - 1, 0)
+        elif char == ";" and depth == 0:
+            parts.append(style[start:index])
+            start = index + 1
+    parts.append(style[start:])
+    return parts
+
+
+def normalize_style(style: str) -> str:
+    """规范化 inline style：去掉空声明和多余空白，属性名转小写（自定义属性 --x 除外），保持声明顺序"""
+    declarations = []
+    for part in _split_declarations(style or ""):
+        name, sep, value = part.partition(":")
+        name = name.strip()
+        value = value.strip()
+        if not sep or not name or not value:
+            continue
+        if not name.startswith("--"):
+            name = name.lower()
+        if "'" not in value and '"' not in value:
+            value = _WHITESPACE_RE.sub(" ", value)
+        declarations.append(f"{name}:{value}")
+    return ";".join(declarations)
+
+
+def extract_hoisted_rules(html: Optional[str]) -> Dict[str, str]:
+    """从正文中的 <style data-template-styles> 取回 {类名: 样式}"""
+    if not html or CLASS_PREFIX not in html:
+        return {}
+    return {name: style.strip() for name, style in _RULE_RE.findall(html)}
+
+
+def _class_name(style: str) -> str:
+    return CLASS_PREFIX + hashlib.sha1(style.encode("utf-8")).hexdigest()[:8]
+
+
+def _elements(root):
+    return (el for el in root.iter() if isinstance(el.tag, str))
+
+
+def _expand_classes(el, rules: Dict[str, str]) -> bool:
+    """把已提升的类展开回 inline style（类规则在前，元素自身的 inline style 在后，覆盖关系不变）"""
+    classes = (el.get("class") or "").split()
+    hoisted = [name for name in classes if _CLASS_RE.match(name) and name in rules]
+    if not hoisted:
+        return False
+    styles = [rules[name] for name in hoisted]
+    if el.get("style"):
+        styles.append(el.get("style"))
+    el.set("style", ";".join(styles))
+    remaining = [name for name in classes if name not in hoisted]
+    if remaining:
+        el.set("class", " ".join(remaining))
+    else:
+        del el.attrib["class"]
+    return True
+
+
+def expand_hoisted_classes(root, rules: Dict[str, str]) -> None:
+    """把已解析的树中提升出去的类展开回 inline style（供只读取 inline style 的预览图等使用）"""
+    if not rules:
+        return
+    for el in _elements(root):
+        _expand_classes(el, rules)
+
+
+def _clean_attributes(el) -> None:
+    for name in NOOP_ATTRIBUTES:
+        el.attrib.pop(name, None)
+    if el.get("style") is not None:
+        el.set("style", normalize_style(el.get("style")))
+    for name in EMPTY_NOOP_ATTRIBUTES:
+        value = el.get(name)
+        if value is not None and not value.strip():
+            del el.attrib[name]
+
+
+def _collapse_whitespace(el) -> None:
+    if el.tag in PRESERVE_WHITESPACE_TAGS or _WHITE_SPACE_STYLE_RE.search(el.get("style") or ""):
+        return
+    if el.text:
+        el.text = _WHITESPACE_RE.sub(" ", el.text)
+    for child in el:
+        if isinstance(child.tag, str):
+            _collapse_whitespace(child)
+        if child.tail:
+            child.tail = _WHITESPACE_RE.sub(" ", child.tail)
+
+
+def _hoist_styles(wrapper) -> None:
+    roots = wrapper.xpath(f"//*[@id='{ROOT_ID}']")
+    if len(roots) != 1:
+        return
+    root = roots[0]
+    targets = [el for el in root.iterdescendants() if isinstance(el.tag, str) and el.get("style")]
+    counts = Counter(el.get("style") for el in targets)
+
+    hoisted = {}
+    for style, count in counts.items():
+        if count < MIN_HOIST_OCCURRENCES:
+            continue
+        name = _class_name(style)
+        rule = f"#{ROOT_ID} .{name}{{{style}}}"
+        # 每个元素省掉 style="..."，多出类名（最坏情况下还要多一个 class="" 属性）
+        saving = count * (len(style) + len(' style=""')) - count * (len(name) + len(' class=""')) - len(rule)
+        if saving > 0:
+            hoisted[style] = (name, rule)
+    if not hoisted:
+        return
+
+    for el in targets:
+        entry = hoisted.get(el.get("style"))
+        if entry is None:
+            continue
+        del el.attrib["style"]
+        classes = (el.get("class") or "").split()
+        el.set("class", " ".join(classes + [entry[0]]))
+
+    block = etree.Element("style")
+    block.set(STYLE_BLOCK_ATTR, "")
+    block.text = "".join(rule for _, rule in hoisted.values())
+    block.tail = root.text
+    root.text = None
+    root.insert(0, block)
+
+
+def _serialize(wrapper) -> str:
+    parts = [html_module.escape(wrapper.text, quote=False)] if wrapper.text else []
+    parts.extend(lxml.html.tostring(child, encoding="unicode") for child in wrapper)
+    return "".join(parts)
+
+
+def normalize_template_html(html: str, previous_html: Optional[str] = None) -> NormalizedHtml:
+    """规范化模板 HTML；previous_html 为修改前的正文（用于找回编辑器丢弃的 <style data-template-styles>）
+
+    完整 HTML 文档、解析失败或未启用时原样返回；有找不到规则的 ts- 类时抛出 UnknownStyleClassError。
+    """
+    if not settings.template_normalize_html or not html or not html.strip() or _FULL_DOCUMENT_RE.match(html):
+        return _unchanged(html)
+    try:
+        wrapper = lxml.html.fragment_fromstring(html, create_parent="div")
+    except (etree.ParserError, ValueError):
+        return _unchanged(html)
+
+    rules = extract_hoisted_rules(previous_html)
+    rules.update(extract_hoisted_rules(html))
+    for block in wrapper.xpath(f"//style[@{STYLE_BLOCK_ATTR}]"):
+        block.drop_tree()
+
+    author_css = " ".join(block.text_content() for block in wrapper.xpath("//style"))
+    has_author_styles = bool(author_css.strip()) or bool(wrapper.xpath("//link"))
+
+    expanded = False
+    unknown = set()
+    for el in _elements(wrapper):
+        expanded = _expand_classes(el, rules) or expanded
+        unknown.update(name for name in (el.get("class") or "").split() if _CLASS_RE.match(name))
+        _clean_attributes(el)
+    if unknown:
+        raise UnknownStyleClassError(sorted(unknown))
+
+    if "white-space" not in author_css.lower():
+        _collapse_whitespace(wrapper)
+    if not has_author_styles:
+        _hoist_styles(wrapper)
+
+    normalized = _serialize(wrapper)
+    before = _byte_length(html)
+    after = _byte_length(normalized)
+    if after >= before and not expanded:
+        # 没有收益时保留原文（展开过类时必须使用新结果，否则样式会丢失）
+        return _unchanged(html)
+    return NormalizedHtml(html=normalized, bytes_before=before, bytes_after=after)
@@ -0,0 +1,294 @@
+"""
+模板预览图（SVG 骨架图）
+
+模板库卡片只需要一个缩略示意，不必在浏览器里渲染完整 HTML。这里用 lxml 把模板解析成
+标题 / 文本行 / 表格 / 分隔线等块，按 A4 比例画成灰色骨架，占位符字段用蓝色标出。
+SVG 中不包含模板的任何文字，只有几何图形。
+规范化时提升到 <style data-template-styles> 的样式类（ts-xxxxxxxx）先展开回 inline style 再读取背景色、对齐和字号。
+
+预览图以 content_hash 为文件名缓存在磁盘（TEMPLATE_PREVIEW_DIR），同一内容只渲染一次；
+模板写入后由 BackgroundTasks 调用 generate_preview() 预先生成。
+"""
+import logging
+import os
+import re
+import tempfile
+from typing import Iterator, List, Optional, Tuple
+import lxml.html
+from lxml import etree
+from app.config import settings
+from app.services.template_normalize import expand_hoisted_classes, extract_hoisted_rules
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_MEDIA_TYPE = "image/svg+xml"
+# 画布尺寸（A4 比例，单位 px）
+PREVIEW_WIDTH = 210
+PREVIEW_HEIGHT = 297
+PREVIEW_PADDING = 14
+# 表格最多绘制的行数，超出部分省略
+MAX_TABLE_ROWS = 14
+# 文本按字符数估算宽度（px / 字）
+CHAR_WIDTH = 2.6
+
+TEXT_COLOR = "#c9cdd4"
+HEADING_COLOR = "#4e5969"
+FIELD_COLOR = "#3370ff"
+BORDER_COLOR = "#b0b5bd"
+
+INVISIBLE_TAGS = {"script", "style", "template", "noscript", "head", "title", "meta", "link"}
+HEADING_TAGS = {"h1": 9, "h2": 7, "h3": 6, "h4": 5, "h5": 5, "h6": 5}
+INLINE_TAGS = {"span", "b", "strong", "i", "em", "u", "small", "font", "a", "br", "sub", "sup", "label", "code"}
+
+_BACKGROUND_RE = re.compile(r"background(?:-color)?\s*:\s*(#[0-9a-fA-F]{3,8}|rgba?\([0-9.,\s%]+\))")
+_TEXT_ALIGN_RE = re.compile(r"text-align\s*:\s*(center|right)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+Block = Tuple
+
+
+def _tag(el) -> str:
+    return el.tag.lower() if isinstance(el.tag, str) else ""
+
+
+def _text(el) -> str:
+    return _WHITESPACE_RE.sub("", el.text_content() or "")
+
+
+def _field_count(el) -> int:
+    return len(el.xpath(".//*[@data-fieldname]")) + (1 if el.get("data-fieldname") else 0)
+
+
+def _align(el) -> str:
+    match = _TEXT_ALIGN_RE.search(el.get("style") or "")
+    if match:
+        return match.group(1)
+    align = (el.get("align") or "").lower()
+    return align if align in ("center", "right") else "left"
+
+
+def _background(el) -> Optional[str]:
+    match = _BACKGROUND_RE.search(el.get("style") or "")
+    if match:
+        return match.group(1)
+    bgcolor = el.get("bgcolor") or ""
+    return bgcolor if re.fullmatch(r"#[0-9a-fA-F]{3,8}", bgcolor) else None
+
+
+def _is_inline_only(el) -> bool:
+    return all(_tag(child) in INLINE_TAGS or not _tag(child) for child in el)
+
+
+def _table_rows(table) -> List[List[Tuple[int, int, int, Optional[str]]]]:
+    """返回表格行，每个单元格为 (文字长度, 字段数, colspan, 背景色)"""
+    rows = []
+    for tr in table.iter("tr"):
+        cells = []
+        row_background = _background(tr)
+        for cell in tr:
+            if _tag(cell) not in ("td", "th"):
+                continue
+            try:
+                colspan = max(1, min(int(cell.get("colspan") or 1), 12))
+            except ValueError:
+                colspan = 1
+            cells.append((len(_text(cell)), _field_count(cell), colspan, _background(cell) or row_background))
+        if cells:
+            rows.append(cells)
+    return rows
+
+
+def _blocks(el) -> Iterator[Block]:
+    """按文档顺序把 HTML 拆成可绘制的块"""
+    tag = _tag(el)
+    if not tag or tag in INVISIBLE_TAGS:
+        return
+    if tag == "table":
+        rows = _table_rows(el)
+        if rows:
+            yield ("table", rows, _background(el))
+        return
+    if tag in HEADING_TAGS:
+        yield ("heading", len(_text(el)), HEADING_TAGS[tag], _align(el))
+        return
+    if tag == "hr":
+        yield ("rule",)
+        return
+    if tag == "img":
+        yield ("image",)
+        return
+    if tag not in INLINE_TAGS and _is_inline_only(el):
+        length = len(_text(el))
+        fields = _field_count(el)
+        if length or fields:
+            # 字号较大（>= 20px）的文字视为标题
+            style = el.get("style") or ""
+            size = re.search(r"font-size\s*:\s*(\d+)px", style)
+            if size and int(size.group(1)) >= 20:
+                yield ("heading", length, 8, _align(el))
+            else:
+                yield ("text", length, fields, _align(el), _background(el))
+        return
+    for child in el:
+        yield from _blocks(child)
+
+
+class _Canvas:
+    def __init__(self):
+        self.parts: List[str] = []
+        self.y = PREVIEW_PADDING
+        self.left = PREVIEW_PADDING
+        self.width = PREVIEW_WIDTH - PREVIEW_PADDING * 2
+
+    @property
+    def full(self) -> bool:
+        return self.y >= PREVIEW_HEIGHT - PREVIEW_PADDING
+
+    def rect(self, x, y, w, h, fill, rx=0, stroke=None, opacity=None):
+        attrs = f'x="{x:.1f}" y="{y:.1f}" width="{max(w, 0):.1f}" height="{h:.1f}" fill="{fill}"'
+        if rx:
+            attrs += f' rx="{rx}"'
+        if stroke:
+            attrs += f' stroke="{stroke}" stroke-width="0.5"'
+        if opacity is not None:
+            attrs += f' fill-opacity="{opacity}"'
+        self.parts.append(f"<rect {attrs}/>")
+
+    def aligned_x(self, width: float, align: str) -> float:
+        if align == "center":
+            return self.left + (self.width - width) / 2
+        if align == "right":
+            return self.left + self.width - width
+        return self.left
+
+    def heading(self, length: int, height: int, align: str):
+        width = min(self.width * 0.8, max(30, length * CHAR_WIDTH * height / 4))
+        self.rect(self.aligned_x(width, align), self.y, width, height * 0.6, HEADING_COLOR, rx=1)
+        self.y += height + 4
+
+    def text(self, length: int, fields: int, align: str, background: Optional[str]):
+        width = length * CHAR_WIDTH
+        lines = max(1, min(4, int(width // self.width) + 1))
+        if background:
+            self.rect(self.left, self.y - 1.5, self.width, lines * 5 + 2, background, opacity=0.35)
+        for index in range(lines):
+            line_width = self.width if index < lines - 1 else width - self.width * (lines - 1)
+            line_width = max(line_width, 12 if length else 0)
+            x = self.aligned_x(line_width + fields * 20, align)
+            if length:
+                self.rect(x, self.y, line_width, 2.5, TEXT_COLOR, rx=1)
+            if index == lines - 1:
+                for field in range(min(fields, 4)):
+                    self.rect(x + line_width + 2 + field * 20, self.y - 0.5, 18, 3.5, FIELD_COLOR, rx=1.5, opacity=0.45)
+            self.y += 5
+        self.y += 2
+
+    def table(self, rows, background: Optional[str]):
+        columns = max(sum(cell[2] for cell in row) for row in rows)
+        cell_width = self.width / columns
+        row_height = 9
+        shown = rows[:MAX_TABLE_ROWS]
+        top = self.y
+        if background:
+            self.rect(self.left, top, self.width, row_height * len(shown), background, opacity=0.35)
+        for row in shown:
+            if self.full:
+                break
+            x = self.left
+            for length, fields, colspan, cell_background in row:
+                width = cell_width * colspan
+                self.rect(x, self.y, width, row_height, cell_background or "none", stroke=BORDER_COLOR)
+                if fields:
+                    self.rect(x + 2, self.y + 3, min(width - 4, 18), 3.5, FIELD_COLOR, rx=1.5, opacity=0.45)
+                elif length:
+                    self.rect(x + 2, self.y + 3.5, min(width - 4, length * CHAR_WIDTH), 2.5, TEXT_COLOR, rx=1)
+                x += width
+            self.y += row_height
+        self.y += 5
+
+    def rule(self):
+        self.rect(self.left, self.y, self.width, 0.6, BORDER_COLOR)
+        self.y += 4
+
+    def image(self):
+        self.rect(self.left, self.y, 30, 20, "#e5e6eb", rx=2)
+        self.y += 24
+
+    def render(self) -> bytes:
+        body = "".join(self.parts)
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{PREVIEW_WIDTH}" height="{PREVIEW_HEIGHT}" '
+            f'viewBox="0 0 {PREVIEW_WIDTH} {PREVIEW_HEIGHT}">'
+            f'<rect width="{PREVIEW_WIDTH}" height="{PREVIEW_HEIGHT}" fill="#fff"/>'
+            f"{body}</svg>"
+        ).encode("utf-8")
+
+
+def render_preview_svg(html: str) -> bytes:
+    """把模板 HTML 渲染为 SVG 骨架图（不包含模板文字）"""
+    canvas = _Canvas()
+    try:
+        root = lxml.html.fragment_fromstring(html, create_parent="div") if html and html.strip() else None
+    except (etree.ParserError, ValueError):
+        root = None
+    if root is not None:
+        expand_hoisted_classes(root, extract_hoisted_rules(html))
+        for block in _blocks(root):
+            if canvas.full:
+                break
+            kind, args = block[0], block[1:]
+            getattr(canvas, kind)(*args)
+    return canvas.render()
+
+
+def preview_path(content_hash: str) -> str:
+    return os.path.join(settings.template_preview_dir, content_hash[:2], f"{content_hash}.svg")
+
+
+def read_preview(content_hash: str) -> Optional[bytes]:
+    try:
+        with open(preview_path(content_hash), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write_preview(content_hash: str, data: bytes) -> None:
+    path = preview_path(content_hash)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 先写临时文件再原子替换，并发生成同一预览时不会读到半个文件
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def render_and_store_preview(content_hash: str, html: str) -> bytes:
+    """同步渲染预览图并写入磁盘缓存（后台任务尚未完成时由读接口调用）"""
+    data = render_preview_svg(html)
+    try:
+        _write_preview(content_hash, data)
+    except OSError as e:
+        logger.warning(f"[preview] 写入预览缓存失败: {content_hash}: {e}")
+    return data
+
+
+def generate_preview(content_hash: Optional[str], html: str) -> None:
+    """后台任务：为新内容预先生成预览图（已存在则跳过）"""
+    if not content_hash or read_preview(content_hash) is not None:
+        return
+    try:
+        _write_preview(content_hash, render_preview_svg(html))
+    except Exception as e:
+        logger.warning(f"[preview] 生成预览失败: {content_hash}: {e}")
+
+
+def generate_previews(items: List[Tuple[Optional[str], str]]) -> None:
+    """后台任务：批量生成预览图（批量导入后调用）"""
+    for content_hash, html in items:
+        generate_preview(content_hash, html)
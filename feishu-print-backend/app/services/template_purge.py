@@ -0,0 +1,125 @@
+"""
+已删除模板的后台清理
+
+删除接口只把 templates.deleted_at 设为当前时间（一条按主键的 UPDATE），请求不再等待 MySQL 级联删除
+版本、字段索引等依赖行；保留期（template_purge_retention_hours）内可以通过 POST /{id}/undelete 恢复。
+
+后台线程每 template_purge_interval_seconds 秒扫描一次 deleted_at 早于保留期的模板，
+每批 template_purge_batch_size 个：先删除团队共享、历史版本、字段索引、使用统计，再删除模板行并释放正文引用。
+每批单独提交，批与批之间暂停 template_purge_batch_pause_seconds 秒，清理负载被摊平，不会出现长事务。
+墓碑（template_changes）保留，增量同步仍然依赖它们。
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.template import Template as TemplateModel
+from app.models.team import TeamTemplate
+from app.models.template_version import TemplateVersion
+from app.models.template_field import TemplateField
+from app.models.template_stats import TemplateStats
+from app.services.template_access import template_access_cache
+from app.services.template_blobs import release_blobs
+
+logger = logging.getLogger(__name__)
+
+# 依赖模板的表：先于模板行删除（team_templates 没有 ON DELETE CASCADE）
+_DEPENDENT_TABLES = (
+    TeamTemplate.__table__,
+    TemplateVersion.__table__,
+    TemplateField.__table__,
+    TemplateStats.__table__,
+)
+
+
+def purge_cutoff(now: Optional[datetime] = None) -> datetime:
+    """deleted_at 早于该时间的模板可以物理删除"""
+    return (now or datetime.now()) - timedelta(hours=settings.template_purge_retention_hours)
+
+
+def purge_templates(db: Session, cutoff: datetime, limit: int) -> List[int]:
+    """物理删除一批已过保留期的模板（随调用方事务提交），返回删除的模板 id
+
+    候选行用 SELECT ... FOR UPDATE 锁定，多个进程同时清理时不会重复释放正文引用。
+    """
+    rows = db.query(TemplateModel.id, TemplateModel.blob_hash).filter(
+        TemplateModel.deleted_at != None,
+        TemplateModel.deleted_at <= cutoff
+    ).order_by(TemplateModel.id).limit(limit).with_for_update().all()
+    template_ids = [row.id for row in rows]
+    if not template_ids:
+        return template_ids
+
+    for table in _DEPENDENT_TABLES:
+        db.execute(delete(table).where(table.c.template_id.in_(template_ids)))
+    db.execute(delete(TemplateModel.__table__).where(TemplateModel.id.in_(template_ids)))
+    release_blobs(db, [row.blob_hash for row in rows])
+    return template_ids
+
+
+class TemplatePurger:
+    """按保留期分批物理删除已软删除的模板（后台线程）"""
+
+    def __init__(
+        self,
+        interval_seconds: float,
+        batch_size: int,
+        batch_pause_seconds: float,
+        session_factory=SessionLocal,
+    ):
+        self._interval_seconds = interval_seconds
+        self._batch_size = batch_size
+        self._batch_pause_seconds = batch_pause_seconds
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self, now: Optional[datetime] = None) -> int:
+        """清理当前所有过期的模板，返回删除的模板数"""
+        cutoff = purge_cutoff(now)
+        purged = 0
+        while True:
+            db = self._session_factory()
+            try:
+                template_ids = purge_templates(db, cutoff, self._batch_size)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"[template-purge] 清理已删除模板失败，下个周期重试: {e}")
+                return purged
+            finally:
+                db.close()
+
+            for template_id in template_ids:
+                template_access_cache.invalidate_template(template_id)
+            purged += len(template_ids)
+            if len(template_ids) < self._batch_size:
+                break
+            time.sleep(self._batch_pause_seconds)
+        if purged:
+            logger.info(f"[template-purge] 已物理删除 {purged} 个模板")
+        return purged
+
+    def start(self) -> None:
+        """启动后台线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="template-purge", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self.run_once()
+            time.sleep(self._interval_seconds)
+
+
+template_purger = TemplatePurger(
+    settings.template_purge_interval_seconds,
+    settings.template_purge_batch_size,
+    settings.template_purge_batch_pause_seconds,
+)
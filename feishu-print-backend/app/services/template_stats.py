@@ -0,0 +1,183 @@
+"""
+模板使用统计（写后聚合）
+
+打开、导出、回填事件很频繁，而且集中在少数热门系统模板上；逐个事件 UPDATE 会反复争抢同一行。
+事件先在进程内按模板聚合（TemplateStatsBuffer.record 只做内存累加），由后台线程每
+template_stats_flush_seconds 秒、或攒够 template_stats_flush_events 个事件时，一次 executemany
+把累加值写入 template_stats（MySQL 下为 INSERT ... ON DUPLICATE KEY UPDATE x = x + 增量）。
+
+进程退出时尽量写入剩余计数；异常退出最多丢失一个周期内的统计，统计数据允许这种误差。
+"""
+import atexit
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.template import Template as TemplateModel
+from app.models.template_stats import TemplateStats
+
+logger = logging.getLogger(__name__)
+
+EVENT_OPEN = "open"
+EVENT_EXPORT = "export"
+EVENT_BACKFILL = "backfill"
+# 事件类型 -> template_stats 中的计数列
+USAGE_EVENTS = {
+    EVENT_OPEN: "open_count",
+    EVENT_EXPORT: "export_count",
+    EVENT_BACKFILL: "backfill_count",
+}
+
+_stats = TemplateStats.__table__
+
+
+@dataclass
+class _PendingStats:
+    open_count: int = 0
+    export_count: int = 0
+    backfill_count: int = 0
+    last_used_at: Optional[datetime] = None
+
+    @property
+    def use_count(self) -> int:
+        return self.open_count + self.export_count + self.backfill_count
+
+    def merge(self, other: "_PendingStats") -> None:
+        self.open_count += other.open_count
+        self.export_count += other.export_count
+        self.backfill_count += other.backfill_count
+        if other.last_used_at and (self.last_used_at is None or other.last_used_at > self.last_used_at):
+            self.last_used_at = other.last_used_at
+
+
+def _row(template_id: int, pending: _PendingStats) -> dict:
+    return {
+        "template_id": template_id,
+        "open_count": pending.open_count,
+        "export_count": pending.export_count,
+        "backfill_count": pending.backfill_count,
+        "use_count": pending.use_count,
+        "last_used_at": pending.last_used_at,
+    }
+
+
+def write_stats(db: Session, pending: Dict[int, _PendingStats]) -> int:
+    """把聚合后的增量写入 template_stats，返回写入的模板数（已删除的模板被忽略）"""
+    existing = set(db.execute(
+        select(TemplateModel.id).where(TemplateModel.id.in_(list(pending)))
+    ).scalars())
+    rows = [_row(template_id, pending[template_id]) for template_id in pending if template_id in existing]
+    if not rows:
+        return 0
+
+    if db.bind.dialect.name == "mysql":
+        stmt = mysql_insert(_stats)
+        stmt = stmt.on_duplicate_key_update(
+            open_count=_stats.c.open_count + stmt.inserted.open_count,
+            export_count=_stats.c.export_count + stmt.inserted.export_count,
+            backfill_count=_stats.c.backfill_count + stmt.inserted.backfill_count,
+            use_count=_stats.c.use_count + stmt.inserted.use_count,
+            last_used_at=func.greatest(
+                func.coalesce(_stats.c.last_used_at, stmt.inserted.last_used_at), stmt.inserted.last_used_at
+            ),
+        )
+        db.execute(stmt, rows)
+        return len(rows)
+
+    # 非 MySQL 数据库（本地开发）：逐行先累加、不存在再插入
+    for row in rows:
+        result = db.execute(update(_stats).where(_stats.c.template_id == row["template_id"]).values(
+            open_count=_stats.c.open_count + row["open_count"],
+            export_count=_stats.c.export_count + row["export_count"],
+            backfill_count=_stats.c.backfill_count + row["backfill_count"],
+            use_count=_stats.c.use_count + row["use_count"],
+            last_used_at=row["last_used_at"],
+        ))
+        if not result.rowcount:
+            db.execute(insert(_stats), [row])
+    return len(rows)
+
+
+class TemplateStatsBuffer:
+    """进程内的使用事件缓冲区（线程安全），后台线程定期写库"""
+
+    def __init__(self, flush_seconds: float, flush_events: int, session_factory=SessionLocal):
+        self._flush_seconds = flush_seconds
+        self._flush_events = flush_events
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending: Dict[int, _PendingStats] = {}
+        self._event_count = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, template_id: int, event: str, count: int = 1) -> None:
+        """记录使用事件（只做内存累加）"""
+        column = USAGE_EVENTS[event]
+        now = datetime.now()
+        with self._lock:
+            entry = self._pending.get(template_id)
+            if entry is None:
+                entry = self._pending[template_id] = _PendingStats()
+            setattr(entry, column, getattr(entry, column) + count)
+            entry.last_used_at = now
+            self._event_count += count
+            full = self._event_count >= self._flush_events
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="template-stats-flush", daemon=True)
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+
+    def _take(self) -> Dict[int, _PendingStats]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._event_count = 0
+            return pending
+
+    def _restore(self, pending: Dict[int, _PendingStats]) -> None:
+        """写库失败时把计数放回缓冲区，下个周期重试"""
+        with self._lock:
+            for template_id, stats in pending.items():
+                entry = self._pending.get(template_id)
+                if entry is None:
+                    self._pending[template_id] = stats
+                else:
+                    entry.merge(stats)
+                self._event_count += stats.use_count
+
+    def flush(self) -> int:
+        """立即写入缓冲区中的计数，返回写入的模板数"""
+        with self._flush_lock:
+            pending = self._take()
+            if not pending:
+                return 0
+            db = self._session_factory()
+            try:
+                written = write_stats(db, pending)
+                db.commit()
+                return written
+            except Exception as e:
+                db.rollback()
+                self._restore(pending)
+                logger.warning(f"[template-stats] 写入使用统计失败，下个周期重试: {e}")
+                return 0
+            finally:
+                db.close()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self._flush_seconds)
+            self._wakeup.clear()
+            self.flush()
+
+
+template_stats_buffer = TemplateStatsBuffer(settings.template_stats_flush_seconds, settings.template_stats_flush_events)
+atexit.register(template_stats_buffer.flush)
@@ -0,0 +1,60 @@
+"""
+模板 HTML 文本抽取（占位符字段 / 可见文本），在写入时调用一次，结果落库供搜索使用
+"""
+import re
+from typing import List
+import lxml.html
+from lxml import etree
+
+# 占位符格式：<span class="template-field" data-fieldname="X">{$X}</span>
+PLACEHOLDER_XPATH = "//*[@data-fieldname]"
+# 不参与可见文本的标签
+INVISIBLE_TAGS = ("script", "style", "template", "noscript")
+# search_text 最大字符数（utf8mb4 下不超过 TEXT 列的 64KB）
+MAX_SEARCH_TEXT_LENGTH = 10000
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_PLACEHOLDER_TEXT_RE = re.compile(r"\{\$([^{}]*)\}")
+
+
+def _parse(html: str):
+    if not html or not html.strip():
+        return None
+    try:
+        return lxml.html.fragment_fromstring(html, create_parent="div")
+    except (etree.ParserError, ValueError):
+        return None
+
+
+def extract_placeholder_fields(html: str) -> List[str]:
+    """按出现顺序返回去重后的占位符字段名"""
+    root = _parse(html)
+    if root is None:
+        return []
+    fields = []
+    seen = set()
+    for node in root.xpath(PLACEHOLDER_XPATH):
+        name = (node.get("data-fieldname") or "").strip()
+        if name and name not in seen:
+            seen.add(name)
+            fields.append(name)
+    return fields
+
+
+def extract_visible_text(html: str) -> str:
+    """去掉 HTML 标签，返回折叠空白后的可见文本"""
+    root = _parse(html)
+    if root is None:
+        return ""
+    for node in root.xpath("|".join(f"//{tag}" for tag in INVISIBLE_TAGS)):
+        node.drop_tree()
+    # 逐段拼接并补空格，避免相邻单元格的文字粘连
+    text = _PLACEHOLDER_TEXT_RE.sub(r"\1", " ".join(root.itertext()))
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def build_search_text(html: str) -> str:
+    """构建全文索引用的文本：占位符字段名 + 可见文本（模板名称单独建索引）"""
+    fields = extract_placeholder_fields(html)
+    text = extract_visible_text(html)
+    return " ".join(fields + [text]).strip()[:MAX_SEARCH_TEXT_LENGTH]
@@ -0,0 +1,277 @@
+"""
+模板版本历史（差异存储）
+
+- 每个版本的 payload 为 gzip 压缩的 JSON：
+  快照：{"name": ..., "template_type": ..., "content": "<完整 HTML>"}
+  差异：{"name": ..., "template_type": ..., "ops": [...]}，ops 基于上一版本的 token 序列：
+        [start, end] 表示复制上一版本 tokens[start:end]，字符串表示插入的新文本
+- token 按 HTML 标签 / 文本片段切分，编辑器里的修改通常只影响少量 token，差异很小
+- 差异以两边各只出现一次的 token 为锚点（patience diff），工作量与 token 数近似线性；
+  超过 MAX_DIFF_TOKENS 或工作量上限时不计算差异，直接保存快照，保存请求不会被大模板拖住
+- 每 VERSION_SNAPSHOT_INTERVAL 个版本强制保存一次快照，任一版本的还原最多回放 interval - 1 个差异
+"""
+import bisect
+import gzip
+import json
+import re
+from typing import List, Optional, Union
+from sqlalchemy.orm import Session
+from app.models.template import Template as TemplateModel
+from app.models.template_version import TemplateVersion
+
+# 快照间隔：版本号满足 (version - 1) % interval == 0 时保存完整快照
+VERSION_SNAPSHOT_INTERVAL = 10
+
+# 差异计算的上限：两边 token 总数超过 MAX_DIFF_TOKENS，或扫描的 token 数超过总数的 MAX_DIFF_WORK_FACTOR 倍时放弃
+MAX_DIFF_TOKENS = 200_000
+MAX_DIFF_WORK_FACTOR = 16
+
+_TOKEN_RE = re.compile(r"<[^>]*>|[^<]+|<")
+
+DeltaOp = Union[List[int], str]
+
+
+def tokenize_html(html: str) -> List[str]:
+    """按标签 / 文本切分，"".join(tokens) == html"""
+    return _TOKEN_RE.findall(html or "")
+
+
+def _unique_anchors(old: List[str], a0: int, a1: int, new: List[str], b0: int, b1: int) -> List[tuple]:
+    """两边范围内都只出现一次的 token，按最长递增子序列选出互不交叉的 (i, j) 锚点"""
+    old_index = {}
+    for i in range(a0, a1):
+        token = old[i]
+        old_index[token] = -1 if token in old_index else i
+    new_index = {}
+    for j in range(b0, b1):
+        token = new[j]
+        new_index[token] = -1 if token in new_index else j
+    pairs = sorted(
+        (i, new_index[token]) for token, i in old_index.items()
+        if i >= 0 and new_index.get(token, -1) >= 0
+    )
+    if not pairs:
+        return []
+
+    # patience sorting：tails[k] 为长度 k + 1 的递增子序列的最小结尾（pairs 下标）
+    tails: List[int] = []
+    tail_js: List[int] = []
+    previous = [-1] * len(pairs)
+    for index, (_, j) in enumerate(pairs):
+        k = bisect.bisect_left(tail_js, j)
+        if k:
+            previous[index] = tails[k - 1]
+        if k == len(tails):
+            tails.append(index)
+            tail_js.append(j)
+        else:
+            tails[k] = index
+            tail_js[k] = j
+    anchors = []
+    index = tails[-1]
+    while index >= 0:
+        anchors.append(pairs[index])
+        index = previous[index]
+    anchors.reverse()
+    return anchors
+
+
+def diff_tokens(old: List[str], new: List[str]) -> Optional[List[DeltaOp]]:
+    """计算从 old 到 new 的差异操作序列；超过工作量上限时返回 None（调用方改存完整内容）
+
+    先去掉共同的首尾，再以唯一 token 为锚点把剩余部分切成小段逐段处理；没有锚点的段整体作为插入。
+    """
+    if len(old) + len(new) > MAX_DIFF_TOKENS:
+        return None
+    budget = MAX_DIFF_WORK_FACTOR * (len(old) + len(new)) + 1000
+    ops: List[DeltaOp] = []
+
+    def copy(i1: int, i2: int) -> None:
+        if i1 == i2:
+            return
+        if ops and not isinstance(ops[-1], str) and ops[-1][1] == i1:
+            ops[-1][1] = i2
+        else:
+            ops.append([i1, i2])
+
+    def insert(j1: int, j2: int) -> None:
+        if j1 == j2:
+            return
+        text = "".join(new[j1:j2])
+        if ops and isinstance(ops[-1], str):
+            ops[-1] += text
+        else:
+            ops.append(text)
+
+    # 栈中的任务：("copy", i1, i2) 或 ("diff", a0, a1, b0, b1)，按输出顺序逆序压栈
+    stack = [("diff", 0, len(old), 0, len(new))]
+    while stack:
+        task = stack.pop()
+        if task[0] == "copy":
+            copy(task[1], task[2])
+            continue
+        _, a0, a1, b0, b1 = task
+        budget -= (a1 - a0) + (b1 - b0)
+        if budget < 0:
+            return None
+
+        start = a0
+        while a0 < a1 and b0 < b1 and old[a0] == new[b0]:
+            a0 += 1
+            b0 += 1
+        copy(start, a0)
+        end = a1
+        while a1 > a0 and b1 > b0 and old[a1 - 1] == new[b1 - 1]:
+            a1 -= 1
+            b1 -= 1
+        if end > a1:
+            stack.append(("copy", a1, end))
+
+        if a0 == a1 or b0 == b1:
+            insert(b0, b1)
+            continue
+        anchors = _unique_anchors(old, a0, a1, new, b0, b1)
+        if not anchors:
+            insert(b0, b1)
+            continue
+        next_a, next_b = a1, b1
+        for i, j in reversed(anchors):
+            stack.append(("diff", i + 1, next_a, j + 1, next_b))
+            stack.append(("copy", i, i + 1))
+            next_a, next_b = i, j
+        stack.append(("diff", a0, next_a, b0, next_b))
+    return ops
+
+
+def apply_delta(old_tokens: List[str], ops: List[DeltaOp]) -> str:
+    parts = []
+    for op in ops:
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(old_tokens[op[0]:op[1]])
+    return "".join(parts)
+
+
+def _pack(data: dict) -> bytes:
+    return gzip.compress(
+        json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+        mtime=0
+    )
+
+
+def _unpack(payload: bytes) -> dict:
+    return json.loads(gzip.decompress(payload).decode("utf-8"))
+
+
+def template_state(template: TemplateModel) -> dict:
+    """记录模板当前状态（在修改模板之前调用，作为 record_version 的 previous 参数）"""
+    return {
+        "name": template.name,
+        "template_type": template.template_type,
+        "content": template.content,
+        "content_hash": template.content_hash,
+    }
+
+
+def _latest_version(db: Session, template_id: int) -> Optional[TemplateVersion]:
+    return db.query(TemplateVersion).filter(
+        TemplateVersion.template_id == template_id
+    ).order_by(TemplateVersion.version.desc()).first()
+
+
+def _add_version(
+    db: Session,
+    template_id: int,
+    version: int,
+    state: dict,
+    user_id: Optional[int],
+    previous: Optional[dict] = None,
+) -> TemplateVersion:
+    snapshot = {"name": state["name"], "template_type": state["template_type"], "content": state["content"]}
+    payload = _pack(snapshot)
+    is_snapshot = True
+    if previous is not None and (version - 1) % VERSION_SNAPSHOT_INTERVAL != 0:
+        ops = diff_tokens(tokenize_html(previous["content"]), tokenize_html(state["content"]))
+        delta = _pack({
+            "name": state["name"],
+            "template_type": state["template_type"],
+            "ops": ops,
+        }) if ops is not None else None
+        # 差异计算超出上限，或差异比快照还大（几乎整体重写）时直接存快照
+        if delta is not None and len(delta) < len(payload):
+            payload = delta
+            is_snapshot = False
+
+    row = TemplateVersion(
+        template_id=template_id,
+        version=version,
+        is_snapshot=is_snapshot,
+        payload=payload,
+        content_hash=state.get("content_hash"),
+        content_length=len(state["content"] or ""),
+        created_by=user_id,
+    )
+    db.add(row)
+    return row
+
+
+def record_version(
+    db: Session,
+    template: TemplateModel,
+    previous: Optional[dict] = None,
+    user_id: Optional[int] = None,
+) -> Optional[TemplateVersion]:
+    """模板写入后记录新版本（与调用方同一事务提交），内容未变化时返回 None
+
+    previous 为修改前的 template_state()；没有历史记录的旧模板会先把 previous 存为第 1 个版本。
+    """
+    current = template_state(template)
+    latest = _latest_version(db, template.id)
+    if latest is None:
+        if previous is None or previous["content_hash"] == current["content_hash"]:
+            return _add_version(db, template.id, 1, current, user_id)
+        _add_version(db, template.id, 1, previous, user_id)
+        return _add_version(db, template.id, 2, current, user_id, previous)
+
+    if latest.content_hash and latest.content_hash == current["content_hash"]:
+        return None
+
+    # 只有当上一版本确实是 previous 时才能存差异，否则（例如直接改库）存快照
+    base = previous if previous is not None and previous["content_hash"] == latest.content_hash else None
+    return _add_version(db, template.id, latest.version + 1, current, user_id, base)
+
+
+def list_versions(db: Session, template_id: int) -> List[TemplateVersion]:
+    return db.query(TemplateVersion).filter(
+        TemplateVersion.template_id == template_id
+    ).order_by(TemplateVersion.version.desc()).all()
+
+
+def materialize_version(db: Session, template_id: int, version: int) -> Optional[dict]:
+    """还原指定版本：从最近的快照开始回放差异，返回 {"name", "template_type", "content"}"""
+    snapshot = db.query(TemplateVersion).filter(
+        TemplateVersion.template_id == template_id,
+        TemplateVersion.version <= version,
+        TemplateVersion.is_snapshot == True
+    ).order_by(TemplateVersion.version.desc()).first()
+    if snapshot is None:
+        return None
+
+    rows = db.query(TemplateVersion).filter(
+        TemplateVersion.template_id == template_id,
+        TemplateVersion.version > snapshot.version,
+        TemplateVersion.version <= version
+    ).order_by(TemplateVersion.version).all()
+    if len(rows) != version - snapshot.version:
+        return None
+
+    state = _unpack(snapshot.payload)
+    for row in rows:
+        delta = _unpack(row.payload)
+        state = {
+            "name": delta["name"],
+            "template_type": delta["template_type"],
+            "content": apply_delta(tokenize_html(state["content"]), delta["ops"]),
+        }
+    return state
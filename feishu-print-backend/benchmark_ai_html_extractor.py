@@ -0,0 +1,152 @@
+"""
+AI 输出 HTML 提取的微基准
+
+模拟模型流式输出约 4k token 的模板 HTML（外面包着 ```html 代码块和说明文字），比较：
+- 旧实现：流结束后对全文去代码块标记，再用 re.search(html[i:]) 逐个查找 div 标签（每次切片复制剩余文本，O(n²)）
+- IncrementalHtmlExtractor：每个增量到达时只扫描新文本，流结束时直接切片
+
+用法: python benchmark_ai_html_extractor.py [token 数] [重复次数]
+"""
+import random
+import re
+import sys
+import time
+from app.services.ai_html_extractor import IncrementalHtmlExtractor
+
+# 中文模板 HTML 平均每个 token 约 3 个字符
+CHARS_PER_TOKEN = 3
+
+
+def legacy_extract_html_content(text: str) -> str:
+    """旧实现（已修正切片越过 </div> 6 个字符的问题，便于比较结果）"""
+    if not text:
+        return ""
+    cleaned_text = text.replace("```html", "").replace("```", "").strip()
+    root_match = re.search(r'<div\s+id=["\']template-root["\'][^>]*>', cleaned_text, re.IGNORECASE)
+    match = root_match or re.search(r'<div[^>]*>', cleaned_text, re.IGNORECASE)
+    if not match:
+        return cleaned_text
+    start_idx = match.start()
+    end_idx = _legacy_find_matching_closing_tag(cleaned_text, start_idx)
+    return cleaned_text[start_idx:end_idx] if end_idx != -1 else cleaned_text[start_idx:]
+
+
+def _legacy_find_matching_closing_tag(html: str, start_idx: int) -> int:
+    depth = 1
+    i = start_idx
+    while i < len(html) and html[i] != '>':
+        i += 1
+    i += 1
+    while i < len(html):
+        div_match = re.search(r'</?div[^>]*>', html[i:], re.IGNORECASE)
+        if not div_match: break
+        match_start = i + div_match.start()
+        match_end = i + div_match.end()
+        if html[match_start + 1] == '/':
+            depth -= 1
+            if depth == 0: return match_end
+        else:
+            depth += 1
+        i = match_end
+    return -1
+
+
+def build_output(tokens: int) -> str:
+    """生成约 tokens 个 token 的模型输出"""
+    rows = []
+    target = tokens * CHARS_PER_TOKEN
+    size = 0
+    index = 0
+    while size < target:
+        row = (
+            f'<div class="row" style="display: table; width: 100%; border-bottom: 1px solid #e5e7eb;">'
+            f'<div class="cell label" style="display: table-cell; padding: 6px 8px;">字段{index}</div>'
+            f'<div class="cell value" style="display: table-cell; padding: 6px 8px;">{{{{字段{index}}}}}</div>'
+            f'</div>\n'
+        )
+        rows.append(row)
+        size += len(row)
+        index += 1
+    return (
+        "好的，下面是根据您的需求设计的模板：\n```html\n"
+        '<div id="template-root" style="width: 100%; font-family: sans-serif;">\n'
+        '<style>.row:nth-child(even) { background: #f9fafb; }</style>\n'
+        + "".join(rows)
+        + "</div>\n```\n以上模板使用表格布局，适合打印。"
+    )
+
+
+def split_deltas(text: str, seed: int = 0) -> list:
+    """按 1~6 个字符切分为流式增量（与模型的 token 粒度相近，标签和代码块标记会被切断）"""
+    rng = random.Random(seed)
+    deltas = []
+    i = 0
+    while i < len(text):
+        step = rng.randint(1, 6)
+        deltas.append(text[i:i + step])
+        i += step
+    return deltas
+
+
+def _best_ms(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def measure(tokens: int, repeat: int) -> dict:
+    """返回流结束后的提取耗时（用户等待的部分）和增量提取在流式过程中的总耗时"""
+    output = build_output(tokens)
+    deltas = split_deltas(output)
+    full_content = "".join(deltas)
+
+    def feed_all() -> IncrementalHtmlExtractor:
+        extractor = IncrementalHtmlExtractor()
+        for delta in deltas:
+            extractor.feed(delta)
+        return extractor
+
+    fed = feed_all()
+    expected = legacy_extract_html_content(full_content)
+    if fed.result() != expected:
+        raise AssertionError(f"{tokens} token: 两种实现的提取结果不一致")
+
+    extractors = [feed_all() for _ in range(repeat)]
+    return {
+        "chars": len(output),
+        "deltas": len(deltas),
+        "legacy_ms": _best_ms(lambda: legacy_extract_html_content(full_content), repeat),
+        "incremental_ms": _best_ms(lambda: extractors.pop().result(), repeat),
+        "streaming_ms": _best_ms(feed_all, repeat),
+    }
+
+
+def run_benchmark(tokens: int = 4000, repeat: int = 20) -> bool:
+    print("=" * 72)
+    print("AI 输出 HTML 提取基准（最好的一次，单位 ms）")
+    print("=" * 72)
+    print(f"{'token':>7} {'字符':>8} {'增量':>7} {'旧实现(流结束后)':>16} {'增量(流结束后)':>14} {'增量(流式过程)':>14}")
+    try:
+        for size in sorted({tokens // 4, tokens, tokens * 4}):
+            result = measure(size, repeat)
+            print(
+                f"{size:>7} {result['chars']:>8} {result['deltas']:>7} "
+                f"{result['legacy_ms']:>20.3f} {result['incremental_ms']:>18.3f} {result['streaming_ms']:>18.3f}"
+            )
+    except AssertionError as e:
+        print(f"[错误] {e}")
+        return False
+    print()
+    print("[成功] 两种实现的提取结果一致")
+    print("  - 旧实现在流结束后解析全文，耗时随输出长度平方增长，直接计入用户等待时间")
+    print("  - 增量提取把扫描分摊到每个增量（流式过程合计，线性），流结束后只做一次切片")
+    return True
+
+
+if __name__ == "__main__":
+    token_count = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    repeat_count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    sys.exit(0 if run_benchmark(token_count, repeat_count) else 1)
@@ -0,0 +1,92 @@
+"""
+AI 流式输出 SSE 合并的基准
+
+并发发起多个模拟生成请求（每个约 4k token，按 1~6 个字符切分为增量），经 Starlette StreamingResponse 下发，比较：
+- 逐个增量下发（ai_stream_flush_ms=0）
+- DeltaCoalescer 合并下发（当前配置的 ai_stream_flush_ms / ai_stream_flush_bytes）
+统计每个响应的 SSE 帧数和每次生成消耗的 CPU 时间。增量到达时间用虚拟时钟模拟（每个增量间隔 --interval-ms），
+不真正等待，基准很快跑完。
+
+用法: python benchmark_ai_stream_coalescing.py [--concurrency 50] [--tokens 4000] [--interval-ms 20]
+"""
+import argparse
+import asyncio
+import sys
+import time
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+from app.config import settings
+from app.routers.ai import _sse_data
+from app.services.ai_stream_coalescer import DeltaCoalescer
+from benchmark_ai_html_extractor import build_output, split_deltas
+
+
+def build_app(deltas: list, interval_ms: float, flush_ms: int, flush_bytes: int) -> Starlette:
+    async def generate(request):
+        async def events():
+            now = 0.0
+            coalescer = DeltaCoalescer(flush_ms, flush_bytes, clock=lambda: now)
+            for delta in deltas:
+                now += interval_ms / 1000
+                pending = coalescer.push(delta)
+                if pending:
+                    yield _sse_data({'content': pending})
+                # 让出事件循环，模拟多个上游流交错到达
+                await asyncio.sleep(0)
+            pending = coalescer.flush()
+            if pending:
+                yield _sse_data({'content': pending})
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return Starlette(routes=[Route("/generate", generate, methods=["POST"])])
+
+
+async def run_case(deltas: list, concurrency: int, interval_ms: float, flush_ms: int, flush_bytes: int) -> dict:
+    app = build_app(deltas, interval_ms, flush_ms, flush_bytes)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        async def one():
+            response = await client.post("/generate")
+            return response.text.count("\n\n") - 1  # 不含 [DONE]
+
+        started = time.process_time()
+        frames = await asyncio.gather(*(one() for _ in range(concurrency)))
+        cpu = time.process_time() - started
+    return {"frames": sum(frames) / len(frames), "cpu_ms": cpu * 1000 / concurrency}
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="AI 流式输出 SSE 合并基准")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--tokens", type=int, default=4000)
+    parser.add_argument("--interval-ms", type=float, default=20, help="相邻增量的到达间隔（虚拟时间）")
+    args = parser.parse_args()
+
+    deltas = split_deltas(build_output(args.tokens))
+    print("=" * 72)
+    print(f"SSE 合并基准：{args.concurrency} 个并发生成，每个约 {args.tokens} token / {len(deltas)} 个增量，"
+          f"增量间隔 {args.interval_ms} ms")
+    print("=" * 72)
+    cases = [
+        ("逐个增量下发", 0, 0),
+        (f"合并下发（{settings.ai_stream_flush_ms} ms / {settings.ai_stream_flush_bytes} 字节）",
+         settings.ai_stream_flush_ms, settings.ai_stream_flush_bytes),
+    ]
+    results = []
+    for label, flush_ms, flush_bytes in cases:
+        result = asyncio.run(run_case(deltas, args.concurrency, args.interval_ms, flush_ms, flush_bytes))
+        results.append(result)
+        print(f"  {label:<32} 每个响应 {result['frames']:>7.0f} 帧，每次生成 CPU {result['cpu_ms']:>8.2f} ms")
+    baseline, coalesced = results
+    print()
+    print(f"[成功] 帧数减少 {baseline['frames'] / coalesced['frames']:.1f}x，"
+          f"CPU 减少 {baseline['cpu_ms'] / coalesced['cpu_ms']:.1f}x")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
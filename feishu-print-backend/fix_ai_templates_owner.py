@@ -56,7 +56,8 @@ try:
         # 更新模板
         result = conn.execute(text("""
             UPDATE templates 
-            SET owner_id = :user_id 
+            SET owner_id = :user_id,
+                name_scope = CASE WHEN deleted_at IS NULL THEN :user_id END
             WHERE owner_id IS NULL AND is_system = 0
         """), {"user_id": user_id})
         
@@ -64,6 +64,11 @@ def _detect_templates_endpoint(base_url: str, timeout: int) -> str | None:
         "/templates",
     ]
 
+    # 优先使用批量接口
+    batch_path = "/api/templates/batch"
+    if isinstance(paths.get(batch_path), dict) and "post" in paths[batch_path]:
+        return base_url + batch_path
+
     for p in candidates:
         methods = paths.get(p)
         if not isinstance(methods, dict):
@@ -172,6 +177,37 @@ def _build_templates(traditional_count: int, modern_count: int, name_suffix: str
     return templates
 
 
+def _import_batch(endpoint: str, templates: list[dict], args) -> int:
+    """通过批量接口一次导入全部模板（单个事务）"""
+    status, body = _post_json(endpoint, {"templates": templates}, timeout=args.timeout)
+    if status not in (200, 201):
+        print(f"批量导入失败({status})\n{body}")
+        return 1
+
+    result = json.loads(body)
+    for item in result["results"]:
+        idx = item["index"] + 1
+        if item["status"] == "created":
+            print(f"[{idx}/{len(templates)}] 创建成功: {item['name']}")
+        elif item["status"] == "skipped":
+            if args.fail_on_exists:
+                print(f"[{idx}/{len(templates)}] 已存在: {item['name']}")
+            else:
+                print(f"[{idx}/{len(templates)}] 已存在，跳过: {item['name']}")
+        else:
+            print(f"[{idx}/{len(templates)}] 创建失败: {item['name']}\n{item.get('detail')}")
+
+    print("\n==== 导入结果 ====")
+    print(f"目标数量: {len(templates)}")
+    print(f"创建成功: {result['created']}")
+    print(f"已存在跳过: {result['skipped']}")
+    print(f"失败: {result['failed']}")
+
+    if args.fail_on_exists and result["skipped"]:
+        return 2
+    return 0 if result["failed"] == 0 else 1
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="批量导入占位符模板（10传统+10现代）")
     parser.add_argument(
@@ -225,12 +261,16 @@ def main() -> int:
 
             return 2
 
-    if not endpoint.endswith("/"):
+    is_batch = endpoint.rstrip("/").endswith("/batch")
+    if not is_batch and not endpoint.endswith("/"):
         endpoint = endpoint + "/"
 
     print(f"使用接口: {endpoint}")
     templates = _build_templates(args.traditional, args.modern, args.name_suffix)
 
+    if is_batch:
+        return _import_batch(endpoint, templates, args)
+
     created = 0
     skipped = 0
     failed = 0
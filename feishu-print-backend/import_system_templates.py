@@ -8,12 +8,15 @@ import urllib.error
 import urllib.request
 
 
-def _post_json(url: str, payload: dict, timeout: int) -> tuple[int, str]:
+def _post_json(url: str, payload: dict, timeout: int, token: str = "") -> tuple[int, str]:
     data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = {"Content-Type": "application/json; charset=utf-8"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
     req = urllib.request.Request(
         url=url,
         data=data,
-        headers={"Content-Type": "application/json; charset=utf-8"},
+        headers=headers,
         method="POST",
     )
     try:
@@ -1551,8 +1554,13 @@ def main() -> int:
     )
     parser.add_argument(
         "--endpoint",
-        default="/api/templates/",
-        help="模板接口路径",
+        default="",
+        help="批量导入接口路径，默认 /api/templates/batch（指定 --admin-token 时为 /api/admin/templates/batch）",
+    )
+    parser.add_argument(
+        "--admin-token",
+        default="",
+        help="管理员 token；指定后通过管理接口导入为真正的系统模板（is_system=True）",
     )
     parser.add_argument("--timeout", type=int, default=15, help="请求超时秒数")
     parser.add_argument(
@@ -1561,13 +1569,18 @@ def main() -> int:
         default=True,
         help="跳过已存在的模板（默认开启）",
     )
+    parser.add_argument(
+        "--update-exists",
+        action="store_true",
+        help="覆盖已存在的同名模板（需要 --admin-token）",
+    )
     args = parser.parse_args()
 
     base_url = args.base_url.rstrip("/")
-    endpoint = base_url + args.endpoint
-
-    if not endpoint.endswith("/"):
-        endpoint = endpoint + "/"
+    endpoint_path = args.endpoint or (
+        "/api/admin/templates/batch" if args.admin_token else "/api/templates/batch"
+    )
+    endpoint = base_url + endpoint_path
 
     print(f"=" * 60)
     print(f"飞书打印模板系统 - 系统模板导入工具")
@@ -1579,36 +1592,40 @@ def main() -> int:
     print(f"准备导入 {len(templates)} 个模板...")
     print()
 
-    created = 0
-    skipped = 0
-    failed = 0
-
-    for idx, t in enumerate(templates, start=1):
-        status, body = _post_json(endpoint, t, timeout=args.timeout)
-
-        if status in (200, 201):
-            created += 1
-            print(f"[{idx:2d}/{len(templates)}] ✅ 创建成功: {t['name']}")
-            continue
-
-        if status == 400:
-            skipped += 1
-            print(f"[{idx:2d}/{len(templates)}] ⏭️  已存在，跳过: {t['name']}")
-            continue
-
-        failed += 1
-        print(f"[{idx:2d}/{len(templates)}] ❌ 创建失败({status}): {t['name']}")
-        print(f"    响应: {body[:200]}...")
+    # 整批一次请求、一个事务
+    payload = {
+        "templates": templates,
+        "on_conflict": "update" if args.update_exists else "skip",
+    }
+    status, body = _post_json(endpoint, payload, timeout=args.timeout, token=args.admin_token)
+    if status not in (200, 201):
+        print(f"❌ 批量导入失败({status})")
+        print(f"    响应: {body[:500]}...")
+        return 1
+
+    result = json.loads(body)
+    for item in result["results"]:
+        idx = item["index"] + 1
+        if item["status"] == "created":
+            print(f"[{idx:2d}/{len(templates)}] ✅ 创建成功: {item['name']}")
+        elif item["status"] in ("updated", "unchanged"):
+            print(f"[{idx:2d}/{len(templates)}] 🔄 已覆盖: {item['name']}")
+        elif item["status"] == "skipped":
+            print(f"[{idx:2d}/{len(templates)}] ⏭️  已存在，跳过: {item['name']}")
+        else:
+            print(f"[{idx:2d}/{len(templates)}] ❌ 创建失败: {item['name']}（{item.get('detail')}）")
 
     print()
     print(f"=" * 60)
     print(f"导入完成！")
-    print(f"  ✅ 成功创建: {created} 个")
-    print(f"  ⏭️  跳过已存在: {skipped} 个")
-    print(f"  ❌ 失败: {failed} 个")
+    print(f"  ✅ 成功创建: {result['created']} 个")
+    if result["updated"]:
+        print(f"  🔄 覆盖更新: {result['updated']} 个")
+    print(f"  ⏭️  跳过已存在: {result['skipped']} 个")
+    print(f"  ❌ 失败: {result['failed']} 个")
     print(f"=" * 60)
 
-    return 0 if failed == 0 else 1
+    return 0 if result["failed"] == 0 else 1
 
 
 if __name__ == "__main__":
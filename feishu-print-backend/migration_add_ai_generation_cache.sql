@@ -0,0 +1,17 @@
+-- 创建 AI 生成结果缓存表
+-- 相同的需求描述 + 模式 + 字段 + 模型直接回放已校验的 HTML，不再调用模型、不扣减次数
+USE feishu_print;
+
+CREATE TABLE IF NOT EXISTS ai_generation_cache (
+    cache_key VARCHAR(64) NOT NULL PRIMARY KEY,
+    mode VARCHAR(20) NOT NULL,
+    model VARCHAR(50) NOT NULL,
+    content TEXT NOT NULL,
+    content_gz MEDIUMBLOB NULL,
+    content_encoding VARCHAR(16) NULL,
+    size INT NOT NULL DEFAULT 0,
+    hit_count INT NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    last_hit_at DATETIME NULL,
+    INDEX ix_ai_generation_cache_created_at (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
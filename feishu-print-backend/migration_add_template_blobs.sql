@@ -0,0 +1,35 @@
+-- 创建按内容寻址的模板正文表，并为 templates 表添加 blob_hash 字段
+-- 正文相同的模板共用 template_blobs 中的一行（hash 为正文 SHA-256），ref_count 为引用的模板数
+-- 执行后运行 run_migration_template_blobs.py 把已有正文移入 template_blobs
+USE feishu_print;
+
+CREATE TABLE IF NOT EXISTS template_blobs (
+    hash VARCHAR(64) NOT NULL PRIMARY KEY,
+    content TEXT NOT NULL,
+    content_gz MEDIUMBLOB NULL,
+    content_encoding VARCHAR(16) NULL,
+    size INT NOT NULL DEFAULT 0,
+    ref_count INT NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+SET @dbname = DATABASE();
+SET @tablename = 'templates';
+
+SET @columnname = 'blob_hash';
+SET @preparedStatement = (SELECT IF(
+  (
+    SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE
+      (TABLE_SCHEMA = @dbname)
+      AND (TABLE_NAME = @tablename)
+      AND (COLUMN_NAME = @columnname)
+  ) > 0,
+  'SELECT 1', -- 字段已存在，不执行任何操作
+  CONCAT('ALTER TABLE ', @tablename, ' ADD COLUMN ', @columnname, ' VARCHAR(64) NULL AFTER content_encoding,',
+         ' ADD INDEX ix_templates_blob_hash (blob_hash),',
+         ' ADD CONSTRAINT fk_templates_blob_hash FOREIGN KEY (blob_hash) REFERENCES template_blobs(hash)')
+));
+PREPARE alterIfNotExists FROM @preparedStatement;
+EXECUTE alterIfNotExists;
+DEALLOCATE PREPARE alterIfNotExists;
@@ -0,0 +1,15 @@
+-- 创建模板变更日志表（增量同步）
+-- 每次创建/修改/删除模板追加一行，GET /api/templates/changes?since=<cursor> 据此返回增量
+-- 删除的模板保留 action='delete' 的墓碑，因此不与 templates 建外键
+USE feishu_print;
+
+CREATE TABLE IF NOT EXISTS template_changes (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    template_id INT NOT NULL,
+    owner_id INT NULL,
+    is_system BOOLEAN NOT NULL DEFAULT FALSE,
+    action VARCHAR(16) NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_template_changes_owner_id (owner_id, id),
+    INDEX ix_template_changes_is_system (is_system, id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,39 @@
+-- 为 templates 表添加压缩存储字段
+-- content_encoding 为 NULL 表示旧数据（正文明文存放在 content 列）；'gzip' 表示正文压缩存放在 content_gz 列
+-- 执行后运行 run_migration_template_compression.py 压缩已有正文
+USE feishu_print;
+
+SET @dbname = DATABASE();
+SET @tablename = 'templates';
+
+SET @columnname = 'content_gz';
+SET @preparedStatement = (SELECT IF(
+  (
+    SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE
+      (TABLE_SCHEMA = @dbname)
+      AND (TABLE_NAME = @tablename)
+      AND (COLUMN_NAME = @columnname)
+  ) > 0,
+  'SELECT 1', -- 字段已存在，不执行任何操作
+  CONCAT('ALTER TABLE ', @tablename, ' ADD COLUMN ', @columnname, ' MEDIUMBLOB NULL AFTER content')
+));
+PREPARE alterIfNotExists FROM @preparedStatement;
+EXECUTE alterIfNotExists;
+DEALLOCATE PREPARE alterIfNotExists;
+
+SET @columnname = 'content_encoding';
+SET @preparedStatement = (SELECT IF(
+  (
+    SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE
+      (TABLE_SCHEMA = @dbname)
+      AND (TABLE_NAME = @tablename)
+      AND (COLUMN_NAME = @columnname)
+  ) > 0,
+  'SELECT 1', -- 字段已存在，不执行任何操作
+  CONCAT('ALTER TABLE ', @tablename, ' ADD COLUMN ', @columnname, ' VARCHAR(16) NULL AFTER content_gz')
+));
+PREPARE alterIfNotExists FROM @preparedStatement;
+EXECUTE alterIfNotExists;
+DEALLOCATE PREPARE alterIfNotExists;
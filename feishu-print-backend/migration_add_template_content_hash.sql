@@ -0,0 +1,21 @@
+-- 为 templates 表添加 content_hash 字段（SHA-256，用于 ETag / 304）
+-- 执行后运行 run_migration_template_content_hash.py 为已有数据补算哈希
+USE feishu_print;
+
+SET @dbname = DATABASE();
+SET @tablename = 'templates';
+SET @columnname = 'content_hash';
+SET @preparedStatement = (SELECT IF(
+  (
+    SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE
+      (TABLE_SCHEMA = @dbname)
+      AND (TABLE_NAME = @tablename)
+      AND (COLUMN_NAME = @columnname)
+  ) > 0,
+  'SELECT 1', -- 字段已存在，不执行任何操作
+  CONCAT('ALTER TABLE ', @tablename, ' ADD COLUMN ', @columnname, ' CHAR(64) NULL AFTER is_system')
+));
+PREPARE alterIfNotExists FROM @preparedStatement;
+EXECUTE alterIfNotExists;
+DEALLOCATE PREPARE alterIfNotExists;
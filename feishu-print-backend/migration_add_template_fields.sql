@@ -0,0 +1,14 @@
+-- 创建模板占位符字段索引表
+-- 每个模板的每个占位符字段（data-fieldname）一行，由接口写入模板时生成
+-- 执行后运行 run_migration_template_fields.py 为已有模板生成字段索引
+USE feishu_print;
+
+CREATE TABLE IF NOT EXISTS template_fields (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    template_id INT NOT NULL,
+    field_name VARCHAR(255) NOT NULL,
+    position INT NOT NULL DEFAULT 0,
+    UNIQUE KEY uq_template_fields_template_field (template_id, field_name),
+    INDEX ix_template_fields_field_name (field_name, template_id),
+    FOREIGN KEY (template_id) REFERENCES templates(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,25 @@
+-- 为 templates 表添加 parent_id 字段（派生模板 / 写时复制）
+-- content_encoding 为 'fork' 时 content_gz 保存相对 parent_id 指向的系统模板的差异
+-- 执行后运行 run_migration_template_forks.py 把已有的系统模板副本改存为差异
+USE feishu_print;
+
+SET @dbname = DATABASE();
+SET @tablename = 'templates';
+
+SET @columnname = 'parent_id';
+SET @preparedStatement = (SELECT IF(
+  (
+    SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE
+      (TABLE_SCHEMA = @dbname)
+      AND (TABLE_NAME = @tablename)
+      AND (COLUMN_NAME = @columnname)
+  ) > 0,
+  'SELECT 1', -- 字段已存在，不执行任何操作
+  CONCAT('ALTER TABLE ', @tablename, ' ADD COLUMN ', @columnname, ' INT NULL AFTER content_encoding,',
+         ' ADD INDEX ix_templates_parent_id (parent_id),',
+         ' ADD CONSTRAINT fk_templates_parent_id FOREIGN KEY (parent_id) REFERENCES templates(id)')
+));
+PREPARE alterIfNotExists FROM @preparedStatement;
+EXECUTE alterIfNotExists;
+DEALLOCATE PREPARE alterIfNotExists;
@@ -0,0 +1,39 @@
+-- 为 templates 表添加全文搜索支持
+-- search_text：占位符字段名 + 去掉标签后的可见文本（由接口写入时生成）
+-- ft_templates_search：ngram 分词的 FULLTEXT 索引（MySQL 5.7.6+），支持中文关键词
+-- 执行后运行 run_migration_template_search.py 为已有数据生成 search_text
+USE feishu_print;
+
+SET @dbname = DATABASE();
+SET @tablename = 'templates';
+SET @columnname = 'search_text';
+SET @preparedStatement = (SELECT IF(
+  (
+    SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE
+      (TABLE_SCHEMA = @dbname)
+      AND (TABLE_NAME = @tablename)
+      AND (COLUMN_NAME = @columnname)
+  ) > 0,
+  'SELECT 1', -- 字段已存在，不执行任何操作
+  CONCAT('ALTER TABLE ', @tablename, ' ADD COLUMN ', @columnname, ' TEXT NULL')
+));
+PREPARE alterIfNotExists FROM @preparedStatement;
+EXECUTE alterIfNotExists;
+DEALLOCATE PREPARE alterIfNotExists;
+
+SET @indexname = 'ft_templates_search';
+SET @preparedStatement = (SELECT IF(
+  (
+    SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+    WHERE
+      (TABLE_SCHEMA = @dbname)
+      AND (TABLE_NAME = @tablename)
+      AND (INDEX_NAME = @indexname)
+  ) > 0,
+  'SELECT 1', -- 索引已存在，不执行任何操作
+  CONCAT('ALTER TABLE ', @tablename, ' ADD FULLTEXT INDEX ', @indexname, ' (name, search_text) WITH PARSER ngram')
+));
+PREPARE createIndexIfNotExists FROM @preparedStatement;
+EXECUTE createIndexIfNotExists;
+DEALLOCATE PREPARE createIndexIfNotExists;
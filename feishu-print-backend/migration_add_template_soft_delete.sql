@@ -0,0 +1,25 @@
+-- 为 templates 表添加 deleted_at 字段（软删除）
+-- 删除接口只写 deleted_at，过了保留期由后台任务分批物理删除（见 app/services/template_purge.py）
+-- MySQL 不支持部分索引：(owner_id, deleted_at) 联合索引服务列表查询，deleted_at 索引服务清理任务的范围扫描
+USE feishu_print;
+
+SET @dbname = DATABASE();
+SET @tablename = 'templates';
+
+SET @columnname = 'deleted_at';
+SET @preparedStatement = (SELECT IF(
+  (
+    SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE
+      (TABLE_SCHEMA = @dbname)
+      AND (TABLE_NAME = @tablename)
+      AND (COLUMN_NAME = @columnname)
+  ) > 0,
+  'SELECT 1', -- 字段已存在，不执行任何操作
+  CONCAT('ALTER TABLE ', @tablename, ' ADD COLUMN ', @columnname, ' DATETIME NULL AFTER updated_at,',
+         ' ADD INDEX ix_templates_owner_deleted (owner_id, deleted_at),',
+         ' ADD INDEX ix_templates_deleted_at (deleted_at)')
+));
+PREPARE alterIfNotExists FROM @preparedStatement;
+EXECUTE alterIfNotExists;
+DEALLOCATE PREPARE alterIfNotExists;
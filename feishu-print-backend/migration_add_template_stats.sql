@@ -0,0 +1,15 @@
+-- 创建模板使用统计表
+-- 打开 / 导出 / 回填事件在进程内聚合后定期累加写入，use_count 为三者之和
+USE feishu_print;
+
+CREATE TABLE IF NOT EXISTS template_stats (
+    template_id INT NOT NULL PRIMARY KEY,
+    open_count INT NOT NULL DEFAULT 0,
+    export_count INT NOT NULL DEFAULT 0,
+    backfill_count INT NOT NULL DEFAULT 0,
+    use_count INT NOT NULL DEFAULT 0,
+    last_used_at DATETIME NULL,
+    INDEX ix_template_stats_use_count (use_count),
+    INDEX ix_template_stats_last_used_at (last_used_at),
+    FOREIGN KEY (template_id) REFERENCES templates(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
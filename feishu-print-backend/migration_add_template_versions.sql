@@ -0,0 +1,19 @@
+-- 创建模板历史版本表
+-- 每 10 个版本保存一次完整快照（is_snapshot = 1），其余版本只保存相对上一版本的差异
+-- payload 为 gzip 压缩后的 JSON，格式见 app/services/template_versions.py
+USE feishu_print;
+
+CREATE TABLE IF NOT EXISTS template_versions (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    template_id INT NOT NULL,
+    version INT NOT NULL,
+    is_snapshot BOOLEAN NOT NULL DEFAULT FALSE,
+    payload MEDIUMBLOB NOT NULL,
+    content_hash VARCHAR(64) NULL,
+    content_length INT NULL,
+    created_by INT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_template_versions_template_version (template_id, version),
+    FOREIGN KEY (template_id) REFERENCES templates(id) ON DELETE CASCADE,
+    FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE SET NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,134 @@
+"""
+数据库迁移脚本：创建 template_blobs 表（按内容寻址的模板正文），为 templates 表添加 blob_hash 字段，
+并把已有模板的正文移入 template_blobs
+
+可重复执行：已移入的模板会跳过，最后按 templates.blob_hash 重新统计 ref_count 并删除无引用的正文
+（删除用户时数据库级联删除模板不会减少计数，可定期执行本脚本校正）。
+完成后可在低峰期执行 OPTIMIZE TABLE templates 回收表空间。
+"""
+import sys
+import io
+from sqlalchemy import text
+from app.database import engine
+from app.config import settings
+from app.models.template_blob import TemplateBlob
+from app.services.template_content import decode_content, CONTENT_ENCODING_GZIP
+from app.services.template_blobs import BLOB_COLUMNS, acquire_blobs
+
+# 设置标准输出编码为 UTF-8（Windows 兼容）
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+BATCH_SIZE = 200
+
+
+def run_migration():
+    """执行数据库迁移"""
+    print("=" * 60)
+    print("开始执行数据库迁移：模板正文按内容去重")
+    print("=" * 60)
+    print(f"数据库连接: {settings.database_url.split('@')[-1] if '@' in settings.database_url else '已配置'}")
+    print()
+
+    try:
+        print("正在创建 template_blobs 表...")
+        TemplateBlob.__table__.create(bind=engine, checkfirst=True)
+        print("[成功] 表已就绪")
+        print()
+
+        with engine.connect() as connection:
+            trans = connection.begin()
+            try:
+                check_column = text("""
+                    SELECT COUNT(*) FROM information_schema.COLUMNS
+                    WHERE TABLE_SCHEMA = DATABASE()
+                    AND TABLE_NAME = 'templates'
+                    AND COLUMN_NAME = 'blob_hash'
+                """)
+                if connection.execute(check_column).scalar() > 0:
+                    print("[提示] blob_hash 字段已存在，跳过添加字段步骤")
+                else:
+                    print("正在添加 blob_hash 字段...")
+                    connection.execute(text("""
+                        ALTER TABLE templates
+                        ADD COLUMN blob_hash VARCHAR(64) NULL AFTER content_encoding,
+                        ADD INDEX ix_templates_blob_hash (blob_hash),
+                        ADD CONSTRAINT fk_templates_blob_hash FOREIGN KEY (blob_hash) REFERENCES template_blobs(hash)
+                    """))
+                    print("[成功] 字段添加成功！")
+                print()
+
+                # 明文 / gzip 存储的模板（派生模板保持差异存储）
+                print("正在把已有正文移入 template_blobs...")
+                moved = 0
+                last_id = 0
+                while True:
+                    rows = connection.execute(text("""
+                        SELECT id, content, content_gz, content_encoding FROM templates
+                        WHERE id > :last_id AND (content_encoding IS NULL OR content_encoding = :gzip)
+                        ORDER BY id LIMIT :batch
+                    """), {"last_id": last_id, "gzip": CONTENT_ENCODING_GZIP, "batch": BATCH_SIZE}).fetchall()
+                    if not rows:
+                        break
+                    blob_hashes = acquire_blobs(connection, [decode_content(row[1], row[2], row[3]) for row in rows])
+                    connection.execute(text("""
+                        UPDATE templates
+                        SET content = :content, content_gz = NULL, content_encoding = :content_encoding,
+                            blob_hash = :blob_hash
+                        WHERE id = :id
+                    """), [
+                        {
+                            "content": BLOB_COLUMNS[0],
+                            "content_encoding": BLOB_COLUMNS[2],
+                            "blob_hash": blob_hash,
+                            "id": row[0],
+                        }
+                        for row, blob_hash in zip(rows, blob_hashes)
+                    ])
+                    moved += len(rows)
+                    last_id = rows[-1][0]
+                    print(f"  - 已移入 {moved} 个模板")
+                print(f"[成功] 共移入 {moved} 个模板")
+                print()
+
+                print("正在重新统计引用计数...")
+                connection.execute(text("""
+                    UPDATE template_blobs
+                    SET ref_count = (SELECT COUNT(*) FROM templates t WHERE t.blob_hash = template_blobs.hash)
+                """))
+                removed = connection.execute(text("DELETE FROM template_blobs WHERE ref_count = 0")).rowcount
+                stats = connection.execute(text(
+                    "SELECT COUNT(*), COALESCE(SUM(ref_count), 0) FROM template_blobs"
+                )).fetchone()
+                print(f"[成功] 删除无引用正文 {removed} 条；{stats[1]} 个模板共用 {stats[0]} 份正文")
+
+                trans.commit()
+                return True
+            except Exception as e:
+                print(f"[错误] 迁移过程中发生错误: {str(e)}")
+                import traceback
+                traceback.print_exc()
+                trans.rollback()
+                return False
+
+    except Exception as e:
+        print(f"[错误] 数据库连接失败: {str(e)}")
+        print()
+        print("请检查:")
+        print("  1. 数据库服务是否运行")
+        print("  2. .env 文件中的 DATABASE_URL 配置是否正确")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    success = run_migration()
+    print()
+    print("=" * 60)
+    if success:
+        print("迁移完成！")
+        sys.exit(0)
+    else:
+        print("迁移失败！")
+        sys.exit(1)
@@ -0,0 +1,118 @@
+"""
+数据库迁移脚本：为 templates 表添加压缩存储字段（content_gz / content_encoding），并分批压缩已有正文
+
+压缩完成后可在低峰期执行 OPTIMIZE TABLE templates 回收表空间。
+"""
+import sys
+import io
+from sqlalchemy import text
+from app.database import engine
+from app.config import settings
+from app.services.template_content import encode_content
+
+# 设置标准输出编码为 UTF-8（Windows 兼容）
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+BATCH_SIZE = 200
+
+
+def run_migration():
+    """执行数据库迁移"""
+    print("=" * 60)
+    print("开始执行数据库迁移：模板正文压缩存储")
+    print("=" * 60)
+    print(f"数据库连接: {settings.database_url.split('@')[-1] if '@' in settings.database_url else '已配置'}")
+    print()
+
+    try:
+        with engine.connect() as connection:
+            trans = connection.begin()
+            try:
+                columns = [
+                    ("content_gz", "MEDIUMBLOB NULL AFTER content"),
+                    ("content_encoding", "VARCHAR(16) NULL AFTER content_gz"),
+                ]
+                for column_name, definition in columns:
+                    check_column = text("""
+                        SELECT COUNT(*) FROM information_schema.COLUMNS
+                        WHERE TABLE_SCHEMA = DATABASE()
+                        AND TABLE_NAME = 'templates'
+                        AND COLUMN_NAME = :column_name
+                    """)
+                    if connection.execute(check_column, {"column_name": column_name}).scalar() > 0:
+                        print(f"[提示] {column_name} 字段已存在，跳过添加字段步骤")
+                    else:
+                        print(f"正在添加 {column_name} 字段...")
+                        connection.execute(text(f"ALTER TABLE templates ADD COLUMN {column_name} {definition}"))
+                        print("[成功] 字段添加成功！")
+                print()
+
+                # 分批压缩旧数据（content_encoding 为 NULL 的行），过短或压缩无收益的正文保持明文
+                print("正在压缩已有模板正文...")
+                scanned = 0
+                compressed = 0
+                bytes_before = 0
+                bytes_after = 0
+                last_id = 0
+                while True:
+                    rows = connection.execute(text("""
+                        SELECT id, content FROM templates
+                        WHERE id > :last_id AND content_encoding IS NULL
+                        ORDER BY id LIMIT :batch
+                    """), {"last_id": last_id, "batch": BATCH_SIZE}).fetchall()
+                    if not rows:
+                        break
+                    for row in rows:
+                        content, content_gz, content_encoding = encode_content(row[1])
+                        if content_encoding is None:
+                            continue
+                        connection.execute(text("""
+                            UPDATE templates
+                            SET content = :content, content_gz = :content_gz, content_encoding = :content_encoding
+                            WHERE id = :id
+                        """), {
+                            "content": content,
+                            "content_gz": content_gz,
+                            "content_encoding": content_encoding,
+                            "id": row[0],
+                        })
+                        compressed += 1
+                        bytes_before += len((row[1] or "").encode("utf-8"))
+                        bytes_after += len(content_gz)
+                    scanned += len(rows)
+                    last_id = rows[-1][0]
+                    print(f"  - 已扫描 {scanned} 条，压缩 {compressed} 条")
+
+                print(f"[成功] 共压缩 {compressed} 条记录：{bytes_before} 字节 -> {bytes_after} 字节")
+
+                trans.commit()
+                return True
+            except Exception as e:
+                print(f"[错误] 迁移过程中发生错误: {str(e)}")
+                import traceback
+                traceback.print_exc()
+                trans.rollback()
+                return False
+
+    except Exception as e:
+        print(f"[错误] 数据库连接失败: {str(e)}")
+        print()
+        print("请检查:")
+        print("  1. 数据库服务是否运行")
+        print("  2. .env 文件中的 DATABASE_URL 配置是否正确")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    success = run_migration()
+    print()
+    print("=" * 60)
+    if success:
+        print("迁移完成！")
+        sys.exit(0)
+    else:
+        print("迁移失败！")
+        sys.exit(1)
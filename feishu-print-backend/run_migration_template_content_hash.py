@@ -0,0 +1,97 @@
+"""
+数据库迁移脚本：为 templates 表添加 content_hash 字段，并为已有数据补算哈希
+"""
+import sys
+import io
+from sqlalchemy import text
+from app.database import engine
+from app.config import settings
+from app.services.template_content import compute_content_hash
+
+# 设置标准输出编码为 UTF-8（Windows 兼容）
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+BATCH_SIZE = 200
+
+
+def run_migration():
+    """执行数据库迁移"""
+    print("=" * 60)
+    print("开始执行数据库迁移：添加 content_hash 字段")
+    print("=" * 60)
+    print(f"数据库连接: {settings.database_url.split('@')[-1] if '@' in settings.database_url else '已配置'}")
+    print()
+
+    try:
+        with engine.connect() as connection:
+            trans = connection.begin()
+            try:
+                check_column = text("""
+                    SELECT COUNT(*) FROM information_schema.COLUMNS
+                    WHERE TABLE_SCHEMA = DATABASE()
+                    AND TABLE_NAME = 'templates'
+                    AND COLUMN_NAME = 'content_hash'
+                """)
+                if connection.execute(check_column).scalar() > 0:
+                    print("[提示] content_hash 字段已存在，跳过添加字段步骤")
+                else:
+                    print("正在添加 content_hash 字段...")
+                    connection.execute(text(
+                        "ALTER TABLE templates ADD COLUMN content_hash CHAR(64) NULL AFTER is_system"
+                    ))
+                    print("[成功] 字段添加成功！")
+                print()
+
+                # 分批补算哈希（与接口写入时使用同一个函数，保证结果一致）
+                print("正在为已有模板补算 content_hash...")
+                updated = 0
+                last_id = 0
+                while True:
+                    rows = connection.execute(text("""
+                        SELECT id, name, content, template_type FROM templates
+                        WHERE id > :last_id AND content_hash IS NULL
+                        ORDER BY id LIMIT :batch
+                    """), {"last_id": last_id, "batch": BATCH_SIZE}).fetchall()
+                    if not rows:
+                        break
+                    for row in rows:
+                        connection.execute(
+                            text("UPDATE templates SET content_hash = :hash WHERE id = :id"),
+                            {"hash": compute_content_hash(row[1], row[2], row[3]), "id": row[0]}
+                        )
+                    updated += len(rows)
+                    last_id = rows[-1][0]
+                    print(f"  - 已处理 {updated} 条")
+
+                trans.commit()
+                print(f"[成功] 共补算 {updated} 条记录的 content_hash")
+                return True
+            except Exception as e:
+                print(f"[错误] 迁移过程中发生错误: {str(e)}")
+                import traceback
+                traceback.print_exc()
+                trans.rollback()
+                return False
+
+    except Exception as e:
+        print(f"[错误] 数据库连接失败: {str(e)}")
+        print()
+        print("请检查:")
+        print("  1. 数据库服务是否运行")
+        print("  2. .env 文件中的 DATABASE_URL 配置是否正确")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    success = run_migration()
+    print()
+    print("=" * 60)
+    if success:
+        print("迁移完成！")
+        sys.exit(0)
+    else:
+        print("迁移失败！")
+        sys.exit(1)
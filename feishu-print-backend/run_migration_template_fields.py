@@ -0,0 +1,88 @@
+"""
+数据库迁移脚本：创建 template_fields 表，并为已有模板生成占位符字段索引
+"""
+import sys
+import io
+from sqlalchemy import text
+from app.database import engine
+from app.config import settings
+from app.models.template_field import TemplateField
+from app.services.template_content import decode_content
+from app.services.template_fields import bulk_insert_template_fields
+
+# 设置标准输出编码为 UTF-8（Windows 兼容）
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+BATCH_SIZE = 200
+
+
+def run_migration():
+    """执行数据库迁移"""
+    print("=" * 60)
+    print("开始执行数据库迁移：创建模板字段索引表")
+    print("=" * 60)
+    print(f"数据库连接: {settings.database_url.split('@')[-1] if '@' in settings.database_url else '已配置'}")
+    print()
+
+    try:
+        print("正在创建 template_fields 表...")
+        TemplateField.__table__.create(bind=engine, checkfirst=True)
+        print("[成功] 表已就绪")
+        print()
+
+        with engine.connect() as connection:
+            trans = connection.begin()
+            try:
+                # 只处理还没有字段索引的模板，可重复执行
+                print("正在为已有模板生成字段索引...")
+                processed = 0
+                last_id = 0
+                while True:
+                    rows = connection.execute(text("""
+                        SELECT t.id, t.content, t.content_gz, t.content_encoding FROM templates t
+                        WHERE t.id > :last_id
+                        AND NOT EXISTS (SELECT 1 FROM template_fields f WHERE f.template_id = t.id)
+                        ORDER BY t.id LIMIT :batch
+                    """), {"last_id": last_id, "batch": BATCH_SIZE}).fetchall()
+                    if not rows:
+                        break
+                    bulk_insert_template_fields(
+                        connection,
+                        {row[0]: decode_content(row[1], row[2], row[3]) for row in rows}
+                    )
+                    processed += len(rows)
+                    last_id = rows[-1][0]
+                    print(f"  - 已处理 {processed} 个模板")
+                print(f"[成功] 共处理 {processed} 个模板")
+
+                trans.commit()
+                return True
+            except Exception as e:
+                print(f"[错误] 迁移过程中发生错误: {str(e)}")
+                import traceback
+                traceback.print_exc()
+                trans.rollback()
+                return False
+
+    except Exception as e:
+        print(f"[错误] 数据库连接失败: {str(e)}")
+        print()
+        print("请检查:")
+        print("  1. 数据库服务是否运行")
+        print("  2. .env 文件中的 DATABASE_URL 配置是否正确")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    success = run_migration()
+    print()
+    print("=" * 60)
+    if success:
+        print("迁移完成！")
+        sys.exit(0)
+    else:
+        print("迁移失败！")
+        sys.exit(1)
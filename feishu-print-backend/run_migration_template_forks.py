@@ -0,0 +1,139 @@
+"""
+数据库迁移脚本：为 templates 表添加 parent_id 字段（派生模板），并把已有的系统模板副本改存为差异
+
+用户模板与某个系统模板同名，或正文与某个系统模板完全相同时，视为该系统模板的副本；
+差异足够小的副本改为 content_encoding='fork'，差异过大的保持不变。完成后可在低峰期执行
+OPTIMIZE TABLE templates 回收表空间。
+"""
+import sys
+import io
+from sqlalchemy import text
+from app.database import engine
+from app.config import settings
+from app.services.template_content import decode_content, CONTENT_ENCODING_FORK
+from app.services.template_forks import encode_fork
+
+# 设置标准输出编码为 UTF-8（Windows 兼容）
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+BATCH_SIZE = 200
+
+
+def run_migration():
+    """执行数据库迁移"""
+    print("=" * 60)
+    print("开始执行数据库迁移：派生模板（写时复制）")
+    print("=" * 60)
+    print(f"数据库连接: {settings.database_url.split('@')[-1] if '@' in settings.database_url else '已配置'}")
+    print()
+
+    try:
+        with engine.connect() as connection:
+            trans = connection.begin()
+            try:
+                check_column = text("""
+                    SELECT COUNT(*) FROM information_schema.COLUMNS
+                    WHERE TABLE_SCHEMA = DATABASE()
+                    AND TABLE_NAME = 'templates'
+                    AND COLUMN_NAME = 'parent_id'
+                """)
+                if connection.execute(check_column).scalar() > 0:
+                    print("[提示] parent_id 字段已存在，跳过添加字段步骤")
+                else:
+                    print("正在添加 parent_id 字段...")
+                    connection.execute(text("""
+                        ALTER TABLE templates
+                        ADD COLUMN parent_id INT NULL AFTER content_encoding,
+                        ADD INDEX ix_templates_parent_id (parent_id),
+                        ADD CONSTRAINT fk_templates_parent_id FOREIGN KEY (parent_id) REFERENCES templates(id)
+                    """))
+                    print("[成功] 字段添加成功！")
+                print()
+
+                # 系统模板数量有限，一次性读入内存
+                system_rows = connection.execute(text("""
+                    SELECT id, name, content, content_gz, content_encoding FROM templates
+                    WHERE is_system = 1 AND (content_encoding IS NULL OR content_encoding <> :fork)
+                """), {"fork": CONTENT_ENCODING_FORK}).fetchall()
+                by_name = {}
+                by_content = {}
+                for row in system_rows:
+                    html = decode_content(row[2], row[3], row[4])
+                    by_name.setdefault(row[1], (row[0], html))
+                    by_content.setdefault(html, (row[0], html))
+                print(f"已加载 {len(system_rows)} 个系统模板")
+
+                print("正在把系统模板副本改存为差异...")
+                scanned = 0
+                forked = 0
+                bytes_before = 0
+                bytes_after = 0
+                last_id = 0
+                while True:
+                    rows = connection.execute(text("""
+                        SELECT id, name, content, content_gz, content_encoding FROM templates
+                        WHERE id > :last_id AND is_system = 0 AND parent_id IS NULL
+                        ORDER BY id LIMIT :batch
+                    """), {"last_id": last_id, "batch": BATCH_SIZE}).fetchall()
+                    if not rows:
+                        break
+                    for row in rows:
+                        html = decode_content(row[2], row[3], row[4])
+                        parent = by_content.get(html) or by_name.get(row[1])
+                        if parent is None:
+                            continue
+                        columns = encode_fork(parent[1], html)
+                        if columns is None:
+                            continue
+                        connection.execute(text("""
+                            UPDATE templates
+                            SET content = :content, content_gz = :content_gz,
+                                content_encoding = :content_encoding, parent_id = :parent_id
+                            WHERE id = :id
+                        """), {
+                            "content": columns[0],
+                            "content_gz": columns[1],
+                            "content_encoding": columns[2],
+                            "parent_id": parent[0],
+                            "id": row[0],
+                        })
+                        forked += 1
+                        bytes_before += len(row[3]) if row[3] is not None else len((row[2] or "").encode("utf-8"))
+                        bytes_after += len(columns[1])
+                    scanned += len(rows)
+                    last_id = rows[-1][0]
+                    print(f"  - 已扫描 {scanned} 条，改存差异 {forked} 条")
+
+                print(f"[成功] 共改存 {forked} 条记录：{bytes_before} 字节 -> {bytes_after} 字节")
+
+                trans.commit()
+                return True
+            except Exception as e:
+                print(f"[错误] 迁移过程中发生错误: {str(e)}")
+                import traceback
+                traceback.print_exc()
+                trans.rollback()
+                return False
+
+    except Exception as e:
+        print(f"[错误] 数据库连接失败: {str(e)}")
+        print()
+        print("请检查:")
+        print("  1. 数据库服务是否运行")
+        print("  2. .env 文件中的 DATABASE_URL 配置是否正确")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    success = run_migration()
+    print()
+    print("=" * 60)
+    if success:
+        print("迁移完成！")
+        sys.exit(0)
+    else:
+        print("迁移失败！")
+        sys.exit(1)
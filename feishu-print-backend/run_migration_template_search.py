@@ -0,0 +1,111 @@
+"""
+数据库迁移脚本：为 templates 表添加 search_text 字段和 ngram 全文索引，并为已有数据生成搜索文本
+"""
+import sys
+import io
+from sqlalchemy import text
+from app.database import engine
+from app.config import settings
+from app.services.template_text import build_search_text
+
+# 设置标准输出编码为 UTF-8（Windows 兼容）
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+BATCH_SIZE = 200
+
+
+def run_migration():
+    """执行数据库迁移"""
+    print("=" * 60)
+    print("开始执行数据库迁移：添加全文搜索字段和索引")
+    print("=" * 60)
+    print(f"数据库连接: {settings.database_url.split('@')[-1] if '@' in settings.database_url else '已配置'}")
+    print()
+
+    try:
+        with engine.connect() as connection:
+            trans = connection.begin()
+            try:
+                check_column = text("""
+                    SELECT COUNT(*) FROM information_schema.COLUMNS
+                    WHERE TABLE_SCHEMA = DATABASE()
+                    AND TABLE_NAME = 'templates'
+                    AND COLUMN_NAME = 'search_text'
+                """)
+                if connection.execute(check_column).scalar() > 0:
+                    print("[提示] search_text 字段已存在，跳过添加字段步骤")
+                else:
+                    print("正在添加 search_text 字段...")
+                    connection.execute(text("ALTER TABLE templates ADD COLUMN search_text TEXT NULL"))
+                    print("[成功] 字段添加成功！")
+                print()
+
+                # 先补全数据再建索引，避免逐行更新时反复维护全文索引
+                print("正在为已有模板生成 search_text...")
+                updated = 0
+                last_id = 0
+                while True:
+                    rows = connection.execute(text("""
+                        SELECT id, content FROM templates
+                        WHERE id > :last_id AND search_text IS NULL
+                        ORDER BY id LIMIT :batch
+                    """), {"last_id": last_id, "batch": BATCH_SIZE}).fetchall()
+                    if not rows:
+                        break
+                    for row in rows:
+                        connection.execute(
+                            text("UPDATE templates SET search_text = :search_text WHERE id = :id"),
+                            {"search_text": build_search_text(row[1]), "id": row[0]}
+                        )
+                    updated += len(rows)
+                    last_id = rows[-1][0]
+                    print(f"  - 已处理 {updated} 条")
+                print(f"[成功] 共生成 {updated} 条记录的 search_text")
+                print()
+
+                check_index = text("""
+                    SELECT COUNT(*) FROM information_schema.STATISTICS
+                    WHERE TABLE_SCHEMA = DATABASE()
+                    AND TABLE_NAME = 'templates'
+                    AND INDEX_NAME = 'ft_templates_search'
+                """)
+                if connection.execute(check_index).scalar() > 0:
+                    print("[提示] 索引 ft_templates_search 已存在，跳过创建索引步骤")
+                else:
+                    print("正在创建 ngram 全文索引 ft_templates_search...")
+                    connection.execute(text(
+                        "ALTER TABLE templates ADD FULLTEXT INDEX ft_templates_search (name, search_text) WITH PARSER ngram"
+                    ))
+                    print("[成功] 索引创建成功！")
+
+                trans.commit()
+                return True
+            except Exception as e:
+                print(f"[错误] 迁移过程中发生错误: {str(e)}")
+                import traceback
+                traceback.print_exc()
+                trans.rollback()
+                return False
+
+    except Exception as e:
+        print(f"[错误] 数据库连接失败: {str(e)}")
+        print()
+        print("请检查:")
+        print("  1. 数据库服务是否运行")
+        print("  2. .env 文件中的 DATABASE_URL 配置是否正确")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    success = run_migration()
+    print()
+    print("=" * 60)
+    if success:
+        print("迁移完成！")
+        sys.exit(0)
+    else:
+        print("迁移失败！")
+        sys.exit(1)
@@ -0,0 +1,168 @@
+"""
+数据库迁移脚本：为 templates 表添加 name_scope 字段和 (name_scope, name) 唯一索引
+
+同一所有者下未删除模板的名称改由唯一索引保证（系统模板与未登录创建的模板共用作用域 0）。
+name_scope 是普通列，由应用在写入 owner_id / deleted_at 时维护：owner_id 的外键带 ON DELETE CASCADE，
+MySQL 不允许在这样的列上建 STORED 生成列。
+建索引前先分批处理已有的重名：每组保留 id 最小的模板，其余改名为 "名称 (n)"，并记录变更供增量同步拉取。
+改名的模板 content_hash 置空，下次读取时重新计算。随后添加字段、分批回填，最后添加唯一索引。
+
+适用于 MySQL 8.0。需先执行 migration_add_template_soft_delete.sql（依赖 deleted_at 字段）。可重复执行。
+"""
+import sys
+import io
+from sqlalchemy import text
+from app.database import engine
+from app.config import settings
+from app.services.template_names import pick_free_name
+
+# 设置标准输出编码为 UTF-8（Windows 兼容）
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+BATCH_SIZE = 200
+
+INDEX_NAME = "uq_templates_owner_name"
+
+# 与 models/template.py::_sync_name_scope 一致
+SCOPE_EXPRESSION = "CASE WHEN deleted_at IS NULL THEN COALESCE(owner_id, 0) END"
+
+
+def _column_exists(connection, column: str) -> bool:
+    return connection.execute(text("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE()
+        AND TABLE_NAME = 'templates'
+        AND COLUMN_NAME = :column
+    """), {"column": column}).scalar() > 0
+
+
+def _index_exists(connection, index: str) -> bool:
+    return connection.execute(text("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE()
+        AND TABLE_NAME = 'templates'
+        AND INDEX_NAME = :index
+    """), {"index": index}).scalar() > 0
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _rename_duplicates(connection, scope: int, name: str) -> int:
+    """处理一组重名，返回改名的模板数"""
+    rows = connection.execute(text("""
+        SELECT id, owner_id, is_system FROM templates
+        WHERE deleted_at IS NULL AND COALESCE(owner_id, 0) = :scope AND name = :name
+        ORDER BY id
+    """), {"scope": scope, "name": name}).fetchall()
+    taken = list(connection.execute(text("""
+        SELECT name FROM templates
+        WHERE deleted_at IS NULL AND COALESCE(owner_id, 0) = :scope AND name LIKE :prefix
+    """), {"scope": scope, "prefix": _escape_like(name) + "%"}).scalars())
+
+    renamed = 0
+    for row in rows[1:]:
+        new_name = pick_free_name(name, taken)
+        taken.append(new_name)
+        connection.execute(text("""
+            UPDATE templates SET name = :name, content_hash = NULL, updated_at = NOW() WHERE id = :id
+        """), {"name": new_name, "id": row[0]})
+        connection.execute(text("""
+            INSERT INTO template_changes (template_id, owner_id, is_system, action)
+            VALUES (:template_id, :owner_id, :is_system, 'upsert')
+        """), {"template_id": row[0], "owner_id": row[1], "is_system": row[2]})
+        renamed += 1
+    return renamed
+
+
+def run_migration():
+    """执行数据库迁移"""
+    print("=" * 60)
+    print("开始执行数据库迁移：模板名称唯一索引")
+    print("=" * 60)
+    print(f"数据库连接: {settings.database_url.split('@')[-1] if '@' in settings.database_url else '已配置'}")
+    print()
+
+    try:
+        with engine.connect() as connection:
+            if not _column_exists(connection, "deleted_at"):
+                print("[错误] templates 表缺少 deleted_at 字段，请先执行 migration_add_template_soft_delete.sql")
+                return False
+            if _index_exists(connection, INDEX_NAME):
+                print(f"[提示] {INDEX_NAME} 索引已存在，无需迁移")
+                return True
+
+        # 每批一个事务，避免长时间持有大量行锁
+        print("正在处理重名模板...")
+        renamed = 0
+        while True:
+            with engine.begin() as connection:
+                groups = connection.execute(text("""
+                    SELECT COALESCE(owner_id, 0) AS scope, name FROM templates
+                    WHERE deleted_at IS NULL
+                    GROUP BY COALESCE(owner_id, 0), name
+                    HAVING COUNT(*) > 1
+                    LIMIT :batch
+                """), {"batch": BATCH_SIZE}).fetchall()
+                if not groups:
+                    break
+                for scope, name in groups:
+                    renamed += _rename_duplicates(connection, scope, name)
+            print(f"  - 已改名 {renamed} 个模板")
+        print(f"[成功] 共改名 {renamed} 个模板")
+        print()
+
+        with engine.begin() as connection:
+            if _column_exists(connection, "name_scope"):
+                print("[提示] name_scope 字段已存在，跳过添加")
+            else:
+                print("正在添加 name_scope 字段...")
+                connection.execute(text("ALTER TABLE templates ADD COLUMN name_scope INT NULL AFTER deleted_at"))
+                print("[成功] 字段添加成功")
+        print()
+
+        # 按主键分批回填；已有的值也重新计算，覆盖上次中断后应用写入的行
+        print("正在回填 name_scope...")
+        with engine.connect() as connection:
+            max_id = connection.execute(text("SELECT COALESCE(MAX(id), 0) FROM templates")).scalar()
+        filled = 0
+        for start in range(0, max_id, BATCH_SIZE):
+            with engine.begin() as connection:
+                result = connection.execute(text(f"""
+                    UPDATE templates SET name_scope = {SCOPE_EXPRESSION}
+                    WHERE id > :start AND id <= :end
+                """), {"start": start, "end": start + BATCH_SIZE})
+                filled += result.rowcount
+        print(f"[成功] 共回填 {filled} 个模板")
+        print()
+
+        print("正在添加唯一索引...")
+        with engine.begin() as connection:
+            connection.execute(text(f"ALTER TABLE templates ADD UNIQUE INDEX {INDEX_NAME} (name_scope, name)"))
+        print("[成功] 索引添加成功！")
+        return True
+
+    except Exception as e:
+        print(f"[错误] 迁移过程中发生错误: {str(e)}")
+        print()
+        print("请检查:")
+        print("  1. 数据库服务是否运行")
+        print("  2. .env 文件中的 DATABASE_URL 配置是否正确")
+        print("  3. 迁移期间是否有并发写入产生了新的重名（重新执行本脚本即可）")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    success = run_migration()
+    print()
+    print("=" * 60)
+    if success:
+        print("迁移完成！")
+        sys.exit(0)
+    else:
+        print("迁移失败！")
+        sys.exit(1)
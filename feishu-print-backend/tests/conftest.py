@@ -0,0 +1,122 @@
+"""
+测试公共夹具：使用临时 SQLite 数据库，不连接 MySQL 和 AI 服务
+
+在导入 app 之前设置环境变量（覆盖 .env 中的配置）。
+"""
+import os
+import tempfile
+import uuid
+from types import SimpleNamespace
+
+_TEST_DIR = tempfile.mkdtemp(prefix="feishu-print-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TEST_DIR}/test.db"
+os.environ["TEMPLATE_PREVIEW_DIR"] = os.path.join(_TEST_DIR, "previews")
+os.environ.setdefault("DASHSCOPE_API_KEY", "test")
+os.environ.setdefault("YUN_GOUOS_MERCHANT_ID", "test")
+os.environ.setdefault("YUN_GOUOS_SECRET_KEY", "test")
+os.environ.setdefault("YUN_GOUOS_NOTIFY_URL", "http://localhost/notify")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+import app.routers.ai as ai
+from app.main import app
+from app.database import SessionLocal, engine
+from app.models.user import Membership, User
+from app.auth import create_access_token
+
+
+@pytest.fixture(scope="session")
+def client():
+    # 不以上下文管理器方式使用，不触发 startup（后台清理线程等）
+    return TestClient(app)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def user(db):
+    user = User(feishu_user_id=f"test-{uuid.uuid4().hex[:12]}")
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def headers(user):
+    token = create_access_token({"sub": user.feishu_user_id, "user_id": user.id, "role": "user"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def sql_statements():
+    """测试期间执行的 SQL 语句（只关心某个请求时，在请求前 clear()）"""
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_execute)
+    yield statements
+    event.remove(engine, "before_cursor_execute", before_execute)
+
+
+# AI 生成接口的假模型输出（通过 template-root 校验）
+AI_HTML = '<div id="template-root">' + "<p>{{姓名}}</p>" * 40 + "</div>"
+
+
+class FakeStream:
+    def __init__(self, text):
+        self._parts = [text[i:i + 16] for i in range(0, len(text), 16)]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._parts:
+            raise StopAsyncIteration
+        delta = SimpleNamespace(content=self._parts.pop(0))
+        return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+    async def close(self):
+        pass
+
+
+class FakeCompletions:
+    html = AI_HTML
+
+    def __init__(self):
+        self.calls = 0
+        self.outputs = []  # 依次返回的预设输出，用完后返回 html
+        self.prompts = []  # 每次请求的用户提示词
+        self.streams = []
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        self.prompts.append(kwargs["messages"][-1]["content"])
+        stream = FakeStream(self.outputs.pop(0) if self.outputs else self.html)
+        self.streams.append(stream)
+        return stream
+
+
+@pytest.fixture
+def membership(db, user):
+    membership = Membership(user_id=user.id, plan_type="pro", ai_generates_used=0, ai_generates_total=0)
+    db.add(membership)
+    db.commit()
+    return membership
+
+
+@pytest.fixture
+def completions(monkeypatch):
+    completions = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setattr(ai, "get_ai_client", lambda: client)
+    return completions
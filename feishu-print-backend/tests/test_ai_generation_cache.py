@@ -0,0 +1,80 @@
+import json
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from app.config import settings
+from app.models.ai_generation import AiGenerationCache
+from app.routers.ai import DEFAULT_MODE
+from app.services.ai_generation_cache import generation_cache_key
+
+
+@pytest.fixture
+def description():
+    # 每个用例使用不同的需求，互不命中
+    return f"请假申请单 {uuid.uuid4().hex[:8]}"
+
+
+def _generate(client, user, description, **extra):
+    return client.post("/api/ai/generate-template-stream", json={
+        "description": description, "feishu_user_id": user.feishu_user_id, **extra,
+    })
+
+
+def _replayed_html(text):
+    frames = [line[len("data: "):] for line in text.split("\n\n") if line.startswith("data: {")]
+    return "".join(json.loads(frame)["content"] for frame in frames)
+
+
+def _used(db, membership):
+    db.refresh(membership)
+    return membership.ai_generates_used
+
+
+def test_cache_key_normalizes_request():
+    key = generation_cache_key("请假申请单", "html", ["姓名", "部门"], "qwen-plus")
+    assert generation_cache_key("  请假申请单\n", "html", ["部门", "姓名", "姓名"], "qwen-plus") == key
+    assert generation_cache_key("ＡＢＣ 表", "html", [], "m") == generation_cache_key("abc  表", "html", [], "m")
+    assert generation_cache_key("请假申请单", "html", ["姓名"], "qwen-plus") != key
+    assert generation_cache_key("请假申请单", "html", ["姓名", "部门"], "qwen-max") != key
+
+
+def test_hit_replays_without_model_call_or_charge(client, db, user, membership, completions, description):
+    response = _generate(client, user, description)
+    assert "[DONE]" in response.text
+    assert "X-AI-Cache" not in response.headers
+    assert (completions.calls, _used(db, membership)) == (1, 1)
+
+    # 描述只差空白和大小写时同样命中
+    response = _generate(client, user, f"  {description.upper()} ")
+    assert response.headers["X-AI-Cache"] == "hit"
+    assert response.text.endswith("data: [DONE]\n\n")
+    assert _replayed_html(response.text) == completions.html
+    assert (completions.calls, _used(db, membership)) == (1, 1)
+
+
+def test_regenerate_bypasses_cache(client, db, user, membership, completions, description):
+    _generate(client, user, description)
+    response = _generate(client, user, description, useCache=False)
+    assert "X-AI-Cache" not in response.headers
+    assert (completions.calls, _used(db, membership)) == (2, 2)
+
+
+def test_disabled_cache_is_not_read_or_written(client, db, user, membership, completions, description, monkeypatch):
+    monkeypatch.setattr(settings, "ai_generation_cache_enabled", False)
+    _generate(client, user, description)
+    _generate(client, user, description)
+    assert completions.calls == 2
+    key = generation_cache_key(description, DEFAULT_MODE, [], settings.ai_model)
+    assert db.get(AiGenerationCache, key) is None
+
+
+def test_expired_entry_is_regenerated(client, db, user, membership, completions, description):
+    _generate(client, user, description)
+    db.query(AiGenerationCache).update({
+        AiGenerationCache.created_at: datetime.now() - timedelta(hours=settings.ai_generation_cache_ttl_hours + 1)
+    })
+    db.commit()
+
+    response = _generate(client, user, description)
+    assert "X-AI-Cache" not in response.headers
+    assert completions.calls == 2
@@ -0,0 +1,52 @@
+import random
+import pytest
+from app.services.ai_html_extractor import IncrementalHtmlExtractor, extract_html_content
+from benchmark_ai_html_extractor import build_output, legacy_extract_html_content, split_deltas
+
+ROOT = '<div id="template-root"><div>a</div>'
+
+CASES = [
+    # 代码块在结尾闭合 / 未闭合的 template-root / 没有 div
+    f"```html\n{ROOT}\n```",
+    f"```html\n{ROOT}</div>\n```\n说明文字",
+    f"好的：\n```html\n{ROOT}\n\n",
+    f"```html\n{ROOT}\n``",
+    f"```html\n{ROOT}\n```html",
+    "```html\n<p>没有 div</p>\n```",
+    "<div class=\"a\"><div>b</div></div>\n```",
+    "``",
+    "```",
+    build_output(300),
+    build_output(300)[:-40],
+]
+
+
+@pytest.mark.parametrize("text", CASES)
+def test_matches_legacy_extractor(text):
+    assert extract_html_content(text) == legacy_extract_html_content(text)
+
+
+@pytest.mark.parametrize("text", CASES)
+def test_matches_legacy_extractor_for_any_split(text):
+    expected = legacy_extract_html_content(text)
+    for seed in range(20):
+        rng = random.Random(seed)
+        extractor = IncrementalHtmlExtractor()
+        i = 0
+        while i < len(text):
+            step = rng.randint(1, 8)
+            extractor.feed(text[i:i + step])
+            i += step
+        assert extractor.result() == expected, seed
+
+
+def test_fenced_root_has_no_trailing_marker():
+    assert extract_html_content(f"```html\n{ROOT}\n```") == ROOT
+
+
+def test_streamed_template_matches_legacy():
+    output = build_output(2000)
+    extractor = IncrementalHtmlExtractor()
+    for delta in split_deltas(output):
+        extractor.feed(delta)
+    assert extractor.result() == legacy_extract_html_content(output)
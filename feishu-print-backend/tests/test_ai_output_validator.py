@@ -0,0 +1,72 @@
+import uuid
+import pytest
+from app.config import settings
+from app.models.ai_generation import AiGenerationCache
+from app.routers.ai import DEFAULT_MODE, MAX_RETRY_ATTEMPTS
+from app.services.ai_generation_cache import generation_cache_key
+from app.services.ai_output_validator import StreamingOutputValidator, validate_generated_html
+
+CLEAN = '<div id="template-root">' + "<p>{{姓名}}</p>" * 40 + "</div>"
+FLEX = '<div id="template-root" style="display: flex;">' + "<p>{{姓名}}</p>" * 40 + "</div>"
+
+
+def _generate(client, user, description="请假单"):
+    return client.post("/api/ai/generate-template-stream", json={
+        "description": description, "feishu_user_id": user.feishu_user_id,
+    })
+
+
+def test_rule_split_across_deltas_is_detected_once():
+    validator = StreamingOutputValidator()
+    assert validator.feed('<div style="disp') is None
+    assert validator.feed("lay :  fl") is None
+    rule = validator.feed("ex; color: red")
+    assert rule is not None and rule.name == "flex"
+    # 已命中的规则和保留区内的旧匹配不再重复报告
+    assert validator.feed('"><p>display: flex</p>') is None
+    assert [rule.name for rule in validator.violations] == ["flex"]
+    assert validator.received == len('<div style="display :  flex; color: red"><p>display: flex</p>')
+
+
+@pytest.mark.parametrize("html, rule", [
+    ("", "empty"),
+    ("<div>短</div>", "too_short"),
+    ("<p>" + "没有容器" * 100 + "</p>", "missing_div"),
+    (CLEAN, None),
+])
+def test_final_validation(html, rule):
+    assert validate_generated_html(html)[2] == rule
+
+
+def test_violation_aborts_and_retries_with_hint(client, user, membership, completions):
+    completions.outputs = [FLEX, CLEAN]
+    response = _generate(client, user, f"请假单 {uuid.uuid4().hex[:8]}")
+
+    assert '"type": "retry"' in response.text
+    assert "display: flex" in response.text
+    assert response.text.endswith("data: [DONE]\n\n")
+    # 第一次尝试读到违规内容即中断，第二次带上纠正提示
+    assert completions.streams[0]._parts
+    assert "【纠正】" not in completions.prompts[0]
+    assert "【纠正】" in completions.prompts[1] and "display: flex" in completions.prompts[1]
+
+
+def test_last_attempt_is_kept_but_not_cached(client, db, user, membership, completions):
+    completions.outputs = [FLEX] * (MAX_RETRY_ATTEMPTS + 1)
+    description = f"请假单 {uuid.uuid4().hex[:8]}"
+    response = _generate(client, user, description)
+
+    # 最后一次尝试不再中断，结果照常下发，但不写入生成缓存
+    assert completions.calls == MAX_RETRY_ATTEMPTS + 1
+    assert completions.streams[-1]._parts == []
+    assert "[DONE]" in response.text
+    key = generation_cache_key(description, DEFAULT_MODE, [], settings.ai_model)
+    assert db.get(AiGenerationCache, key) is None
+
+
+def test_validation_can_be_disabled(client, user, membership, completions, monkeypatch):
+    monkeypatch.setattr(settings, "ai_stream_validation_enabled", False)
+    completions.outputs = [FLEX]
+    response = _generate(client, user, f"请假单 {uuid.uuid4().hex[:8]}")
+    assert '"type": "retry"' not in response.text
+    assert completions.calls == 1
@@ -0,0 +1,68 @@
+import app.routers.ai as ai
+from app.config import settings
+from app.services.ai_admission import AiAdmissionController
+
+
+def _generate(client, user):
+    return client.post("/api/ai/generate-template-stream", json={
+        "description": "请假单", "feishu_user_id": user.feishu_user_id, "useCache": False,
+    })
+
+
+def _used(db, membership):
+    db.refresh(membership)
+    return membership.ai_generates_used, membership.ai_generates_total
+
+
+def test_queue_timeout_does_not_charge(client, db, user, membership, completions, monkeypatch):
+    # 唯一的并发名额被占用，请求排队直到超时
+    admission = AiAdmissionController(1, 10, {})
+    busy = admission.enqueue("pro")
+    monkeypatch.setattr(ai, "ai_admission", admission)
+    monkeypatch.setattr(ai, "QUEUE_STATUS_INTERVAL", 0.01)
+    monkeypatch.setattr(settings, "ai_queue_timeout_seconds", 0.03)
+
+    response = _generate(client, user)
+    assert response.status_code == 200
+    assert '"type": "queued"' in response.text
+    assert "排队超时" in response.text
+    assert completions.calls == 0
+    assert _used(db, membership) == (0, 0)
+    assert admission.queued == 0
+    admission.release(busy)
+
+
+def test_granted_generation_charges_once(client, db, user, membership, completions, monkeypatch):
+    monkeypatch.setattr(ai, "ai_admission", AiAdmissionController(1, 10, {}))
+
+    response = _generate(client, user)
+    assert response.status_code == 200
+    assert "[DONE]" in response.text
+    assert completions.calls == 1
+    assert _used(db, membership) == (1, 1)
+
+
+def test_grant_during_timeout_event_does_not_start_generation(client, db, user, membership, completions, monkeypatch):
+    admission = AiAdmissionController(1, 10, {})
+    busy = admission.enqueue("pro")
+    monkeypatch.setattr(ai, "ai_admission", admission)
+    monkeypatch.setattr(ai, "QUEUE_STATUS_INTERVAL", 0.01)
+    monkeypatch.setattr(settings, "ai_queue_timeout_seconds", 0.03)
+
+    # 名额恰好在排队超时事件下发期间空出来
+    wait_for_admission = ai.wait_for_admission
+
+    async def wait_and_free_slot(ticket):
+        async for event in wait_for_admission(ticket):
+            if "排队超时" in event:
+                admission.release(busy)
+            yield event
+
+    monkeypatch.setattr(ai, "wait_for_admission", wait_and_free_slot)
+
+    response = _generate(client, user)
+    assert "排队超时" in response.text
+    assert "[DONE]" not in response.text
+    assert completions.calls == 0
+    assert _used(db, membership) == (0, 0)
+    assert admission.active == 0 and admission.queued == 0
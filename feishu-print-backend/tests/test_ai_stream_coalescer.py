@@ -0,0 +1,77 @@
+import asyncio
+import time
+from app.services.ai_stream_coalescer import DeltaCoalescer, read_with_flush_deadline
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_first_delta_is_sent_immediately_then_coalesced_by_time():
+    clock = FakeClock()
+    coalescer = DeltaCoalescer(80, 2048, clock=clock)
+    assert coalescer.push("<div") == "<div"
+    clock.now = 0.02
+    assert coalescer.push(" id=") is None
+    clock.now = 0.05
+    assert coalescer.push('"a">') is None
+    assert coalescer.time_until_flush() == 0.08 - 0.05
+    clock.now = 0.09
+    assert coalescer.push("x") == ' id="a">x'
+    assert coalescer.time_until_flush() is None
+    assert coalescer.frames == 2
+
+
+def test_coalesced_by_bytes():
+    coalescer = DeltaCoalescer(10_000, 8, clock=FakeClock())
+    coalescer.push("a")
+    assert coalescer.push("中文") is None  # 6 字节
+    assert coalescer.push("bb") == "中文bb"
+
+
+def test_zero_disables_coalescing():
+    coalescer = DeltaCoalescer(0, 2048, clock=FakeClock())
+    assert [coalescer.push(delta) for delta in ("a", "b", "c")] == ["a", "b", "c"]
+    assert coalescer.flush() is None
+
+
+class StalledStream:
+    """先快速输出两个增量，然后停顿 stall 秒再输出最后一个"""
+
+    def __init__(self, stall: float):
+        self._items = [(0, "a"), (0, "b"), (stall, "c")]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._items:
+            raise StopAsyncIteration
+        delay, delta = self._items.pop(0)
+        await asyncio.sleep(delay)
+        return delta
+
+
+def test_stalled_upstream_flushes_on_deadline():
+    async def run():
+        coalescer = DeltaCoalescer(50, 2048)
+        started = time.monotonic()
+        frames = []
+        async for chunk in read_with_flush_deadline(StalledStream(0.5), coalescer):
+            pending = coalescer.flush() if chunk is None else coalescer.push(chunk)
+            if pending:
+                frames.append((pending, time.monotonic() - started))
+        pending = coalescer.flush()
+        if pending:
+            frames.append((pending, time.monotonic() - started))
+        return frames
+
+    frames = asyncio.run(run())
+    assert [text for text, _ in frames] == ["a", "b", "c"]
+    # "b" 在停顿期间按时下发，不等到 "c" 到达
+    assert frames[1][1] < 0.3
+    assert frames[2][1] >= 0.5
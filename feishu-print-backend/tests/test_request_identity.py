@@ -0,0 +1,70 @@
+import re
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from app.auth import create_access_token
+from app.database import engine
+from app.models.user import Membership, Order
+from app.routers.user import PLAN_LIMITS
+
+_USERS_TABLE_RE = re.compile(r"\bFROM users\b|\bJOIN users\b", re.IGNORECASE)
+
+
+@contextmanager
+def count_user_lookups():
+    """统计期间查询 users 表的 SQL 条数"""
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        if _USERS_TABLE_RE.search(statement):
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_execute)
+
+
+@pytest.fixture
+def exhausted_membership(db, user):
+    limit = PLAN_LIMITS["free"]["ai_generates"]
+    db.add(Membership(user_id=user.id, plan_type="free", ai_generates_used=limit, ai_generates_total=limit))
+    db.commit()
+
+
+def test_ai_generate_uses_token_claims(client, user, headers, exhausted_membership):
+    body = {"description": "请假单", "feishu_user_id": user.feishu_user_id, "useCache": False}
+    with count_user_lookups() as lookups:
+        response = client.post("/api/ai/generate-template-stream", json=body, headers=headers)
+    assert response.status_code == 403
+    assert "次数已用完" in response.json()["detail"]
+    assert lookups == []
+
+    # 没有 token（旧插件）时回退到按 feishu_user_id 查库
+    with count_user_lookups() as lookups:
+        response = client.post("/api/ai/generate-template-stream", json=body)
+    assert response.status_code == 403
+    assert len(lookups) == 1
+
+
+def test_orders_use_token_claims(client, db, user, headers):
+    order_no = f"T{user.id:08d}"
+    params = {"feishu_user_id": user.feishu_user_id}
+    db.add(Order(order_no=order_no, user_id=user.id, plan_type="pro", plan_name="专业版", amount=2900, status="PENDING"))
+    db.commit()
+
+    with count_user_lookups() as lookups:
+        response = client.get("/api/payment/orders", params=params, headers=headers)
+    assert response.status_code == 200
+    assert [order["order_no"] for order in response.json()["orders"]] == [order_no]
+    assert lookups == []
+
+
+def test_token_for_another_user_falls_back_to_lookup(client, user, headers):
+    other = create_access_token({"sub": "someone-else", "user_id": user.id + 10_000, "role": "user"})
+    params = {"feishu_user_id": user.feishu_user_id}
+    with count_user_lookups() as lookups:
+        response = client.get("/api/payment/orders", params=params, headers={"Authorization": f"Bearer {other}"})
+    assert response.status_code == 200
+    assert len(lookups) == 1
@@ -0,0 +1,84 @@
+import uuid
+import pytest
+from app.auth import create_access_token
+from app.models.template import Template as TemplateModel
+from app.services import system_template_cache as cache_module
+from app.services.system_template_cache import SystemTemplateCache, bump_system_templates_version
+
+CONTENT = '<div id="template-root"><p>{{姓名}}</p></div>'
+
+
+@pytest.fixture
+def admin_headers():
+    token = create_access_token({"sub": "admin", "role": "admin"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _add_system_template(db) -> int:
+    template = TemplateModel(name=f"系统模板-{uuid.uuid4().hex[:8]}", content=CONTENT, is_system=True)
+    db.add(template)
+    db.commit()
+    return template.id
+
+
+def _system_ids(client):
+    response = client.get("/api/templates/summary")
+    assert response.status_code == 200
+    return {item["id"] for item in response.json()}
+
+
+def test_cache_reloads_only_after_version_bump(db, sql_statements, monkeypatch):
+    cache = SystemTemplateCache()
+    first = {entry.id for entry in cache.get(db)}
+
+    # 检查间隔内不访问数据库
+    sql_statements.clear()
+    cache.get(db)
+    assert sql_statements == []
+
+    # 版本号未变化：只查询版本号，不重建
+    template_id = _add_system_template(db)
+    monkeypatch.setattr(cache_module, "VERSION_CHECK_INTERVAL", 0)
+    sql_statements.clear()
+    assert {entry.id for entry in cache.get(db)} == first
+    assert len(sql_statements) == 1
+
+    bump_system_templates_version(db)
+    db.commit()
+    assert template_id in {entry.id for entry in cache.get(db)}
+
+
+def test_cache_expires_without_version_bump(db, monkeypatch):
+    cache = SystemTemplateCache()
+    cache.get(db)
+    template_id = _add_system_template(db)
+    monkeypatch.setattr(cache_module, "VERSION_CHECK_INTERVAL", 0)
+    monkeypatch.setattr(cache_module, "MAX_CACHE_AGE", 0)
+    assert template_id in {entry.id for entry in cache.get(db)}
+
+
+def test_cached_entries_match_database_rows(client, db):
+    template_id = _add_system_template(db)
+    cache_module.system_template_cache.invalidate()
+    cached = client.get("/api/templates/", params={"template_type": "normal"}).json()
+    cached_template = next(item for item in cached if item["id"] == template_id)
+    response = client.get(f"/api/templates/{template_id}")
+    assert cached_template == response.json()
+
+
+def test_admin_writes_invalidate_cache(client, db, admin_headers):
+    _system_ids(client)  # 预热
+    template_id = _add_system_template(db)
+    assert template_id not in _system_ids(client)
+
+    response = client.post("/api/admin/templates/system-cache/refresh", headers=admin_headers)
+    assert response.status_code == 200
+    assert template_id in _system_ids(client)
+
+    name = f"导入-{uuid.uuid4().hex[:8]}"
+    response = client.post("/api/admin/templates/batch", json={
+        "templates": [{"name": name, "content": CONTENT}],
+    }, headers=admin_headers)
+    assert response.status_code == 200
+    imported_id = response.json()["results"][0]["id"]
+    assert imported_id in _system_ids(client)
@@ -0,0 +1,114 @@
+import uuid
+from types import SimpleNamespace
+import pytest
+from app.auth import create_access_token
+from app.models.team import Team, TeamMember, TeamRole
+from app.models.user import User
+from app.services.template_access import TemplateAccessCache
+
+CONTENT = '<div id="template-root"><p>{{姓名}}</p></div>'
+
+
+@pytest.fixture
+def teammate(db):
+    other = User(feishu_user_id=f"test-{uuid.uuid4().hex[:12]}")
+    db.add(other)
+    db.commit()
+    token = create_access_token({"sub": other.feishu_user_id, "user_id": other.id, "role": "user"})
+    return SimpleNamespace(id=other.id, headers={"Authorization": f"Bearer {token}"})
+
+
+@pytest.fixture
+def team(db, user, teammate):
+    team = Team(name="测试团队", owner_id=user.id)
+    db.add(team)
+    db.flush()
+    owner = TeamMember(team_id=team.id, user_id=user.id, role=TeamRole.OWNER)
+    member = TeamMember(team_id=team.id, user_id=teammate.id, role=TeamRole.MEMBER)
+    db.add_all([owner, member])
+    db.commit()
+    return SimpleNamespace(id=team.id, member_id=member.id, owner_feishu_id=user.feishu_user_id)
+
+
+def _create(client, headers):
+    response = client.post("/api/templates/", json={"name": "共享模板", "content": CONTENT}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _share(client, headers, team, template_id):
+    response = client.post(
+        f"/api/team/{team.id}/templates/share", params={"feishu_user_id": team.owner_feishu_id},
+        json={"template_id": template_id}, headers=headers,
+    )
+    assert response.status_code == 200, response.text
+
+
+def _team_lookups(statements):
+    return [statement for statement in statements if "team_templates" in statement]
+
+
+def test_access_is_resolved_in_one_query_then_cached(client, headers, teammate, team, sql_statements):
+    template_id = _create(client, headers)
+    _share(client, headers, team, template_id)
+
+    sql_statements.clear()
+    response = client.get(f"/api/templates/{template_id}", headers=teammate.headers)
+    assert response.status_code == 200
+    lookups = _team_lookups(sql_statements)
+    assert len(lookups) == 1 and "FROM templates" in lookups[0]
+
+    sql_statements.clear()
+    response = client.get(f"/api/templates/{template_id}/content", headers=teammate.headers)
+    assert response.status_code == 200
+    assert _team_lookups(sql_statements) == []
+
+
+def test_share_and_unshare_invalidate_cached_access(client, db, headers, teammate, team):
+    template_id = _create(client, headers)
+    url = f"/api/templates/{template_id}"
+    assert client.get(url, headers=teammate.headers).status_code == 403
+
+    _share(client, headers, team, template_id)
+    assert client.get(url, headers=teammate.headers).status_code == 200
+
+    shared = client.get(
+        f"/api/team/{team.id}/templates", params={"feishu_user_id": team.owner_feishu_id}, headers=headers
+    ).json()
+    response = client.delete(
+        f"/api/team/{team.id}/templates/{shared[0]['id']}",
+        params={"feishu_user_id": team.owner_feishu_id}, headers=headers,
+    )
+    assert response.status_code == 200
+    assert client.get(url, headers=teammate.headers).status_code == 403
+
+
+def test_removed_member_loses_access(client, headers, teammate, team):
+    template_id = _create(client, headers)
+    _share(client, headers, team, template_id)
+    url = f"/api/templates/{template_id}"
+    assert client.get(url, headers=teammate.headers).status_code == 200
+
+    response = client.delete(
+        f"/api/team/{team.id}/members/{team.member_id}",
+        params={"feishu_user_id": team.owner_feishu_id}, headers=headers,
+    )
+    assert response.status_code == 200
+    assert client.get(url, headers=teammate.headers).status_code == 403
+
+
+def test_access_cache_expires_and_evicts():
+    cache = TemplateAccessCache(ttl=30, max_users=2)
+    cache.remember(1, 10, None)
+    cache.remember(2, 10, True)
+    assert cache.lookup(1, 10) == (True, None)
+    assert cache.lookup(1, 11) == (False, None)
+
+    # 超出用户数时淘汰最久未使用的用户（用户 1 刚被访问过）
+    cache.remember(3, 10, False)
+    assert cache.lookup(2, 10) == (False, None)
+    assert cache.lookup(1, 10) == (True, None)
+
+    expired = TemplateAccessCache(ttl=0)
+    expired.remember(1, 10, True)
+    assert expired.lookup(1, 10) == (False, None)
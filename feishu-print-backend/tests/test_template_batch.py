@@ -0,0 +1,42 @@
+from app.models.template import Template as TemplateModel
+from app.schemas.template import TemplateBatchItemResult, TemplateCreate
+from app.services.template_batch import _insert_rows, _row_values
+from app.services.template_blobs import acquire_blobs
+from app.services.template_names import name_key
+
+CONTENT = '<div id="template-root"><p>内容</p></div>'
+
+
+def test_batch_reports_case_insensitive_duplicates_per_item(client, headers):
+    response = client.post("/api/templates/batch", json={
+        "templates": [
+            {"name": "报销单", "content": CONTENT},
+            {"name": "Invoice", "content": CONTENT},
+            {"name": "invoice", "content": CONTENT},
+            {"name": "INVOICE ", "content": CONTENT},
+        ],
+    }, headers=headers)
+    assert response.status_code == 200
+    statuses = [result["status"] for result in response.json()["results"]]
+    assert statuses == ["created", "created", "error", "error"]
+
+
+def test_insert_conflict_falls_back_to_per_item_errors(db, user):
+    # 模拟排序规则认为相同、批内检查未识别出的名称：库中已有同名模板时逐条写入，只有冲突的条目报错
+    db.add(TemplateModel(name="已存在", content=CONTENT, owner_id=user.id))
+    db.commit()
+
+    items = [TemplateCreate(name="新模板", content=CONTENT), TemplateCreate(name="已存在", content=CONTENT)]
+    rows = [_row_values(item, user.id, False) for item in items]
+    for row, blob_hash in zip(rows, acquire_blobs(db, [item.content for item in items])):
+        row["blob_hash"] = blob_hash
+    first_index = {name_key(item.name): index for index, item in enumerate(items)}
+    results = [None, None]
+
+    inserted = _insert_rows(db, rows, first_index, results)
+    db.commit()
+
+    assert [row["name"] for row in inserted] == ["新模板"]
+    assert results[0] is None
+    assert isinstance(results[1], TemplateBatchItemResult) and results[1].status == "error"
+    assert db.query(TemplateModel).filter(TemplateModel.owner_id == user.id).count() == 2
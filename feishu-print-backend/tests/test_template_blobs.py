@@ -0,0 +1,64 @@
+import uuid
+from app.models.template import Template as TemplateModel
+from app.models.template_blob import TemplateBlob
+from app.services.template_blobs import acquire_blobs, content_digest, release_blobs
+from app.services.template_content import CONTENT_ENCODING_BLOB
+
+
+def _html(text: str) -> str:
+    return f'<div id="template-root"><p>{text}</p></div>'
+
+
+def _create(client, headers, name, html):
+    response = client.post("/api/templates/", json={"name": name, "content": html}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _blob(db, blob_hash):
+    db.expire_all()
+    return db.get(TemplateBlob, blob_hash)
+
+
+def test_identical_bodies_share_one_blob(client, db, headers):
+    html = _html(f"共用正文-{uuid.uuid4().hex}")
+    first = _create(client, headers, "共用甲", html)
+    second = _create(client, headers, "共用乙", html)
+
+    rows = [db.get(TemplateModel, template_id) for template_id in (first, second)]
+    assert {row.content_encoding for row in rows} == {CONTENT_ENCODING_BLOB}
+    assert rows[0].blob_hash == rows[1].blob_hash == content_digest(rows[0].content)
+    blob_hash = rows[0].blob_hash
+    assert _blob(db, blob_hash).ref_count == 2
+
+    # 改用其他正文时释放引用，最后一个引用释放后删除正文
+    client.put(f"/api/templates/{first}", json={"content": _html(f"新正文-{uuid.uuid4().hex}")}, headers=headers)
+    assert _blob(db, blob_hash).ref_count == 1
+    client.put(f"/api/templates/{second}", json={"content": _html(f"新正文-{uuid.uuid4().hex}")}, headers=headers)
+    assert _blob(db, blob_hash) is None
+
+    response = client.get(f"/api/templates/{second}", headers=headers)
+    assert "新正文" in response.json()["content"]
+
+
+def test_batch_acquire_counts_duplicates(db):
+    existing, fresh = _html(f"已有-{uuid.uuid4().hex}"), _html(f"新的-{uuid.uuid4().hex}")
+    [existing_hash] = acquire_blobs(db, [existing])
+    db.commit()
+
+    hashes = acquire_blobs(db, [fresh, existing, fresh])
+    db.commit()
+    assert hashes == [content_digest(fresh), existing_hash, content_digest(fresh)]
+    assert _blob(db, existing_hash).ref_count == 2
+    assert _blob(db, hashes[0]).ref_count == 2
+    assert _blob(db, hashes[0]).size == len(fresh.encode("utf-8"))
+
+
+def test_referenced_blob_is_not_deleted(client, db, headers):
+    # 计数偏小（例如直接改库）时，仍有模板引用的正文不会被删除
+    template_id = _create(client, headers, "仍被引用", _html(f"引用-{uuid.uuid4().hex}"))
+    blob_hash = db.get(TemplateModel, template_id).blob_hash
+    release_blobs(db, [blob_hash])
+    db.commit()
+    blob = _blob(db, blob_hash)
+    assert blob is not None and blob.ref_count == 0
@@ -0,0 +1,94 @@
+import uuid
+import pytest
+from app.auth import create_access_token
+from app.models.user import User
+from app.services import template_changes
+
+CONTENT = '<div id="template-root"><p>{{姓名}}</p></div>'
+
+
+@pytest.fixture
+def settled(monkeypatch):
+    # 变更立即沉淀，游标可以越过刚写入的记录
+    monkeypatch.setattr(template_changes, "CHANGE_SETTLE_SECONDS", 0)
+
+
+def _create(client, headers, name):
+    response = client.post("/api/templates/", json={"name": name, "content": CONTENT}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _cursor(client, headers):
+    response = client.get("/api/templates/changes", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["changes"] == []
+    return response.json()["cursor"]
+
+
+def _changes(client, headers, since, **params):
+    response = client.get("/api/templates/changes", params={"since": since, **params}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _summary(body):
+    return [(change["template_id"], change["action"]) for change in body["changes"]]
+
+
+def test_changes_since_cursor(client, headers, settled):
+    cursor = _cursor(client, headers)
+    kept = _create(client, headers, "同步甲")
+    deleted = _create(client, headers, "同步乙")
+    client.put(f"/api/templates/{kept}", json={"name": "同步甲-改名"}, headers=headers)
+    client.delete(f"/api/templates/{deleted}", headers=headers)
+
+    # 同一模板多次变更只返回最后一次，删除的以墓碑返回
+    body = _changes(client, headers, cursor)
+    assert _summary(body) == [(kept, "upsert"), (deleted, "delete")]
+    assert body["changes"][0]["template"]["name"] == "同步甲-改名"
+    assert body["changes"][1]["template"] is None
+    assert body["has_more"] is False
+
+    assert _changes(client, headers, body["cursor"])["changes"] == []
+
+
+def test_cursor_does_not_pass_unsettled_changes(client, headers):
+    cursor = _cursor(client, headers)
+    template_id = _create(client, headers, "沉淀期")
+
+    # 沉淀期内的记录照常返回，但游标不越过它们，下次同步再次返回
+    body = _changes(client, headers, cursor)
+    assert _summary(body) == [(template_id, "upsert")]
+    assert body["cursor"] == cursor
+    assert _summary(_changes(client, headers, body["cursor"])) == [(template_id, "upsert")]
+
+
+def test_changes_are_paged(client, headers, settled):
+    cursor = _cursor(client, headers)
+    ids = [_create(client, headers, f"分页同步-{i}") for i in range(3)]
+
+    first = _changes(client, headers, cursor, limit=2)
+    assert _summary(first) == [(ids[0], "upsert"), (ids[1], "upsert")]
+    assert first["has_more"] is True
+    second = _changes(client, headers, first["cursor"], limit=2)
+    assert _summary(second) == [(ids[2], "upsert")]
+    assert second["has_more"] is False
+
+
+def test_other_users_changes_are_not_visible(client, db, headers, settled):
+    other = User(feishu_user_id=f"test-{uuid.uuid4().hex[:12]}")
+    db.add(other)
+    db.commit()
+    token = create_access_token({"sub": other.feishu_user_id, "user_id": other.id, "role": "user"})
+    other_headers = {"Authorization": f"Bearer {token}"}
+
+    cursor = _cursor(client, headers)
+    _create(client, other_headers, "别人的模板")
+    mine = _create(client, headers, "我的模板")
+    assert _summary(_changes(client, headers, cursor)) == [(mine, "upsert")]
+
+
+def test_invalid_since_is_rejected(client, headers):
+    response = client.get("/api/templates/changes", params={"since": "bogus"}, headers=headers)
+    assert response.status_code == 400
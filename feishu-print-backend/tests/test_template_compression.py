@@ -0,0 +1,93 @@
+import gzip
+import pytest
+from app.config import settings
+from app.models.template import Template as TemplateModel
+from app.services.template_content import (
+    CONTENT_ENCODING_GZIP, accepts_gzip, decode_content, encode_content
+)
+
+SMALL = '<div id="template-root"><p>{{姓名}}</p></div>'
+LARGE = '<div id="template-root">' + "".join(
+    f'<p style="margin: 0; font-size: 14px;">第{i}行 {{{{字段{i}}}}}</p>' for i in range(200)
+) + "</div>"
+
+
+def test_encode_content():
+    assert encode_content(SMALL) == (SMALL, None, None)
+
+    content, content_gz, content_encoding = encode_content(LARGE)
+    assert (content, content_encoding) == ("", CONTENT_ENCODING_GZIP)
+    assert len(content_gz) < len(LARGE.encode("utf-8")) / 4
+    # 相同正文得到相同字节
+    assert encode_content(LARGE)[1] == content_gz
+    assert decode_content(content, content_gz, content_encoding) == LARGE
+    assert decode_content(SMALL, None, None) == SMALL
+
+
+def test_compression_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "template_content_compression", "none")
+    assert encode_content(LARGE) == (LARGE, None, None)
+
+
+def test_gzip_rows_decode_lazily(db, user):
+    template = TemplateModel(name="压缩", content=LARGE, owner_id=user.id)
+    assert template.content_encoding == CONTENT_ENCODING_GZIP
+    db.add(template)
+    db.commit()
+
+    db.expire_all()
+    stored = db.get(TemplateModel, template.id)
+    assert "_decoded_content" not in stored.__dict__
+    assert stored.content == LARGE
+    assert stored.__dict__["_decoded_content"] == LARGE
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("gzip, deflate, br", True),
+    ("br;q=1.0, gzip;q=0.5", True),
+    ("gzip;q=0", False),
+    ("*", True),
+    ("identity", False),
+])
+def test_accepts_gzip(header, expected):
+    assert accepts_gzip(header) == expected
+
+
+def test_content_endpoint_serves_stored_gzip(client, headers):
+    response = client.post("/api/templates/", json={"name": "大模板", "content": LARGE}, headers=headers)
+    assert response.status_code == 200
+    template = response.json()
+    url = f"/api/templates/{template['id']}/content"
+
+    response = client.get(url, headers={**headers, "Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.text == template["content"]
+    gzip_etag = response.headers["ETag"]
+    assert gzip_etag.endswith('-gzip"')
+
+    response = client.get(url, headers={**headers, "Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+    assert response.text == template["content"]
+    assert response.headers["ETag"] != gzip_etag
+
+    # 两种 ETag 都能命中 304
+    for etag in (gzip_etag, response.headers["ETag"]):
+        response = client.get(url, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 304
+
+
+def test_gzip_response_is_stored_bytes(client, db, headers):
+    response = client.post("/api/templates/", json={"name": "大模板", "content": LARGE}, headers=headers)
+    template_id = response.json()["id"]
+    url = f"/api/templates/{template_id}/content"
+    with client.stream("GET", url, headers={**headers, "Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+
+    # 下发库中的压缩字节，不在请求时重新压缩
+    blob = db.get(TemplateModel, template_id)._load_blob()
+    assert blob.content_encoding == CONTENT_ENCODING_GZIP
+    assert raw == blob.content_gz
+    assert gzip.decompress(raw).decode("utf-8") == blob.content
@@ -0,0 +1,71 @@
+import re
+from app.models.template import Template as TemplateModel
+from app.services.template_content import compute_content_hash, make_etag
+
+CONTENT = '<div id="template-root"><p>{{姓名}}</p></div>'
+_BODY_COLUMN_RE = re.compile(r"templates\.(content|content_gz)\b")
+
+
+def _create(client, headers, name):
+    response = client.post("/api/templates/", json={"name": name, "content": CONTENT}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_template_revalidation(client, headers, sql_statements):
+    template = _create(client, headers, "缓存验证")
+    url = f"/api/templates/{template['id']}"
+
+    response = client.get(url, headers=headers)
+    etag = response.headers["ETag"]
+    assert etag == make_etag(compute_content_hash(template["name"], template["content"], "normal"))
+    assert response.headers["Cache-Control"] == "no-cache"
+
+    # 命中 304 时不读取正文；弱比较和多个候选值都能命中
+    sql_statements.clear()
+    for if_none_match in (etag, f"W/{etag}", f'"stale", {etag}', "*"):
+        response = client.get(url, headers={**headers, "If-None-Match": if_none_match})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert response.content == b""
+    assert not [statement for statement in sql_statements if _BODY_COLUMN_RE.search(statement)]
+
+    response = client.put(url, json={"content": CONTENT.replace("姓名", "部门")}, headers=headers)
+    assert response.status_code == 200
+    response = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_list_revalidation(client, headers):
+    template = _create(client, headers, "列表缓存甲")
+    params = {"owner": "me"}
+    response = client.get("/api/templates/", params=params, headers=headers)
+    etag = response.headers["ETag"]
+
+    response = client.get("/api/templates/", params=params, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    # 列表中任一模板的内容变化、新增模板或换用摘要视图都会改变列表 ETag
+    client.put(f"/api/templates/{template['id']}", json={"name": "列表缓存乙"}, headers=headers)
+    response = client.get("/api/templates/", params=params, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    renamed_etag = response.headers["ETag"]
+    _create(client, headers, "列表缓存丙")
+    response = client.get("/api/templates/", params=params, headers={**headers, "If-None-Match": renamed_etag})
+    assert response.status_code == 200
+    response = client.get("/api/templates/summary", params=params, headers={**headers, "If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 200
+
+
+def test_missing_content_hash_is_backfilled(client, db, headers):
+    template = _create(client, headers, "旧数据")
+    db.query(TemplateModel).filter(TemplateModel.id == template["id"]).update({TemplateModel.content_hash: None})
+    db.commit()
+
+    response = client.get(f"/api/templates/{template['id']}", headers=headers)
+    assert response.status_code == 200
+    db.expire_all()
+    content_hash = db.get(TemplateModel, template["id"]).content_hash
+    assert response.headers["ETag"] == make_etag(content_hash)
+    assert content_hash == compute_content_hash(template["name"], template["content"], "normal")
@@ -0,0 +1,70 @@
+from app.models.template_field import TemplateField
+
+FIELD = '<span class="template-field" data-fieldname="{name}">{{${name}}}</span>'
+
+
+def _html(*names: str) -> str:
+    return '<div id="template-root">' + "".join(f"<p>{FIELD.format(name=name)}</p>" for name in names) + "</div>"
+
+
+def _create(client, headers, name, *fields):
+    response = client.post("/api/templates/", json={"name": name, "content": _html(*fields)}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _indexed(db, template_id):
+    rows = db.query(TemplateField).filter(TemplateField.template_id == template_id).order_by(TemplateField.position)
+    return [row.field_name for row in rows]
+
+
+def _match(client, headers, fields, **extra):
+    response = client.post("/api/templates/match-fields", json={"fields": fields, **extra}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_fields_are_indexed_on_write(client, db, headers):
+    template_id = _create(client, headers, "字段索引", "姓名", "部门", "姓名")
+    assert _indexed(db, template_id) == ["姓名", "部门"]
+
+    client.put(f"/api/templates/{template_id}", json={"content": _html("工号")}, headers=headers)
+    db.expire_all()
+    assert _indexed(db, template_id) == ["工号"]
+
+    # 只改名称时不重建
+    client.put(f"/api/templates/{template_id}", json={"name": "字段索引-改名"}, headers=headers)
+    assert _indexed(db, template_id) == ["工号"]
+
+
+def test_batch_insert_indexes_fields(client, db, headers):
+    response = client.post("/api/templates/batch", json={
+        "templates": [{"name": "批量字段甲", "content": _html("金额")}, {"name": "批量字段乙", "content": _html("日期", "金额")}],
+    }, headers=headers)
+    ids = [result["id"] for result in response.json()["results"]]
+    assert [_indexed(db, template_id) for template_id in ids] == [["金额"], ["日期", "金额"]]
+
+
+def test_match_ranks_by_overlap_then_coverage(client, headers):
+    unique = "匹配测试"
+    full = _create(client, headers, "完全匹配", f"{unique}甲", f"{unique}乙")
+    partial = _create(client, headers, "部分匹配", f"{unique}甲", f"{unique}乙", "其他字段")
+    single = _create(client, headers, "单字段", f"{unique}甲")
+    _create(client, headers, "无关", "不相关")
+
+    matches = _match(client, headers, [f"{unique}甲", f"{unique}乙", "", f"{unique}甲"])
+    assert [match["template"]["id"] for match in matches] == [full, partial, single]
+    assert matches[0]["matched_fields"] == [f"{unique}甲", f"{unique}乙"]
+    assert matches[0]["coverage"] == 1.0
+    assert matches[1]["field_count"] == 3 and matches[1]["coverage"] == round(2 / 3, 4)
+
+    assert len(_match(client, headers, [f"{unique}甲"], limit=1)) == 1
+    assert _match(client, headers, ["不存在的字段"]) == []
+
+
+def test_match_only_returns_visible_templates(client, headers):
+    template_id = _create(client, headers, "私有字段模板", "私有字段")
+    assert [match["template"]["id"] for match in _match(client, headers, ["私有字段"])] == [template_id]
+    # 未登录只能匹配系统模板
+    response = client.post("/api/templates/match-fields", json={"fields": ["私有字段"]})
+    assert response.json() == []
@@ -0,0 +1,57 @@
+import time
+import uuid
+from app.models.template import Template as TemplateModel
+from app.services import template_versions
+from app.services.template_forks import encode_fork
+from app.services.template_content import CONTENT_ENCODING_FORK
+
+
+def _system_template(rows: int) -> str:
+    body = "".join(
+        f'<tr><td style="border: 1px solid #000;">项目{i}</td>'
+        f'<td><span class="template-field" data-fieldname="f{i}">{{$f{i}}}</span></td></tr>'
+        for i in range(rows)
+    )
+    return f'<div id="template-root"><h1>系统模板</h1><table>{body}</table></div>'
+
+
+def test_small_edit_is_stored_as_fork():
+    parent = _system_template(200)
+    columns = encode_fork(parent, parent.replace("系统模板", "我的模板"))
+    assert columns is not None and columns[2] == CONTENT_ENCODING_FORK
+
+
+def test_large_rewrite_falls_back_to_full_body_quickly():
+    parent = _system_template(1000)
+    rewritten = "".join(f"<p>段落{i}：完全重写的内容</p>" for i in range(5000))
+    started = time.perf_counter()
+    assert encode_fork(parent, rewritten) is None
+    assert time.perf_counter() - started < 2.0
+
+
+def test_diff_over_limit_falls_back_to_full_body(monkeypatch):
+    monkeypatch.setattr(template_versions, "MAX_DIFF_TOKENS", 100)
+    parent = _system_template(200)
+    assert encode_fork(parent, parent.replace("系统模板", "我的模板")) is None
+
+
+def test_fork_from_unnormalized_parent_is_stored_as_fork(client, db, headers):
+    # 规范化上线前导入的系统模板：重复的 inline style 没有提升
+    html = _system_template(200)
+    parent = TemplateModel(name=f"系统模板-{uuid.uuid4().hex[:8]}", content=html, is_system=True)
+    db.add(parent)
+    db.commit()
+
+    response = client.post("/api/templates/", json={
+        "name": "我的派生模板", "content": html.replace("系统模板", "我的模板"), "parent_id": parent.id,
+    }, headers=headers)
+    assert response.status_code == 200
+    child = response.json()
+    assert child["parent_id"] == parent.id
+
+    db.expire_all()
+    stored = db.get(TemplateModel, child["id"])
+    assert stored.content_encoding == CONTENT_ENCODING_FORK
+    assert stored.content == child["content"]
+    # 父模板已就地规范化，渲染结果不变
+    assert 'style="border' not in db.get(TemplateModel, parent.id).content
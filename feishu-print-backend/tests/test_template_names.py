@@ -0,0 +1,47 @@
+from app.models.template import Template as TemplateModel
+from app.services.template_names import name_scope_key
+
+CONTENT = '<div id="template-root"><p>内容</p></div>'
+
+
+def _create(client, headers, name):
+    response = client.post("/api/templates/", json={"name": name, "content": CONTENT}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _scope(db, template_id):
+    db.expire_all()
+    return db.get(TemplateModel, template_id).name_scope
+
+
+def test_name_scope_follows_delete_and_undelete(client, db, user, headers):
+    template_id = _create(client, headers, "出库单")
+    assert _scope(db, template_id) == user.id
+
+    # 删除后不再占用名称
+    assert client.delete(f"/api/templates/{template_id}", headers=headers).status_code == 200
+    assert _scope(db, template_id) is None
+    replacement_id = _create(client, headers, "出库单")
+
+    # 恢复时重新占用名称，同名模板已存在时拒绝
+    response = client.post(f"/api/templates/{template_id}/undelete", headers=headers)
+    assert response.status_code == 400
+    assert _scope(db, template_id) is None
+
+    assert client.delete(f"/api/templates/{replacement_id}", headers=headers).status_code == 200
+    response = client.post(f"/api/templates/{template_id}/undelete", headers=headers)
+    assert response.status_code == 200
+    assert _scope(db, template_id) == user.id
+
+
+def test_batch_insert_sets_name_scope(client, db, user, headers):
+    response = client.post("/api/templates/batch", json={
+        "templates": [{"name": "批量甲", "content": CONTENT}, {"name": "批量乙", "content": CONTENT}],
+    }, headers=headers)
+    assert response.status_code == 200
+    ids = [result["id"] for result in response.json()["results"]]
+    assert [_scope(db, template_id) for template_id in ids] == [name_scope_key(user.id)] * 2
+
+    response = client.post("/api/templates/", json={"name": "批量甲", "content": CONTENT}, headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,81 @@
+import re
+import lxml.html
+import pytest
+from app.services.template_normalize import (
+    STYLE_BLOCK_ATTR, UnknownStyleClassError, expand_hoisted_classes, extract_hoisted_rules, normalize_style,
+    normalize_template_html,
+)
+
+CELL = "border: 1px solid #000; padding: 8px 12px; background-color: #f5f7fa; text-align: left;"
+
+
+def _template() -> str:
+    rows = "".join(
+        f'<tr><td style="{CELL}">项目{i}</td><td style="{CELL}">'
+        f'<span class="template-field" data-fieldname="f{i}">{{$f{i}}}</span></td></tr>'
+        for i in range(8)
+    )
+    return f'\n<div id="template-root" style="width: 210mm;"><table style="width: 100%;">{rows}</table></div>\n'
+
+
+def _root_outer_html(html: str) -> str:
+    """与插件模板库预览相同：只取 #template-root 的 outerHTML"""
+    wrapper = lxml.html.fragment_fromstring(html, create_parent="div")
+    root = wrapper.xpath("//*[@id='template-root']")[0]
+    return lxml.html.tostring(root, encoding="unicode")
+
+
+def _effective_styles(html: str) -> list:
+    """每个元素实际生效的样式（类规则展开后）"""
+    root = lxml.html.fragment_fromstring(html)
+    expand_hoisted_classes(root, extract_hoisted_rules(html))
+    return [
+        (el.tag, normalize_style(el.get("style") or ""))
+        for el in root.iter() if isinstance(el.tag, str) and el.tag != "style"
+    ]
+
+
+def test_hoisted_rules_survive_root_extraction():
+    original = _template()
+    normalized = normalize_template_html(original).html
+    assert f'style="{CELL}"' not in normalized
+
+    outer = _root_outer_html(normalized)
+    assert f"<style {STYLE_BLOCK_ATTR}" in outer
+    assert _effective_styles(outer) == _effective_styles(_root_outer_html(original))
+
+
+def test_normalization_is_idempotent():
+    normalized = normalize_template_html(_template()).html
+    assert normalize_template_html(normalized).html == normalized
+
+
+def _strip_style_block(html: str) -> str:
+    """模拟 TinyMCE：加载时丢弃正文中的 <style>，保存回来只剩类名"""
+    return re.sub(r"<style[^>]*>.*?</style>", "", html, flags=re.S)
+
+
+def test_unknown_hoisted_classes_are_rejected():
+    stripped = _strip_style_block(normalize_template_html(_template()).html)
+    with pytest.raises(UnknownStyleClassError):
+        normalize_template_html(stripped)
+
+
+def test_copy_without_style_block_restores_styles_from_source(client, headers):
+    created = client.post("/api/templates/", json={"name": "样式源", "content": _template()}, headers=headers)
+    assert created.status_code == 200
+    source = created.json()
+    assert f"<style {STYLE_BLOCK_ATTR}" in source["content"]
+    copied_body = _strip_style_block(source["content"])
+
+    # 没有来源模板时规则无从找回，拒绝保存
+    response = client.post("/api/templates/", json={"name": "样式副本", "content": copied_body}, headers=headers)
+    assert response.status_code == 400
+
+    response = client.post("/api/templates/", json={
+        "name": "样式副本", "content": copied_body, "parent_id": source["id"],
+    }, headers=headers)
+    assert response.status_code == 200
+    copy = response.json()["content"]
+    assert f"<style {STYLE_BLOCK_ATTR}" in copy
+    assert _effective_styles(_root_outer_html(copy)) == _effective_styles(_root_outer_html(_template()))
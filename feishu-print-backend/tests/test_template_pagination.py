@@ -0,0 +1,60 @@
+import pytest
+from app.routers.templates import NEXT_CURSOR_HEADER
+
+CONTENT = '<div id="template-root"><p>{{姓名}}</p></div>'
+
+
+def _create(client, headers, name):
+    response = client.post("/api/templates/", json={"name": name, "content": CONTENT}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _all_pages(client, headers, params, limit):
+    ids, cursor, pages = [], None, 0
+    while True:
+        page_params = {**params, "limit": limit}
+        if cursor:
+            page_params["cursor"] = cursor
+        response = client.get("/api/templates/summary", params=page_params, headers=headers)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= limit
+        ids += [item["id"] for item in page]
+        pages += 1
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return ids, pages
+
+
+@pytest.mark.parametrize("params", [{"owner": "me"}, {}, {"search": "分页"}])
+def test_pages_concatenate_to_full_list(client, headers, params):
+    for i in range(5):
+        _create(client, headers, f"分页-{i}")
+    full = client.get("/api/templates/summary", params=params, headers=headers)
+    assert NEXT_CURSOR_HEADER not in full.headers
+    expected = [item["id"] for item in full.json()]
+
+    ids, pages = _all_pages(client, headers, params, 2)
+    assert ids == expected
+    assert pages == max(1, -(-len(expected) // 2))
+
+
+def test_cursor_is_stable_under_inserts(client, headers):
+    first = [_create(client, headers, f"插入-{i}") for i in range(3)]
+    response = client.get("/api/templates/summary", params={"owner": "me", "limit": 2}, headers=headers)
+    cursor = response.headers[NEXT_CURSOR_HEADER]
+
+    # 翻页期间新建的模板排在末尾，不会让下一页重复或跳过
+    added = _create(client, headers, "插入-新")
+    response = client.get(
+        "/api/templates/summary", params={"owner": "me", "limit": 2, "cursor": cursor}, headers=headers
+    )
+    assert [item["id"] for item in response.json()] == [first[2], added]
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "eyJpZCI6LTF9"])
+def test_invalid_cursor_is_rejected(client, headers, cursor):
+    response = client.get("/api/templates/", params={"owner": "me", "limit": 2, "cursor": cursor}, headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "无效的分页游标"
@@ -0,0 +1,27 @@
+from app.services.template_normalize import normalize_template_html
+from app.services.template_preview import render_preview_svg
+
+CELL = "background-color: #eef2ff; text-align: center; border: 1px solid #000; padding: 6px 8px;"
+TITLE = "font-size: 24px; text-align: center; font-weight: bold;"
+
+
+def _template() -> str:
+    rows = "".join(
+        f'<tr><td style="{CELL}">项目{i}</td>'
+        f'<td style="{CELL}"><span class="template-field" data-fieldname="f{i}">{{$f{i}}}</span></td></tr>'
+        for i in range(6)
+    )
+    return (
+        f'<div id="template-root"><div style="{TITLE}">申请单</div><div style="{TITLE}">副标题</div>'
+        f'<table style="width: 100%;">{rows}</table></div>'
+    )
+
+
+def test_preview_of_normalized_template_matches_original():
+    original = _template()
+    normalized = normalize_template_html(original).html
+    assert 'style="' + CELL not in normalized  # 重复的样式已提升为类
+
+    svg = render_preview_svg(normalized)
+    assert b"#eef2ff" in svg
+    assert svg == render_preview_svg(original)
@@ -0,0 +1,94 @@
+import uuid
+from datetime import datetime, timedelta
+from app.config import settings
+from app.models.team import Team, TeamTemplate
+from app.models.template import Template as TemplateModel
+from app.models.template_blob import TemplateBlob
+from app.models.template_change import TemplateChange
+from app.models.template_field import TemplateField
+from app.models.template_stats import TemplateStats
+from app.models.template_version import TemplateVersion
+from app.services import template_purge
+from app.services.template_purge import TemplatePurger
+
+# 远早于其它用例删除模板的时间，清理时只会命中本文件的模板
+DELETED_AT = datetime(2000, 1, 1)
+
+
+def _html() -> str:
+    return f'<div id="template-root"><p>{{{{姓名}}}} {uuid.uuid4().hex}</p></div>'
+
+
+def _create(client, headers, name):
+    response = client.post("/api/templates/", json={"name": name, "content": _html()}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _delete_long_ago(client, db, headers, template_ids):
+    for template_id in template_ids:
+        assert client.delete(f"/api/templates/{template_id}", headers=headers).status_code == 200
+    db.query(TemplateModel).filter(TemplateModel.id.in_(template_ids)).update(
+        {TemplateModel.deleted_at: DELETED_AT}, synchronize_session=False
+    )
+    db.commit()
+
+
+def _after_retention(hours: int = 1) -> datetime:
+    return DELETED_AT + timedelta(hours=settings.template_purge_retention_hours + hours)
+
+
+def test_soft_delete_hides_template_until_undelete(client, db, headers):
+    template_id = _create(client, headers, "软删除")
+    assert client.delete(f"/api/templates/{template_id}", headers=headers).status_code == 200
+
+    assert client.get(f"/api/templates/{template_id}", headers=headers).status_code == 404
+    listed = client.get("/api/templates/summary", params={"owner": "me"}, headers=headers).json()
+    assert template_id not in [item["id"] for item in listed]
+    assert client.delete(f"/api/templates/{template_id}", headers=headers).status_code == 404
+    db.expire_all()
+    assert db.get(TemplateModel, template_id).deleted_at is not None
+
+    response = client.post(f"/api/templates/{template_id}/undelete", headers=headers)
+    assert response.status_code == 200
+    assert client.get(f"/api/templates/{template_id}", headers=headers).status_code == 200
+
+
+def test_purge_removes_dependents_and_keeps_tombstones(client, db, user, headers):
+    template_id = _create(client, headers, "彻底删除")
+    client.put(f"/api/templates/{template_id}", json={"content": _html()}, headers=headers)
+    blob_hash = db.get(TemplateModel, template_id).blob_hash
+    team = Team(name="清理测试团队", owner_id=user.id)
+    db.add(team)
+    db.flush()
+    db.add(TeamTemplate(team_id=team.id, template_id=template_id, shared_by_id=user.id))
+    db.add(TemplateStats(template_id=template_id, open_count=1, use_count=1))
+    db.commit()
+    _delete_long_ago(client, db, headers, [template_id])
+
+    # 保留期内不清理
+    assert TemplatePurger(0, 10, 0).run_once(now=_after_retention(-1)) == 0
+    assert TemplatePurger(0, 10, 0).run_once(now=_after_retention()) == 1
+
+    db.expire_all()
+    assert db.get(TemplateModel, template_id) is None
+    assert db.get(TemplateBlob, blob_hash) is None
+    for model in (TeamTemplate, TemplateVersion, TemplateField, TemplateStats):
+        assert db.query(model).filter(model.template_id == template_id).count() == 0
+    assert db.query(TemplateChange).filter(TemplateChange.template_id == template_id).count() > 0
+
+    response = client.post(f"/api/templates/{template_id}/undelete", headers=headers)
+    assert response.status_code == 404
+
+
+def test_purge_runs_in_paused_batches(client, db, headers, monkeypatch):
+    template_ids = [_create(client, headers, f"分批删除-{i}") for i in range(5)]
+    _delete_long_ago(client, db, headers, template_ids)
+    pauses = []
+    monkeypatch.setattr(template_purge.time, "sleep", pauses.append)
+
+    assert TemplatePurger(0, 2, 0.5).run_once(now=_after_retention()) == 5
+    # 5 个模板分 3 批，批与批之间暂停
+    assert pauses == [0.5, 0.5]
+    db.expire_all()
+    assert db.query(TemplateModel).filter(TemplateModel.id.in_(template_ids)).count() == 0
@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+import pytest
+from sqlalchemy.dialects import mysql
+from app.routers.templates import _search_expressions
+from app.services.template_text import build_search_text
+
+FIELD = '<span class="template-field" data-fieldname="{name}">{{${name}}}</span>'
+
+
+def _html(body: str) -> str:
+    return f'<div id="template-root">{body}</div>'
+
+
+def _create(client, headers, name, body):
+    response = client.post("/api/templates/", json={"name": name, "content": _html(body)}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _search(client, headers, keyword):
+    response = client.get("/api/templates/summary", params={"search": keyword}, headers=headers)
+    assert response.status_code == 200
+    return [item["id"] for item in response.json()]
+
+
+def test_search_text_has_fields_and_visible_text():
+    html = _html(
+        "<style>.ts-a { color: red; }</style><script>var 隐藏 = 1;</script>"
+        f"<table><tr><td>申请人</td><td>{FIELD.format(name='姓名')}</td></tr></table>"
+        f"<p>{FIELD.format(name='姓名')}</p>"
+    )
+    assert build_search_text(html) == "姓名 申请人 姓名 姓名"
+    assert build_search_text("") == ""
+
+
+def test_search_matches_name_fields_and_text(client, headers):
+    by_field = _create(client, headers, "费用单", f"<p>{FIELD.format(name='报销金额')}</p>")
+    by_text = _create(client, headers, "出差审批", "<p>本单据用于报销差旅费</p>")
+    by_name = _create(client, headers, "报销单", "<p>空白</p>")
+    by_style = _create(client, headers, "请假单", "<style>.x { content: '报销'; }</style><p>病假</p>")
+
+    # 名称命中的排在前面，其余按 id；样式表中的文字不参与搜索
+    assert _search(client, headers, "报销") == [by_name, by_field, by_text]
+    assert _search(client, headers, "  报销金额 ") == [by_field]
+    assert _search(client, headers, "病假") == [by_style]
+
+
+def test_search_text_follows_updates(client, headers):
+    template_id = _create(client, headers, "入库单", "<p>仓库名称</p>")
+    assert template_id in _search(client, headers, "仓库名称")
+
+    response = client.put(f"/api/templates/{template_id}", json={"content": _html("<p>供应商</p>")}, headers=headers)
+    assert response.status_code == 200
+    assert template_id not in _search(client, headers, "仓库名称")
+    assert template_id in _search(client, headers, "供应商")
+
+
+@pytest.mark.parametrize("keyword, fulltext", [("报销", True), ("报", False)])
+def test_mysql_uses_fulltext_for_long_keywords(keyword, fulltext):
+    db = SimpleNamespace(bind=SimpleNamespace(dialect=SimpleNamespace(name="mysql")))
+    search_filter, _ = _search_expressions(db, keyword)
+    sql = str(search_filter.compile(dialect=mysql.dialect()))
+    assert ("MATCH" in sql) == fulltext
+    assert ("LIKE" in sql.upper()) != fulltext
@@ -0,0 +1,76 @@
+import pytest
+import app.routers.templates as templates_router
+from app.services.template_stats import TemplateStatsBuffer
+
+CONTENT = '<div id="template-root"><p>{{姓名}}</p></div>'
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    # 独立的缓冲区：不会被其它用例的事件或后台线程提前写库
+    buffer = TemplateStatsBuffer(3600, 10**6)
+    monkeypatch.setattr(templates_router, "template_stats_buffer", buffer)
+    return buffer
+
+
+def _create(client, headers, name):
+    response = client.post("/api/templates/", json={"name": name, "content": CONTENT}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _opens(stats, template_id):
+    pending = stats._pending.get(template_id)
+    return pending.open_count if pending else 0
+
+
+@pytest.mark.parametrize("path", ["/api/templates/{id}", "/api/templates/{id}/content"])
+def test_revalidation_is_not_counted_as_open(client, headers, stats, path):
+    template_id = _create(client, headers, f"统计-{path.count('/')}")
+    url = path.format(id=template_id)
+
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert _opens(stats, template_id) == 1
+
+    response = client.get(url, headers={**headers, "If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+    assert _opens(stats, template_id) == 1
+
+
+def test_events_are_aggregated_before_flush(client, headers, stats):
+    popular_id = _create(client, headers, "热门模板")
+    other_id = _create(client, headers, "冷门模板")
+
+    for _ in range(3):
+        client.get(f"/api/templates/{popular_id}", headers=headers)
+    response = client.post(f"/api/templates/{popular_id}/usage", json={"event": "export", "count": 2}, headers=headers)
+    assert response.status_code == 200
+    client.post(f"/api/templates/{other_id}/usage", json={"event": "backfill"}, headers=headers)
+
+    # 写库前排行中看不到这些模板
+    popular = client.get("/api/templates/popular", headers=headers).json()
+    assert popular_id not in [item["template"]["id"] for item in popular]
+
+    assert stats.flush() == 2
+    assert stats.flush() == 0
+    popular = client.get("/api/templates/popular", headers=headers).json()
+    counts = {item["template"]["id"]: item for item in popular}
+    assert [item["template"]["id"] for item in popular][:2] == [popular_id, other_id]
+    assert counts[popular_id]["open_count"] == 3
+    assert counts[popular_id]["export_count"] == 2
+    assert counts[popular_id]["use_count"] == 5
+    assert counts[other_id]["backfill_count"] == 1
+
+    # 再次写库时在已有计数上累加
+    client.post(f"/api/templates/{other_id}/usage", json={"event": "backfill", "count": 9}, headers=headers)
+    stats.flush()
+    popular = client.get("/api/templates/popular", headers=headers).json()
+    assert [item["template"]["id"] for item in popular][:2] == [other_id, popular_id]
+
+
+def test_invalid_usage_event_is_rejected(client, headers, stats):
+    template_id = _create(client, headers, "统计-非法事件")
+    response = client.post(f"/api/templates/{template_id}/usage", json={"event": "print"}, headers=headers)
+    assert response.status_code == 400
+    assert stats._pending == {}
@@ -0,0 +1,56 @@
+import json
+import uuid
+import pytest
+from app.models.template import Template as TemplateModel
+from app.routers.templates import NDJSON_MEDIA_TYPE
+from app.services.template_content import CONTENT_ENCODING_FORK
+
+CONTENT = '<div id="template-root"><p>{{姓名}}</p></div>'
+NDJSON = {"Accept": NDJSON_MEDIA_TYPE}
+
+
+def _create(client, headers, name, content=CONTENT, **extra):
+    response = client.post("/api/templates/", json={"name": name, "content": content, **extra}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _stream(client, headers, path, params):
+    response = client.get(path, params=params, headers={**headers, **NDJSON})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(NDJSON_MEDIA_TYPE)
+    assert "ETag" not in response.headers
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+@pytest.mark.parametrize("path", ["/api/templates/", "/api/templates/summary"])
+@pytest.mark.parametrize("params", [{}, {"owner": "me"}, {"search": "流式"}, {"template_type": "normal"}])
+def test_stream_matches_json_response(client, headers, path, params):
+    for i in range(3):
+        _create(client, headers, f"流式-{i}")
+    expected = client.get(path, params=params, headers=headers).json()
+    assert _stream(client, headers, path, params) == expected
+
+
+def test_stream_includes_fork_content(client, db, headers):
+    html = '<div id="template-root">' + "".join(f"<p>第{i}行 {{{{字段{i}}}}}</p>" for i in range(50)) + "</div>"
+    parent = TemplateModel(name=f"流式系统模板-{uuid.uuid4().hex[:8]}", content=html, is_system=True)
+    db.add(parent)
+    db.commit()
+    child = _create(client, headers, "流式派生", html.replace("第1行", "我的第1行"), parent_id=parent.id)
+    db.expire_all()
+    assert db.get(TemplateModel, child["id"]).content_encoding == CONTENT_ENCODING_FORK
+
+    streamed = _stream(client, headers, "/api/templates/", {"owner": "me"})
+    assert [item["content"] for item in streamed if item["id"] == child["id"]] == [child["content"]]
+
+
+def test_stream_rejects_paging(client, headers):
+    response = client.get("/api/templates/", params={"limit": 10}, headers={**headers, **NDJSON})
+    assert response.status_code == 400
+
+
+def test_anonymous_owner_me_stream_is_empty(client):
+    response = client.get("/api/templates/summary", params={"owner": "me"}, headers=NDJSON)
+    assert response.status_code == 200
+    assert response.text == ""
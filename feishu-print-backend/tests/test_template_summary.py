@@ -0,0 +1,66 @@
+import re
+import uuid
+import pytest
+from app.auth import create_access_token
+from app.models.user import User
+from app.routers.templates import MAX_CONTENT_BATCH
+
+CONTENT = '<div id="template-root"><p>{{姓名}}</p></div>'
+# 读取正文列（content / content_gz）的 SQL；content_hash、content_encoding 不算
+_BODY_COLUMN_RE = re.compile(r"templates\.(content|content_gz)\b")
+
+
+@pytest.fixture
+def other_headers(db):
+    other = User(feishu_user_id=f"test-{uuid.uuid4().hex[:12]}")
+    db.add(other)
+    db.commit()
+    token = create_access_token({"sub": other.feishu_user_id, "user_id": other.id, "role": "user"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _create(client, headers, name):
+    response = client.post("/api/templates/", json={"name": name, "content": CONTENT}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_summary_list_does_not_read_content(client, headers, sql_statements):
+    created = [_create(client, headers, f"摘要-{i}") for i in range(3)]
+
+    sql_statements.clear()
+    response = client.get("/api/templates/summary", params={"owner": "me"}, headers=headers)
+    assert response.status_code == 200
+    summaries = response.json()
+    assert [item["id"] for item in summaries] == [item["id"] for item in created]
+    assert all("content" not in item for item in summaries)
+    assert summaries[0]["content_hash"]
+    assert not [statement for statement in sql_statements if _BODY_COLUMN_RE.search(statement)]
+
+
+def test_contents_returns_only_readable_bodies(client, headers, other_headers):
+    first = _create(client, headers, "正文甲")
+    second = _create(client, headers, "正文乙")
+    private = _create(client, other_headers, "别人的模板")
+
+    ids = [second["id"], private["id"], first["id"], first["id"], 10**9]
+    response = client.get("/api/templates/contents", params={"ids": ids}, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == [
+        {"id": first["id"], "content": first["content"]},
+        {"id": second["id"], "content": second["content"]},
+    ]
+
+    response = client.get("/api/templates/contents", params={"ids": list(range(1, MAX_CONTENT_BATCH + 2))}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_single_content_is_served_as_html(client, headers, other_headers):
+    template = _create(client, headers, "单个正文")
+    response = client.get(f"/api/templates/{template['id']}/content", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/html")
+    assert response.text == template["content"]
+
+    response = client.get(f"/api/templates/{template['id']}/content", headers=other_headers)
+    assert response.status_code == 403
@@ -0,0 +1,54 @@
+import time
+from app.services import template_versions
+from app.services.template_versions import apply_delta, diff_tokens, tokenize_html
+
+
+def _table_template(rows: int, cell_style: str) -> str:
+    body = "".join(
+        f'<tr><td style="{cell_style}">字段{i}</td>'
+        f'<td style="{cell_style}"><span class="template-field field-block" data-fieldname="f{i}">{{$f{i}}}</span></td></tr>'
+        for i in range(rows)
+    )
+    return f'<div id="template-root"><h1>大表格</h1><table style="width: 100%;">{body}</table></div>'
+
+
+def test_diff_round_trip_small_edit():
+    old = _table_template(50, "border: 1px solid #000;")
+    new = old.replace("字段7<", "字段七<")
+    ops = diff_tokens(tokenize_html(old), tokenize_html(new))
+    assert ops is not None and len(ops) <= 3
+    assert apply_delta(tokenize_html(old), ops) == new
+
+
+def test_diff_gives_up_over_token_limit(monkeypatch):
+    monkeypatch.setattr(template_versions, "MAX_DIFF_TOKENS", 100)
+    old = _table_template(50, "padding: 4px;")
+    assert diff_tokens(tokenize_html(old), tokenize_html(old + "<p>x</p>")) is None
+
+
+def test_large_template_rewrite_saves_within_bound(client, headers):
+    # 约 140 KB 的模板，整表修改单元格样式（旧实现在这个规模下会阻塞数分钟）
+    old = _table_template(800, "border: 1px solid #000; padding: 4px;")
+    created = client.post("/api/templates/", json={"name": "大模板", "content": old}, headers=headers)
+    assert created.status_code == 200
+    template_id = created.json()["id"]
+
+    new = _table_template(800, "border: 1px solid #333; padding: 6px 8px;")
+    started = time.perf_counter()
+    updated = client.put(f"/api/templates/{template_id}", json={"content": new}, headers=headers)
+    elapsed = time.perf_counter() - started
+    assert updated.status_code == 200
+    assert elapsed < 3.0
+
+    rewritten = "<div>" + "完全重写的正文" * 20000 + "</div>"
+    started = time.perf_counter()
+    assert client.put(f"/api/templates/{template_id}", json={"content": rewritten}, headers=headers).status_code == 200
+    assert time.perf_counter() - started < 3.0
+
+    versions = client.get(f"/api/templates/{template_id}/versions", headers=headers).json()
+    assert [v["version"] for v in versions] == [3, 2, 1]
+    for version in (2, 3):
+        detail = client.get(f"/api/templates/{template_id}/versions/{version}", headers=headers)
+        assert detail.status_code == 200
+    assert client.get(f"/api/templates/{template_id}/versions/3", headers=headers).json()["content"] == \
+        client.get(f"/api/templates/{template_id}/content", headers=headers).text
@@ -17,6 +17,7 @@ export interface TemplateCreate {
   name: string;
   content: string;
   template_type?: string;  // 'normal' 或 'ai'
+  parent_id?: number;  // 另存为 / 复制的来源模板，服务端据此补回编辑器丢弃的样式块
 }
 
 export interface TemplateUpdate {
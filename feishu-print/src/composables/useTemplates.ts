@@ -50,7 +50,8 @@ export function useTemplates() {
                             const newTemplate = await templateApi.create({
                                 name: currentTpl.name,
                                 content: editorContent.value,
-                                template_type: 'user' // 确保保存为用户模板
+                                template_type: 'user', // 确保保存为用户模板
+                                parent_id: Number(currentTpl.id)
                             });
 
                             // 更新列表并切换到新模板
@@ -155,6 +156,7 @@ export function useTemplates() {
                     name: templateName,
                     content: templateContent,
                     template_type: 'user',
+                    parent_id: selectedTemplate.value ? Number(selectedTemplate.value) : undefined,
                 });
 
                 ElMessage.success('模板已成功保存');